@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 import dj_database_url
 from dotenv import load_dotenv
@@ -27,6 +28,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.QueryBudgetMiddleware',  # SQL counts/timing per request
     'whitenoise.middleware.WhiteNoiseMiddleware',  # for static files
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,13 +59,43 @@ TEMPLATES = [
 WSGI_APPLICATION = 'config.wsgi.application'
 
 # DATABASE
+# SQLite for local dev; set DATABASE_URL (e.g. on Render) to use Postgres
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',   # SQLite engine for local dev
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': dj_database_url.config(
+        default='sqlite:///' + os.path.join(BASE_DIR, 'db.sqlite3'),
+        conn_max_age=600,
+    )
 }
 
+# CACHE
+# Per-process memory cache by default; set REDIS_URL to share it between workers
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds an anonymous home/search page stays cached (content changes expire it sooner)
+PAGE_CACHE_TIMEOUT = 60 * 5
+
+# SEARCH
+# Full-text backend is picked from the database vendor (SQLite FTS5 or Postgres
+# tsvector). Set to a dotted class path from core.search to override.
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND') or None
+
+# GEO
+# File the `import_zip_centroids` command writes ZIP centroids to. Until it
+# exists, the small sample in core/data/zip_centroids.csv is used (see core.geo)
+ZIP_CENTROIDS_FILE = os.getenv('ZIP_CENTROIDS_FILE') or None
+
 # PASSWORD VALIDATION
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -101,7 +133,48 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # DEFAULT AUTO FIELD
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# QUERY BUDGETS
+# Views declare budgets with core.middleware.query_budget; exceeding one is
+# logged, and raises instead when enforcement is on (always on under `manage.py test`)
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+QUERY_BUDGET_ENFORCE = TESTING or os.getenv('QUERY_BUDGET_ENFORCE', '') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.queries': {
+            'handlers': ['console'],
+            'level': 'WARNING' if TESTING else os.getenv('QUERY_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
 # MEDIA FILES
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are checked while they stream in: requests over UPLOAD_MAX_REQUEST_BYTES
+# or files over IMAGE_UPLOAD_MAX_BYTES are refused before the body is read, and the rest
+# are hashed as they arrive for content-addressed storage (see core.uploads, core.image_store)
+IMAGE_UPLOAD_MAX_BYTES = 5 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 50_000_000
+UPLOAD_MAX_REQUEST_BYTES = 25 * 1024 * 1024
+FILE_UPLOAD_HANDLERS = [
+    'core.uploads.LimitedUploadHandler',
+    'core.uploads.HashingMemoryFileUploadHandler',
+    'core.uploads.HashingTemporaryFileUploadHandler',
+]
+
+# Listing totals are counted exactly up to this many rows, estimated above it (see core.counts)
+EXACT_COUNT_THRESHOLD = int(os.getenv('EXACT_COUNT_THRESHOLD', 10_000))
+
+# Room image renditions are generated on a worker thread after upload (see core.renditions)
+RENDITIONS_IN_BACKGROUND = not TESTING
+
+# Similar profiles and room matches are rescored on a worker thread after saves (see core.rescoring)
+RESCORING_IN_BACKGROUND = not TESTING
+
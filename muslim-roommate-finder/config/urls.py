@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.urls import path
-from core import views
+from core import api, views
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -29,6 +29,11 @@ urlpatterns = [
     path('rooms/<int:pk>/', views.room_detail, name='room_detail'),
     path('rooms/<int:pk>/edit/', views.room_edit, name='room_edit'),
     path("rooms/<int:pk>/delete/", views.room_delete, name="room_delete"),
+    path('rooms/search/', views.advanced_search, name='advanced_search'),
+
+    # JSON API
+    path('api/rooms/', api.room_list, name='api_rooms'),
+    path('api/profiles/', api.profile_list, name='api_profiles'),
 ]
 
 if settings.DEBUG:
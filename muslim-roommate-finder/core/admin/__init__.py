@@ -1,4 +1,5 @@
 from django.contrib import admin
+from core.counts import EstimatedCountPaginator
 from core.models import (
     Profile, RoommateProfile, Contact, Message, Room, RoomType, 
     Amenity, RoomImage, RoomReview, RoomFavorite, RoomVerification
@@ -9,6 +10,7 @@ from .profile_admin import ProfileAdmin
 from .room_admin import RoomAdmin, RoomTypeAdmin, AmenityAdmin, RoomImageAdmin
 from .messaging_admin import MessageAdmin
 from .reviews_admin import RoomReviewAdmin
+from .metro_admin import MetroAreaAdmin
 
 # Register additional models that don't have custom admin classes
 @admin.register(RoommateProfile)
@@ -16,6 +18,8 @@ class RoommateProfileAdmin(admin.ModelAdmin):
     list_display = ("profile", "budget", "occupation")
     search_fields = ("profile__name", "occupation")
     list_filter = ("budget",)
+    list_select_related = ("profile",)
+    autocomplete_fields = ("profile",)
 
 @admin.register(Contact)
 class ContactAdmin(admin.ModelAdmin):
@@ -23,6 +27,8 @@ class ContactAdmin(admin.ModelAdmin):
     search_fields = ("name", "email", "profile__name")
     list_filter = ("created_at",)
     readonly_fields = ("created_at",)
+    list_select_related = ("profile",)
+    autocomplete_fields = ("profile",)
 
 @admin.register(RoomFavorite)
 class RoomFavoriteAdmin(admin.ModelAdmin):
@@ -30,9 +36,15 @@ class RoomFavoriteAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "room__title")
     list_filter = ("created_at",)
     readonly_fields = ("created_at",)
+    list_select_related = ("user", "room")
+    autocomplete_fields = ("user", "room")
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
 
 @admin.register(RoomVerification)
 class RoomVerificationAdmin(admin.ModelAdmin):
     list_display = ("room", "is_verified")
     list_filter = ("is_verified",)
     list_editable = ("is_verified",)
+    list_select_related = ("room",)
+    autocomplete_fields = ("room", "verified_by")
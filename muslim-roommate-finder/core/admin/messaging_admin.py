@@ -1,9 +1,14 @@
 from django.contrib import admin
+from core.counts import EstimatedCountPaginator
 from core.models import Message
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ("sender", "recipient", "timestamp")
+    list_display = ("sender", "recipient", "room", "timestamp")
     search_fields = ("sender__name", "recipient__name", "content")
     list_filter = ("timestamp",)
     readonly_fields = ("timestamp",)
+    list_select_related = ("sender", "recipient", "room")
+    autocomplete_fields = ("sender", "recipient", "room")
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
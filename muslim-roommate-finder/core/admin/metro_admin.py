@@ -0,0 +1,14 @@
+from django.contrib import admin
+from core.models import MetroArea, MetroAreaPlace
+
+class MetroAreaPlaceInline(admin.TabularInline):
+    model = MetroAreaPlace
+    extra = 3
+    fields = ('name',)
+
+@admin.register(MetroArea)
+class MetroAreaAdmin(admin.ModelAdmin):
+    list_display = ("name", "slug")
+    search_fields = ("name", "places__name")
+    prepopulated_fields = {"slug": ("name",)}
+    inlines = [MetroAreaPlaceInline]
@@ -1,13 +1,45 @@
 from django.contrib import admin
-from core.models import Profile
+from core.counts import EstimatedCountPaginator
+from core.facets import get_facet
+from core.models import Profile, US_STATES, state_abbreviation
+from .filters import FacetListFilter
+
+
+class CityFilter(FacetListFilter):
+    title = "city"
+    parameter_name = "city"
+    facet = "profile_city"
+
+
+class StateFilter(admin.SimpleListFilter):
+    """Filter by US state, treating "sc", "SC" and "South Carolina" alike."""
+    title = "state"
+    parameter_name = "state"
+
+    def lookups(self, request, model_admin):
+        # The cached state facet, not a DISTINCT over every profile per page load
+        stored = {state_abbreviation(facet.value) for facet in get_facet("profile_state")}
+        return sorted((abbr, US_STATES[abbr]) for abbr in stored if abbr)
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.in_area(state=self.value())
+        return queryset
+
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ("name", "user", "city", "state", "age", "gender")
     search_fields = ("name", "user__username", "city", "neighborhood", "bio")
-    list_filter = ("gender", "city", "state", "is_looking_for_room", "halal_kitchen", "prayer_friendly")
+    list_filter = ("gender", CityFilter, StateFilter, "is_looking_for_room", "halal_kitchen", "prayer_friendly")
     list_editable = ("city", "state", "age")
     readonly_fields = ("slug",)
+    list_select_related = ("user",)
+    # Search users instead of rendering every account in a <select>
+    autocomplete_fields = ("user",)
+    # Skip the unfiltered COUNT(*) next to the result count on every page
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     fieldsets = (
         ("Basic Info", {
             "fields": ("user", "name", "age", "gender")
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from core.counts import EstimatedCountPaginator
 from core.models import RoomReview
 
 @admin.register(RoomReview)
@@ -7,3 +8,7 @@ class RoomReviewAdmin(admin.ModelAdmin):
     search_fields = ("room__title", "reviewer__name", "comment")
     list_filter = ("rating", "created_at")
     readonly_fields = ("created_at",)
+    list_select_related = ("room", "reviewer")
+    autocomplete_fields = ("room", "reviewer")
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
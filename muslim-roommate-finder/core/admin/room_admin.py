@@ -1,11 +1,40 @@
 from django.contrib import admin
+from core.counts import EstimatedCountPaginator
+from django.db import models
+from django.utils.html import format_html
+from core.forms import HeaderImageField
+from core import renditions
 from core.models import Room, RoomType, Amenity, RoomImage
+from .filters import FacetListFilter
+
+
+class CityFilter(FacetListFilter):
+    # Cities of active rooms only, as on the search pages
+    title = "city"
+    parameter_name = "city"
+    facet = "room_city"
+
+
+def image_preview(obj):
+    if not obj.pk or not obj.image:
+        return "-"
+    # The stored rendition path, or the original until it exists; unlike
+    # get_thumbnail_url this never schedules rendition jobs from the admin
+    url = obj.image.storage.url(obj.renditions["admin"]) if renditions.is_current(obj) else obj.image.url
+    return format_html('<img src="{}" width="80" alt="">', url)
+image_preview.short_description = "Preview"
+
 
 class RoomImageInline(admin.TabularInline):
     model = RoomImage
     extra = 1
-    fields = ('image', 'is_primary', 'caption')
-    readonly_fields = ('get_file_size',)
+    fields = ('preview', 'image', 'is_primary', 'caption', 'get_dimensions', 'get_file_size')
+    readonly_fields = ('preview', 'get_dimensions', 'get_file_size')
+    formfield_overrides = {models.ImageField: {'form_class': HeaderImageField}}
+
+    def preview(self, obj):
+        return image_preview(obj)
+    preview.short_description = "Preview"
     
     def get_file_size(self, obj):
         if obj.pk:
@@ -13,15 +42,26 @@ class RoomImageInline(admin.TabularInline):
         return "N/A"
     get_file_size.short_description = "File Size"
 
+    def get_dimensions(self, obj):
+        if obj.pk:
+            return obj.get_dimensions()
+        return "N/A"
+    get_dimensions.short_description = "Dimensions"
+
 @admin.register(Room)
 class RoomAdmin(admin.ModelAdmin):
     list_display = ("title", "user", "city", "neighborhood", "price", "available_from", "is_active", "image_count")
     search_fields = ("title", "description", "city", "neighborhood", "user__name")
-    list_filter = ("city", "room_type", "halal_kitchen", "prayer_friendly", "guests_allowed", "is_active", "created_at")
+    list_filter = (CityFilter, "room_type", "halal_kitchen", "prayer_friendly", "guests_allowed", "is_active", "created_at")
     list_editable = ("price", "available_from", "is_active")
     readonly_fields = ("slug", "created_at", "updated_at", "image_count")
     filter_horizontal = ("amenities",)
     inlines = [RoomImageInline]
+    list_select_related = ("user",)
+    autocomplete_fields = ("user",)
+    # Skip the unfiltered COUNT(*) next to the result count on every page
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     fieldsets = (
         ("Basic Info", {
             "fields": ("user", "title", "description", "room_type")
@@ -48,9 +88,13 @@ class RoomAdmin(admin.ModelAdmin):
         return obj.get_price_display()
     get_price_display.short_description = "Price"
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_image_count()
+
     def image_count(self, obj):
         return obj.image_count
     image_count.short_description = "Images"
+    image_count.admin_order_field = "image_total"
 
 @admin.register(RoomType)
 class RoomTypeAdmin(admin.ModelAdmin):
@@ -64,12 +108,25 @@ class AmenityAdmin(admin.ModelAdmin):
 
 @admin.register(RoomImage)
 class RoomImageAdmin(admin.ModelAdmin):
-    list_display = ("room", "is_primary", "get_file_size", "created_at")
+    list_display = ("preview", "room", "is_primary", "get_dimensions", "get_file_size", "created_at")
     list_filter = ("is_primary", "created_at")
     list_editable = ("is_primary",)
     search_fields = ("room__title", "caption")
-    readonly_fields = ("created_at", "get_file_size")
+    readonly_fields = ("preview", "created_at", "get_dimensions", "get_file_size", "dominant_color")
+    formfield_overrides = {models.ImageField: {"form_class": HeaderImageField}}
+    list_select_related = ("room",)
+    autocomplete_fields = ("room",)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def preview(self, obj):
+        return image_preview(obj)
+    preview.short_description = "Preview"
     
     def get_file_size(self, obj):
         return obj.get_file_size()
     get_file_size.short_description = "File Size"
+
+    def get_dimensions(self, obj):
+        return obj.get_dimensions()
+    get_dimensions.short_description = "Dimensions"
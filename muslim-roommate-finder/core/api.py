@@ -0,0 +1,148 @@
+"""
+Read-only JSON search API for rooms and profiles.
+
+    GET /api/rooms/?city=Charleston&fields=id,title,price&cursor=...
+    GET /api/profiles/?gender=female&fields=id,name,city
+
+Both endpoints take the same filters as the HTML pages (see core.filters),
+keyset pagination via `cursor` / `page_size`, and a sparse fieldset via
+`fields`. Only the requested columns are selected with `values()`, so long
+`description`/`bio` text is never read unless a client asks for it.
+Responses carry a `count` total from core.counts, with `count_exact` false
+when it is an estimate. Unknown fields and `near` ZIP codes are a 400.
+"""
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from . import counts
+from .filters import filter_profiles, filter_rooms, is_filtered, near_error, near_notice, order_key, room_order_key
+from .middleware import query_budget
+from .pagination import paginate_keyset
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Public field name -> ORM path passed to values()
+ROOM_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'city': 'city',
+    'neighborhood': 'neighborhood',
+    'metro': 'metro',
+    'price': 'price',
+    'available_from': 'available_from',
+    'room_type': 'room_type__name',
+    'halal_kitchen': 'halal_kitchen',
+    'prayer_friendly': 'prayer_friendly',
+    'guests_allowed': 'guests_allowed',
+    'slug': 'slug',
+    'owner_id': 'user_id',
+    'owner_name': 'user__name',
+    'avg_rating': 'avg_rating',
+    'review_count': 'review_count',
+    'created_at': 'created_at',
+}
+ROOM_DEFAULT_FIELDS = ['id', 'title', 'city', 'neighborhood', 'price', 'available_from']
+
+PROFILE_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'age': 'age',
+    'gender': 'gender',
+    'city': 'city',
+    'state': 'state',
+    'neighborhood': 'neighborhood',
+    'metro': 'metro',
+    'is_looking_for_room': 'is_looking_for_room',
+    'halal_kitchen': 'halal_kitchen',
+    'prayer_friendly': 'prayer_friendly',
+    'guests_allowed': 'guests_allowed',
+    'bio': 'bio',
+    'slug': 'slug',
+    'created_at': 'created_at',
+}
+PROFILE_DEFAULT_FIELDS = ['id', 'name', 'age', 'gender', 'city', 'neighborhood']
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def parse_fields(raw, available, default):
+    """Turn `fields=a,b,c` into a list of known public field names."""
+    if not raw:
+        return list(default)
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in available]
+    if unknown:
+        raise FieldsError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def parse_page_size(raw):
+    try:
+        size = int(raw)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _page_url(request, token):
+    if not token:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = token
+    return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+
+
+def list_response(request, queryset, available, default, counter=None, key=None):
+    try:
+        fields = parse_fields(request.GET.get('fields'), available, default)
+    except FieldsError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    error = near_error(request.GET)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+
+    key = key or order_key(request.GET)
+    # The pagination key and id are always selected so cursors can be built
+    columns = {available[f]: f for f in fields}
+    selected = list(columns) + [c for c in ('id', key) if c not in columns]
+    page = paginate_keyset(
+        queryset.values(*selected),
+        request.GET.get('cursor'),
+        parse_page_size(request.GET.get('page_size')),
+        key,
+    )
+
+    results = [{columns[c]: row[c] for c in columns} for row in page]
+    total = counts.count(queryset, None if is_filtered(request.GET) else counter)
+    data = {
+        'count': total,
+        'count_exact': total.exact,
+        'results': results,
+        'next': _page_url(request, page.next_token),
+        'previous': _page_url(request, page.previous_token),
+    }
+    notice = near_notice(request.GET)
+    if notice:
+        data['notice'] = notice
+    return JsonResponse(data)
+
+
+@query_budget(6)
+@require_GET
+def room_list(request):
+    """Active rooms, filtered like the home page and advanced search; `sort=rating` for best rated first."""
+    return list_response(
+        request, filter_rooms(request.GET), ROOM_FIELDS, ROOM_DEFAULT_FIELDS, 'rooms.active',
+        room_order_key(request.GET),
+    )
+
+
+@query_budget(6)
+@require_GET
+def profile_list(request):
+    """Profiles, filtered like the home page."""
+    return list_response(request, filter_profiles(request.GET), PROFILE_FIELDS, PROFILE_DEFAULT_FIELDS, 'profiles')
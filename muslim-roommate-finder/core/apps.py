@@ -24,4 +24,6 @@ class CoreConfig(AppConfig):
     name = "core"
 
     def ready(self):
+        from core import signals  # noqa: F401 - registers receivers
+
         post_migrate.connect(seed_data, sender=self)
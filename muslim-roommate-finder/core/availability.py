@@ -0,0 +1,90 @@
+"""
+Date-range availability search over RoomAvailability windows.
+
+A window is an inclusive (start_date, end_date) range. Windows of one room
+are kept disjoint: `merge` (called from `RoomAvailability.save`) folds any
+overlapping or adjacent windows of the same room into the one being saved,
+so a stay fits a room exactly when a single window contains the whole of it
+(start_date <= move-in and end_date >= move-out), and each room matches at
+most one window however many it has.
+
+`available_for` answers that as one semi-join: rooms whose id is in the
+subquery of containing windows, so results stay unique without DISTINCT.
+
+* PostgreSQL: the containment is `daterange(start_date, end_date, '[]') @>`
+  the stay, served by a GiST index on that expression (created by migration
+  0022 only on Postgres).
+* Elsewhere: the (end_date, start_date, room) index; windows that have
+  already ended are skipped by the end_date range and the start_date check
+  is answered from the index without reading the table.
+
+Rooms with no windows at all fall back to `available_from`: they are open
+from that date on, as before windows existed.
+"""
+from datetime import timedelta
+
+from django.apps import apps
+from django.db import connections
+from django.db.models import BooleanField, Exists, F, Func, OuterRef, Q, Value
+
+ONE_DAY = timedelta(days=1)
+
+
+def _models():
+    return apps.get_model('core', 'Room'), apps.get_model('core', 'RoomAvailability')
+
+
+def merge(window):
+    """
+    Widen `window`, before it is saved, to cover every overlapping or adjacent
+    window of its room, and delete those. Call inside a transaction; the
+    room row is locked so concurrent saves for one room can't both miss
+    each other.
+    """
+    Room, RoomAvailability = _models()
+    list(Room.objects.select_for_update().filter(pk=window.room_id).values_list('pk', flat=True))
+    touching = RoomAvailability.objects.filter(
+        room_id=window.room_id,
+        start_date__lte=window.end_date + ONE_DAY,
+        end_date__gte=window.start_date - ONE_DAY,
+    ).exclude(pk=window.pk)
+    bounds = list(touching.values_list('pk', 'start_date', 'end_date'))
+    if not bounds:
+        return
+    window.start_date = min([window.start_date] + [start for _, start, _ in bounds])
+    window.end_date = max([window.end_date] + [end for _, _, end in bounds])
+    RoomAvailability.objects.filter(pk__in=[pk for pk, _, _ in bounds]).delete()
+
+
+def _daterange(start, end):
+    """Inclusive daterange(start, end, '[]'), as indexed by migration 0022."""
+    return Func(start, end, Value('[]'), function='daterange')
+
+
+def covering_windows(start, end, using='default'):
+    """Windows that contain the whole stay from `start` to `end` (inclusive)."""
+    _, RoomAvailability = _models()
+    windows = RoomAvailability.objects.using(using)
+    if connections[using].vendor == 'postgresql':
+        # Built from expressions, so the columns follow the table's alias inside subqueries
+        containment = Func(
+            _daterange(F('start_date'), F('end_date')),
+            _daterange(Value(start), Value(end)),
+            template='%(expressions)s',
+            arg_joiner=' @> ',
+            output_field=BooleanField(),
+        )
+        return windows.filter(containment)
+    return windows.filter(end_date__gte=end, start_date__lte=start)
+
+
+def available_for(rooms, start, end=None):
+    """
+    `rooms` narrowed to those available for the whole stay: a window covers
+    it, or the room has no windows and is available from `start` or earlier.
+    """
+    _, RoomAvailability = _models()
+    end = end or start
+    covered = covering_windows(start, end, rooms.db).values('room_id')
+    has_windows = Exists(RoomAvailability.objects.filter(room_id=OuterRef('pk')))
+    return rooms.filter(Q(id__in=covered) | (~has_windows & Q(available_from__lte=start)))
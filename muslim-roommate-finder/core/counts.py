@@ -0,0 +1,158 @@
+"""
+Cheap row counts for large listing tables.
+
+`count(queryset, counter=None)` never scans more than `EXACT_COUNT_THRESHOLD`
+rows. It first runs a bounded count (`SELECT COUNT(*) FROM (... LIMIT n)`);
+below the threshold that is the exact answer. Above it the count comes from,
+in order:
+
+* the named counter row (RowCount), for the unfiltered scopes in `COUNTERS`,
+  kept up to date by the receivers in `core.signals`;
+* the Postgres planner's row estimate for the query (`EXPLAIN`), which uses
+  the table statistics ANALYZE/autovacuum keep;
+* otherwise the threshold itself, as a lower bound ("10,000+").
+
+The result is an `EstimatedCount`, an int that renders as "≈12,345" or
+"10,000+" when it is not exact. `EstimatedCountPaginator` applies the same
+rules to admin changelists. Counters can drift if rows are changed with
+`QuerySet.update()` or `bulk_create`; `reconcile_counts` recounts them.
+"""
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils.functional import cached_property
+
+from .models import Profile, Room, RowCount
+
+EXACT_COUNT_THRESHOLD = 10_000
+
+# counter name -> (model, filters); the filters must be plain field values
+COUNTERS = {
+    'profiles': (Profile, {}),
+    'rooms.active': (Room, {'is_active': True}),
+}
+
+
+def threshold():
+    return getattr(settings, 'EXACT_COUNT_THRESHOLD', EXACT_COUNT_THRESHOLD)
+
+
+class EstimatedCount(int):
+    """A row count that may be an estimate (`exact` False) or a lower bound (`lower_bound` True)."""
+
+    def __new__(cls, value, exact=True, lower_bound=False):
+        count = super().__new__(cls, max(int(value), 0))
+        count.exact = exact
+        count.lower_bound = lower_bound
+        return count
+
+    def __str__(self):
+        if self.exact:
+            return f'{int(self):,}'
+        if self.lower_bound:
+            return f'{int(self):,}+'
+        return f'≈{int(self):,}'
+
+
+def bounded_count(queryset, limit):
+    """Exact count of `queryset`, but stopping at `limit` rows."""
+    return queryset.order_by().values('pk')[:limit].count()
+
+
+def planner_estimate(queryset):
+    """Postgres' estimated row count for `queryset`, or None on other databases."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+# --- Counter rows ---
+def matches(name, instance):
+    """Whether a model instance belongs to counter `name`."""
+    _, filters = COUNTERS[name]
+    return all(getattr(instance, field) == value for field, value in filters.items())
+
+
+def counters_for(model):
+    return [name for name, (counted, _) in COUNTERS.items() if counted is model]
+
+
+def stored_membership(model, instance, update_fields=None):
+    """
+    {counter: whether the stored row belongs to it}, read before a save; one
+    query, only for counters with filters whose fields may change.
+    """
+    names = counters_for(model)
+    if instance._state.adding:
+        return dict.fromkeys(names, False)
+    fields = sorted({field for name in names for field in COUNTERS[name][1]})
+    if update_fields is not None:
+        fields = [field for field in fields if field in update_fields]
+    if not fields:
+        return {name: matches(name, instance) for name in names}
+    row = model.objects.filter(pk=instance.pk).values(*fields).first()
+    if row is None:
+        return dict.fromkeys(names, False)
+    return {
+        name: all(row.get(field, getattr(instance, field)) == value for field, value in COUNTERS[name][1].items())
+        for name in names
+    }
+
+
+def recount(name):
+    model, filters = COUNTERS[name]
+    total = model.objects.filter(**filters).count()
+    RowCount.objects.update_or_create(name=name, defaults={'count': total})
+    return total
+
+
+def counter_value(name):
+    value = RowCount.objects.filter(name=name).values_list('count', flat=True).first()
+    return recount(name) if value is None else value
+
+
+def adjust(name, delta):
+    """Add `delta` to counter `name` (a single UPDATE; the row is created by a recount if missing)."""
+    if not delta:
+        return
+    with transaction.atomic():
+        if not RowCount.objects.filter(name=name).update(count=F('count') + delta):
+            recount(name)
+
+
+def count(queryset, counter=None):
+    """
+    Number of rows in `queryset`: exact below the threshold, otherwise the
+    `counter` row (when `queryset` is exactly that counter's scope), the
+    planner estimate, or a lower bound.
+    """
+    limit = threshold()
+    exact = bounded_count(queryset, limit + 1)
+    if exact <= limit:
+        return EstimatedCount(exact)
+    if counter is not None:
+        return EstimatedCount(counter_value(counter), exact=False)
+    estimate = planner_estimate(queryset)
+    if estimate is not None:
+        return EstimatedCount(max(estimate, limit + 1), exact=False)
+    return EstimatedCount(limit, exact=False, lower_bound=True)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose total comes from `count()` instead of a full COUNT(*)."""
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            return count(self.object_list)
+        return len(self.object_list)
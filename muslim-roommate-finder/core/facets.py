@@ -0,0 +1,121 @@
+"""
+Facets for the home and search pages.
+
+Cached facet values for the location filter dropdowns (and the admin state filter):
+
+Each facet is the list of distinct non-empty values of one column together with
+how many rows carry that value, e.g. ("Mount Pleasant", 42). Computing it is a
+GROUP BY over the whole table, so results are cached and dropped by the
+post_save/post_delete receivers in `core.signals` whenever the underlying
+model changes. The timeout only bounds staleness for per-process caches.
+
+Result counts for the current filter set (`count_facets`) are not cached: they
+are computed with one GROUP BY city query per model using conditional
+aggregation, rather than one COUNT query per facet.
+"""
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Profile, Room
+
+FACET_CACHE_TIMEOUT = 60 * 10
+
+FacetValue = namedtuple('FacetValue', ['value', 'count'])
+
+# name -> (model, field, extra filters)
+FACETS = {
+    'profile_city': (Profile, 'city', {}),
+    'profile_neighborhood': (Profile, 'neighborhood', {}),
+    'profile_state': (Profile, 'state', {}),
+    'room_city': (Room, 'city', {'is_active': True}),
+    'room_neighborhood': (Room, 'neighborhood', {'is_active': True}),
+}
+
+
+def _cache_key(name):
+    return f'facets:{name}'
+
+
+def compute_facet(name):
+    model, field, filters = FACETS[name]
+    rows = (
+        model.objects.filter(**filters)
+        .exclude(Q(**{f'{field}__isnull': True}) | Q(**{field: ''}))
+        .values_list(field)
+        .annotate(count=Count('id'))
+        .order_by(field)
+    )
+    return [FacetValue(value, count) for value, count in rows]
+
+
+def get_facet(name):
+    """Return the cached [(value, count), ...] list for facet `name`."""
+    key = _cache_key(name)
+    values = cache.get(key)
+    if values is None:
+        values = compute_facet(name)
+        cache.set(key, values, FACET_CACHE_TIMEOUT)
+    return values
+
+
+def facet_fields(model):
+    """Fields of `model` whose changes can alter its cached facets."""
+    return {name for spec_model, field, filters in FACETS.values() if spec_model is model for name in [field, *filters]}
+
+
+def invalidate_facets(model):
+    """Drop every cached facet built from `model`."""
+    cache.delete_many([_cache_key(name) for name, spec in FACETS.items() if spec[0] is model])
+
+
+# Conditional counts reported for filtered results, per model.
+PROFILE_COUNT_FACETS = {
+    'male': Q(gender='male'),
+    'female': Q(gender='female'),
+    'halal_kitchen': Q(halal_kitchen=True),
+    'prayer_friendly': Q(prayer_friendly=True),
+    'guests_allowed': Q(guests_allowed=True),
+    'looking_for_room': Q(is_looking_for_room=True),
+}
+
+ROOM_COUNT_FACETS = {
+    'halal_kitchen': Q(halal_kitchen=True),
+    'prayer_friendly': Q(prayer_friendly=True),
+    'guests_allowed': Q(guests_allowed=True),
+}
+
+
+class FacetCounts:
+    """Total, per-condition and per-city counts for one filtered queryset."""
+
+    def __init__(self, total, counts, cities):
+        self.total = total
+        self.counts = counts
+        self.cities = cities
+
+    def __repr__(self):
+        return f'<FacetCounts total={self.total} counts={self.counts}>'
+
+
+def count_facets(queryset, conditions, group_by='city'):
+    """
+    Count `queryset` overall, per named Q condition and per `group_by` value
+    in a single query: one row per city, each carrying conditional counts,
+    summed here for the totals.
+    """
+    aggregates = {name: Count('id', filter=condition) for name, condition in conditions.items()}
+    rows = queryset.order_by().values(group_by).annotate(facet_total=Count('id'), **aggregates)
+
+    total = 0
+    counts = dict.fromkeys(conditions, 0)
+    cities = []
+    for row in rows:
+        total += row['facet_total']
+        for name in conditions:
+            counts[name] += row[name]
+        if row[group_by]:
+            cities.append(FacetValue(row[group_by], row['facet_total']))
+    cities.sort()
+    return FacetCounts(total, counts, cities)
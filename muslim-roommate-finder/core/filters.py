@@ -0,0 +1,214 @@
+"""
+Listing filters shared by the HTML pages and the JSON API.
+
+`filter_profiles` and `filter_rooms` turn request parameters (a QueryDict) into
+querysets, so `home`, `advanced_search` and `/api/...` accept exactly the same
+filters. Unparseable numbers and dates are ignored rather than raising.
+"""
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from .availability import available_for
+from .facets import get_facet
+from .geo import DEFAULT_RADIUS_MILES, near_zip, normalize_zip, zip_centroid
+from .lookups import location_q
+from .models import CHARLESTON_METRO, Profile, Room
+from .search import get_search_backend
+
+# Map preference filters to Profile fields and the value they require
+PROFILE_PREFERENCES = {
+    'halal_kitchen': ('halal_kitchen', True),
+    'prayer_friendly': ('prayer_friendly', True),
+    'guests_allowed': ('guests_allowed', True),
+    'looking_for_room': ('is_looking_for_room', True),
+    'offering_room': ('is_looking_for_room', False),
+}
+
+ROOM_PREFERENCES = ['halal_kitchen', 'prayer_friendly', 'guests_allowed']
+
+# Every parameter either filter reads
+FILTER_PARAMS = [
+    'search', 'city', 'neighborhood', 'metro', 'charleston_only', 'state', 'zip', 'near', 'radius',
+    'gender', 'age_min', 'age_max', 'preference', 'min_rent', 'max_rent', 'available', 'room_type', 'amenities',
+    'min_rating', 'move_in', 'move_out',
+]
+
+
+def is_filtered(params):
+    """Whether any filter parameter is set, i.e. the result is not the whole listing."""
+    return any(params.get(name) for name in FILTER_PARAMS)
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _decimal(value):
+    try:
+        return Decimal(value)
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def metro_filter(params):
+    """The metro slug requested via `metro=<slug>` or `charleston_only`."""
+    return params.get('metro', '') or (CHARLESTON_METRO if params.get('charleston_only') else '')
+
+
+def near_error(params):
+    """'Enter a 5-digit ZIP code.' if the `near` ZIP code is malformed, else ''."""
+    zip_code = params.get('near', '').strip()
+    if zip_code and not normalize_zip(zip_code):
+        return 'Enter a 5-digit ZIP code.'
+    return ''
+
+
+def near_notice(params):
+    """
+    Why results aren't limited to `radius` miles of the `near` ZIP code, or ''
+    if they are (or it is not set). A ZIP code missing from the centroid file
+    skips the distance filter rather than matching nothing, so pages show this
+    alongside the results.
+    """
+    zip_code = params.get('near', '').strip()
+    if not zip_code or zip_centroid(zip_code):
+        return ''
+    return near_error(params) or (
+        f'ZIP code {normalize_zip(zip_code)} is not in our location data yet, '
+        'so results are not limited by distance.'
+    )
+
+
+def _near(queryset, params):
+    """
+    Rows within `radius` miles (default 10) of the `near` ZIP code, annotated
+    with `distance`; every row if the ZIP code is unknown (see `near_notice`).
+    """
+    zip_code = params.get('near', '').strip()
+    if not zip_code or zip_centroid(zip_code) is None:
+        return queryset
+    radius = _decimal(params.get('radius'))
+    miles = float(radius) if radius is not None and radius > 0 else DEFAULT_RADIUS_MILES
+    return near_zip(queryset, zip_code, miles)
+
+
+def order_key(params):
+    """Searches are ordered by relevance, everything else newest first."""
+    return 'search_rank' if params.get('search') else 'created_at'
+
+
+def room_order_key(params):
+    """Like `order_key`, but `sort=rating` lists the best-rated rooms first (unrated last)."""
+    if params.get('sort') == 'rating' and not params.get('search'):
+        return 'avg_rating'
+    return order_key(params)
+
+
+def filter_profiles(params, queryset=None):
+    """
+    Profiles matching search, city, neighborhood, metro, area (`state` as an
+    abbreviation or full name, `zip` as a comma-separated list), distance
+    (`near` ZIP and `radius` miles), gender, age range and preference.
+    """
+    profiles = Profile.objects.all() if queryset is None else queryset
+
+    search_query = params.get('search', '')
+    if search_query:
+        profiles = get_search_backend().search(profiles, search_query)
+
+    city = params.get('city', '')
+    if city:
+        profiles = profiles.filter(location_q('city', city, [f.value for f in get_facet('profile_city')]))
+    neighborhood = params.get('neighborhood', '')
+    if neighborhood:
+        known = [f.value for f in get_facet('profile_neighborhood')]
+        profiles = profiles.filter(location_q('neighborhood', neighborhood, known))
+    metro = metro_filter(params)
+    if metro:
+        profiles = profiles.filter(metro=metro)
+    state = params.get('state', '')
+    zip_codes = [z for z in params.get('zip', '').split(',') if z.strip()]
+    if state or zip_codes:
+        profiles = profiles.in_area(state=state, zip_codes=zip_codes)
+    profiles = _near(profiles, params)
+    gender = params.get('gender', '')
+    if gender:
+        profiles = profiles.filter(gender=gender)
+    age_min = _int(params.get('age_min'))
+    if age_min is not None:
+        profiles = profiles.filter(age__gte=age_min)
+    age_max = _int(params.get('age_max'))
+    if age_max is not None:
+        profiles = profiles.filter(age__lte=age_max)
+    preference = PROFILE_PREFERENCES.get(params.get('preference', ''))
+    if preference:
+        field, value = preference
+        profiles = profiles.filter(**{field: value})
+
+    return profiles
+
+
+def filter_rooms(params, queryset=None):
+    """
+    Active rooms matching the home filters (search, city, neighborhood, metro,
+    preference) and the advanced search filters (distance from the `near` ZIP
+    within `radius` miles, rent, availability, room type, amenities, minimum
+    average rating, and a whole stay from `move_in` to `move_out`).
+    """
+    rooms = Room.objects.filter(is_active=True) if queryset is None else queryset
+
+    search_query = params.get('search', '')
+    if search_query:
+        rooms = get_search_backend().search(rooms, search_query)
+
+    city = params.get('city', '')
+    if city:
+        rooms = rooms.filter(location_q('city', city, [f.value for f in get_facet('room_city')]))
+    neighborhood = params.get('neighborhood', '')
+    if neighborhood:
+        known = [f.value for f in get_facet('room_neighborhood')]
+        rooms = rooms.filter(location_q('neighborhood', neighborhood, known))
+    metro = metro_filter(params)
+    if metro:
+        rooms = rooms.filter(metro=metro)
+    rooms = _near(rooms, params)
+    preference = params.get('preference', '')
+    if preference in ROOM_PREFERENCES:
+        rooms = rooms.filter(**{preference: True})
+
+    min_rent = _decimal(params.get('min_rent'))
+    if min_rent is not None:
+        rooms = rooms.filter(price__gte=min_rent)
+    max_rent = _decimal(params.get('max_rent'))
+    if max_rent is not None:
+        rooms = rooms.filter(price__lte=max_rent)
+    available_date = _date(params.get('available'))
+    if available_date:
+        rooms = rooms.filter(available_from__lte=available_date)
+    room_type = _int(params.get('room_type'))
+    if room_type is not None:
+        rooms = rooms.filter(room_type=room_type)
+    amenities = [a for a in (_int(v) for v in params.getlist('amenities')) if a is not None]
+    if amenities:
+        # A subquery rather than a join keeps rows unique without DISTINCT
+        with_amenities = Room.amenities.through.objects.filter(amenity_id__in=amenities)
+        rooms = rooms.filter(id__in=with_amenities.values('room_id'))
+    min_rating = _decimal(params.get('min_rating'))
+    if min_rating is not None:
+        rooms = rooms.filter(avg_rating__gte=float(min_rating))
+    move_in = _date(params.get('move_in'))
+    if move_in:
+        move_out = _date(params.get('move_out'))
+        rooms = available_for(rooms, move_in, move_out if move_out and move_out >= move_in else None)
+
+    return rooms
@@ -1,5 +1,7 @@
 from django import forms
+from PIL import Image
 from .models import Profile, Contact, Room, RoomImage, RoomType, Amenity
+from .uploads import probe
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 
@@ -23,7 +25,7 @@ class UserRegistrationForm(UserCreationForm):
 class ProfileForm(forms.ModelForm):
     class Meta:
         model = Profile
-        fields = ['name', 'age', 'gender', 'city', 'neighborhood', 'is_looking_for_room', 'bio', 'contact_email', 
+        fields = ['name', 'age', 'gender', 'city', 'neighborhood', 'zip_code', 'is_looking_for_room', 'bio', 'contact_email', 
                  'halal_kitchen', 'prayer_friendly', 'guests_allowed']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter your full name'}),
@@ -31,6 +33,7 @@ class ProfileForm(forms.ModelForm):
             'gender': forms.Select(attrs={'class': 'form-select'}),
             'city': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Charleston, Mount Pleasant, West Ashley, James Island'}),
             'neighborhood': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Downtown, West Ashley, Mount Pleasant'}),
+            'zip_code': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'ZIP code, e.g. 29401'}),
             'bio': forms.Textarea(attrs={'class': 'form-control', 'rows': 4, 'placeholder': 'Tell us about yourself, your lifestyle, and what you\'re looking for in a roommate...'}),
             'contact_email': forms.EmailInput(attrs={'class': 'form-control', 'placeholder': 'Enter your email address'}),
             'is_looking_for_room': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
@@ -143,7 +146,7 @@ class RoomForm(forms.ModelForm):
         fields = [
             'title', 'description',
             'room_type', 'amenities',
-            'city', 'neighborhood',
+            'city', 'neighborhood', 'zip_code',
             'price', 'available_from',  # Added available_from
             'halal_kitchen', 'prayer_friendly', 'guests_allowed',
             'contact_email',
@@ -157,6 +160,7 @@ class RoomForm(forms.ModelForm):
 
             'city': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'City'}),
             'neighborhood': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Neighborhood'}),
+            'zip_code': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'ZIP Code'}),
             
             'price': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'placeholder': 'Monthly Rent'}),
             'available_from': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),  # date picker
@@ -168,10 +172,26 @@ class RoomForm(forms.ModelForm):
             'guests_allowed': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
 
+class HeaderImageField(forms.ImageField):
+    """
+    ImageField that checks uploads from their header (see core.uploads.probe)
+    instead of forms.ImageField's full Image.verify() pass over the file.
+    """
+
+    def to_python(self, data):
+        f = forms.FileField.to_python(self, data)
+        if f is None:
+            return None
+        info = probe(f)
+        f.content_type = Image.MIME.get(info.format)
+        return f
+
+
 class RoomImageForm(forms.ModelForm):
     class Meta:
         model = RoomImage
         fields = ['image', 'is_primary']  # remove 'caption' if it doesn't exist
+        field_classes = {'image': HeaderImageField}
         widgets = {
             'image': forms.FileInput(attrs={'class': 'form-control'}),
             'is_primary': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
@@ -0,0 +1,112 @@
+"""
+ZIP code geocoding and radius search.
+
+Coordinates come from an offline ZIP centroid file, loaded once per process;
+no network access is needed. That is `settings.ZIP_CENTROIDS_FILE`, written by
+the `import_zip_centroids` command, or until it exists the small sample bundled
+in `core/data/zip_centroids.csv`. Profile and Room copy the centroid of their
+ZIP code into `latitude`/`longitude` on save.
+
+`within_radius` first narrows rows to a latitude/longitude bounding box, which
+is a range scan on the (latitude, longitude) index, and only then computes the
+exact haversine distance in SQL for the rows inside the box. The distance is
+annotated as `distance` (miles) so results can be ordered by it.
+"""
+import csv
+import math
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_MILES = 3958.8
+BUNDLED_ZIP_CENTROIDS_FILE = Path(__file__).resolve().parent / 'data' / 'zip_centroids.csv'
+
+DEFAULT_RADIUS_MILES = 10
+MAX_RADIUS_MILES = 100
+
+
+def normalize_zip(value):
+    """The 5-digit ZIP in `value` ("29401", " 29401-1234 "), or ''."""
+    digits = str(value or '').strip()[:5]
+    return digits if len(digits) == 5 and digits.isdigit() else ''
+
+
+def read_centroids(path):
+    """{zip: (latitude, longitude)} from a `zip,latitude,longitude` CSV; '#' lines are comments."""
+    with open(path, newline='') as f:
+        rows = csv.DictReader(line for line in f if not line.startswith('#'))
+        return {row['zip']: (float(row['latitude']), float(row['longitude'])) for row in rows}
+
+
+def centroids_file():
+    """The imported centroid file once it exists, else the bundled sample."""
+    path = getattr(settings, 'ZIP_CENTROIDS_FILE', None)
+    return Path(path) if path and Path(path).exists() else BUNDLED_ZIP_CENTROIDS_FILE
+
+
+@lru_cache(maxsize=1)
+def zip_centroids():
+    return read_centroids(centroids_file())
+
+
+def zip_centroid(zip_code):
+    """(latitude, longitude) of a ZIP code's centroid, or None if it is unknown."""
+    return zip_centroids().get(normalize_zip(zip_code))
+
+
+def bounding_box(latitude, longitude, miles):
+    """(min_lat, max_lat, min_lon, max_lon) of a box containing the circle of radius `miles`."""
+    angle = miles / EARTH_RADIUS_MILES
+    lat_delta = math.degrees(angle)
+    # Widest longitude span of a spherical cap; near the poles take every longitude
+    ratio = math.sin(angle) / max(math.cos(math.radians(latitude)), 1e-9)
+    lon_delta = math.degrees(math.asin(ratio)) if ratio < 1 else 180
+    return latitude - lat_delta, latitude + lat_delta, longitude - lon_delta, longitude + lon_delta
+
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    """Great-circle distance in miles between two points."""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+
+def distance_expression(latitude, longitude):
+    """SQL expression for the haversine distance in miles from a point to each row."""
+    lat0 = Value(math.radians(latitude), output_field=FloatField())
+    lon0 = Value(math.radians(longitude), output_field=FloatField())
+    dlat = Radians(F('latitude')) - lat0
+    dlon = Radians(F('longitude')) - lon0
+    a = Power(Sin(dlat / 2), 2) + Cos(lat0) * Cos(Radians(F('latitude'))) * Power(Sin(dlon / 2), 2)
+    return Value(2 * EARTH_RADIUS_MILES, output_field=FloatField()) * ASin(Sqrt(a))
+
+
+def within_radius(queryset, latitude, longitude, miles):
+    """Rows of `queryset` within `miles` of the point, annotated with `distance`."""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, miles)
+    return (
+        queryset.filter(
+            latitude__gte=min_lat, latitude__lte=max_lat,
+            longitude__gte=min_lon, longitude__lte=max_lon,
+        )
+        .annotate(distance=distance_expression(latitude, longitude))
+        .filter(distance__lte=miles)
+    )
+
+
+def near_zip(queryset, zip_code, miles=DEFAULT_RADIUS_MILES):
+    """Rows within `miles` of a ZIP code's centroid; none if the ZIP is unknown."""
+    centroid = zip_centroid(zip_code)
+    if centroid is None:
+        return queryset.none()
+    return within_radius(queryset, *centroid, min(miles, MAX_RADIUS_MILES))
+
+
+def locate(instance):
+    """Set `latitude`/`longitude` on a Profile or Room from its ZIP code."""
+    centroid = zip_centroid(instance.zip_code)
+    instance.latitude, instance.longitude = centroid if centroid else (None, None)
@@ -0,0 +1,124 @@
+"""
+Content-addressed storage for room images.
+
+An upload is stored under the SHA-256 of its bytes, as
+`room_images/<2 hex>/<sha256>.<ext>`, so identical photos attached to several
+listings share one file (and, because rendition paths derive from the file
+name, one set of renditions). The hash is computed while the upload streams
+in by the hashing upload handlers in `core.uploads`; files created in code are
+hashed here instead.
+
+A StoredImage row counts the RoomImages using each file. `retain` adds a
+reference (writing the file only for the first one) and `release` drops one,
+deleting the file and its renditions after commit once no reference is left.
+django_cleanup ignores RoomImage, since it would delete shared files.
+
+Images stored before content addressing have no StoredImage row; they are
+deleted as before when their last RoomImage goes, and the
+`dedupe_room_images` command moves them over.
+"""
+import hashlib
+import os
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F
+
+from . import renditions
+
+DIRECTORY = 'room_images'
+CHUNK_SIZE = 64 * 1024
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+
+def _models():
+    return apps.get_model('core', 'StoredImage'), apps.get_model('core', 'RoomImage')
+
+
+def storage():
+    return apps.get_model('core', 'RoomImage')._meta.get_field('image').storage
+
+
+def content_hash(file):
+    """Hex SHA-256 of a file: the digest computed while it was uploaded, if any."""
+    digest = getattr(file, 'sha256', None)
+    if digest:
+        return digest
+    sha256 = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+        sha256.update(chunk)
+    file.seek(0)
+    return sha256.hexdigest()
+
+
+def content_name(digest, extension):
+    return f'{DIRECTORY}/{digest[:2]}/{digest}.{extension.lstrip(".").lower()}'
+
+
+def retain(file, extension):
+    """
+    Store `file` under its content address, or reuse the stored copy of the
+    same bytes. Returns (storage name, whether the file was already stored).
+    """
+    StoredImage, _ = _models()
+    digest = content_hash(file)
+    with transaction.atomic():
+        stored, created = StoredImage.objects.get_or_create(
+            sha256=digest, defaults={'name': content_name(digest, extension)}
+        )
+        StoredImage.objects.filter(pk=stored.pk).update(ref_count=F('ref_count') + 1)
+
+    files = storage()
+    shared = not created and files.exists(stored.name)
+    if not shared:
+        file.seek(0)
+        saved = files.save(stored.name, file)
+        if saved != stored.name:
+            # A concurrent upload of the same bytes wrote it first
+            files.delete(saved)
+    return stored.name, shared
+
+
+def release(room_image):
+    """Drop one reference to `room_image`'s file; delete it once unused."""
+    StoredImage, RoomImage = _models()
+    name = room_image.image.name
+    if not name:
+        return
+    with transaction.atomic():
+        if StoredImage.objects.filter(name=name).update(ref_count=F('ref_count') - 1):
+            orphaned = StoredImage.objects.filter(name=name, ref_count__lte=0).delete()[0] > 0
+        else:
+            # Stored before content addressing
+            orphaned = not RoomImage.objects.filter(image=name).exists()
+    if orphaned:
+        transaction.on_commit(lambda: delete_files(name, room_image.renditions))
+
+
+def delete_files(name, rendition_paths=None):
+    """Delete a stored image and its renditions, unless it was uploaded again meanwhile."""
+    StoredImage, RoomImage = _models()
+    if StoredImage.objects.filter(name=name).exists() or RoomImage.objects.filter(image=name).exists():
+        return
+    files = storage()
+    paths = {name, *(rendition_paths or {}).values()}
+    paths.update(renditions.rendition_path(name, rendition) for rendition in renditions.RENDITIONS)
+    for path in paths:
+        files.delete(path)
+
+
+def shared_renditions(name, exclude_pk=None):
+    """
+    (renditions, dominant colour) already generated for another RoomImage
+    using the file `name`, or ({}, '').
+    """
+    _, RoomImage = _models()
+    siblings = RoomImage.objects.filter(image=name).exclude(pk=exclude_pk).exclude(renditions={})
+    return siblings.values_list('renditions', 'dominant_color').first() or ({}, '')
+
+
+def extension_for(file, image_format=None):
+    if image_format in EXTENSIONS:
+        return EXTENSIONS[image_format]
+    return os.path.splitext(getattr(file, 'name', '') or '')[1].lstrip('.') or 'jpg'
@@ -0,0 +1,50 @@
+"""
+Case-insensitive location lookups that can use the LOWER(...) expression
+indexes on Profile and Room.
+
+Django's own `iexact`/`istartswith` compile to `UPPER(col) = UPPER(%s)` or
+`LIKE ... ESCAPE`, which no index serves. These helpers compare `LOWER(col)`
+against an already-lowercased value instead, so the planner can seek straight
+into the functional index.
+"""
+from django.db.models import Q
+
+
+def iexact_q(field, value):
+    """Indexed case-insensitive equality."""
+    return Q(**{f'{field}__lower': value.strip().lower()})
+
+
+def istartswith_q(field, prefix):
+    """
+    Indexed case-insensitive prefix match: a range scan on LOWER(col) between
+    the prefix and its successor, with `startswith` as an exact recheck.
+    """
+    prefix = prefix.strip().lower()
+    if not prefix:
+        return Q()
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{
+        f'{field}__lower__gte': prefix,
+        f'{field}__lower__lt': upper,
+        f'{field}__lower__startswith': prefix,
+    })
+
+
+def location_q(field, value, known_values):
+    """
+    Filter `field` by user input, using the cheapest lookup that keeps the old
+    substring semantics given the values known to exist (the facet list):
+
+    * a value picked from the dropdown matches exactly;
+    * text that only ever occurs at the start of known values is a prefix;
+    * anything else is free text and falls back to an unindexed substring.
+    """
+    needle = value.strip().lower()
+    known = {v.lower() for v in known_values if v}
+    if needle in known:
+        return iexact_q(field, needle)
+    containing = [v for v in known if needle in v]
+    if containing and all(v.startswith(needle) for v in containing):
+        return istartswith_q(field, needle)
+    return Q(**{f'{field}__icontains': value})
@@ -0,0 +1,73 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from PIL import Image
+
+from core import renditions, uploads
+from core.models import RoomImage
+
+FIELDS = ['width', 'height', 'byte_size', 'dominant_color']
+
+
+def read_metadata(room_image):
+    """{field: value} for an image, read from its file (and its smallest rendition for the colour)."""
+    storage = room_image.image.storage
+    with room_image.image.open('rb') as file:
+        info = uploads.probe(file)
+    metadata = {'width': info.width, 'height': info.height, 'byte_size': storage.size(room_image.image.name)}
+
+    smallest = min(renditions.RENDITIONS, key=lambda name: renditions.RENDITIONS[name][0])
+    source = room_image.renditions.get(smallest) if renditions.is_current(room_image) else None
+    with storage.open(source or room_image.image.name, 'rb') as file, Image.open(file) as image:
+        image.draft('RGB', renditions.RENDITIONS[smallest])
+        image.thumbnail(renditions.RENDITIONS[smallest])
+        metadata['dominant_color'] = renditions.dominant_color(image)
+    return metadata
+
+
+class Command(BaseCommand):
+    help = 'Store width, height, byte size and dominant colour on room images uploaded without them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Number of images to update per batch',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        missing = Q(width__isnull=True) | Q(height__isnull=True) | Q(byte_size__isnull=True) | Q(dominant_color='')
+        images = RoomImage.objects.exclude(image='').filter(missing).order_by('pk')
+
+        # Files can be shared between rows: read each one once
+        by_name = {}
+        changed = []
+        updated = failed = 0
+        for room_image in images.iterator(chunk_size=batch_size):
+            name = room_image.image.name
+            if name not in by_name:
+                try:
+                    by_name[name] = read_metadata(room_image)
+                except (OSError, ValidationError, Image.DecompressionBombError):
+                    by_name[name] = None
+            if by_name[name] is None:
+                failed += 1
+                continue
+            for field, value in by_name[name].items():
+                setattr(room_image, field, value)
+            changed.append(room_image)
+            if len(changed) >= batch_size:
+                with transaction.atomic():
+                    RoomImage.objects.bulk_update(changed, FIELDS)
+                updated += len(changed)
+                changed = []
+        if changed:
+            with transaction.atomic():
+                RoomImage.objects.bulk_update(changed, FIELDS)
+            updated += len(changed)
+
+        self.stdout.write(f'Updated {updated} images ({failed} unreadable)')
+        self.stdout.write(self.style.SUCCESS('Room image metadata backfilled!'))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import MetroAreaPlace, Profile, Room, metro_lookup_name
+
+
+class Command(BaseCommand):
+    help = 'Recompute the metro area of every profile and room from the metro area places table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows to update per batch',
+        )
+
+    def handle(self, *args, **options):
+        places = dict(MetroAreaPlace.objects.values_list('name', 'metro_area__slug'))
+        batch_size = options['batch_size']
+
+        for model in (Profile, Room):
+            changed = []
+            updated = 0
+            rows = model.objects.only('id', 'city', 'neighborhood', 'metro').order_by('pk')
+            for obj in rows.iterator(chunk_size=batch_size):
+                metro = places.get(metro_lookup_name(obj.city, obj.neighborhood), '')
+                if obj.metro != metro:
+                    obj.metro = metro
+                    changed.append(obj)
+                if len(changed) >= batch_size:
+                    with transaction.atomic():
+                        model.objects.bulk_update(changed, ['metro'])
+                    updated += len(changed)
+                    changed = []
+            if changed:
+                with transaction.atomic():
+                    model.objects.bulk_update(changed, ['metro'])
+                updated += len(changed)
+            self.stdout.write(f'Updated {updated} {model._meta.verbose_name_plural.lower()}')
+
+        self.stdout.write(self.style.SUCCESS('Metro areas backfilled!'))
@@ -0,0 +1,50 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+
+from core import image_store, uploads
+from core.models import RoomImage, StoredImage
+
+
+class Command(BaseCommand):
+    help = 'Move room images stored before content addressing to shared, reference-counted files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Number of images to load per batch',
+        )
+
+    def handle(self, *args, **options):
+        stored_names = set(StoredImage.objects.values_list('name', flat=True))
+        images = RoomImage.objects.exclude(image='').order_by('pk')
+        moved = shared = missing = 0
+        for room_image in images.iterator(chunk_size=options['batch_size']):
+            old_name = room_image.image.name
+            if old_name in stored_names:
+                continue
+            try:
+                with room_image.image.open('rb') as file:
+                    try:
+                        image_format = uploads.probe(file).format
+                    except ValidationError:
+                        image_format = None
+                    name, reused = image_store.retain(file, image_store.extension_for(room_image.image, image_format))
+            except OSError:
+                missing += 1
+                continue
+
+            renditions, color = image_store.shared_renditions(name, room_image.pk) if reused else ({}, '')
+            RoomImage.objects.filter(pk=room_image.pk).update(
+                image=name, renditions=renditions, dominant_color=color or room_image.dominant_color
+            )
+            stored_names.add(name)
+            # Deletes the old file and renditions once no other row uses them
+            image_store.release(RoomImage(image=old_name, renditions=room_image.renditions))
+            moved += 1
+            shared += reused
+
+        self.stdout.write(f'Moved {moved} images ({shared} onto an existing file, {missing} files missing)')
+        self.stdout.write('Run generate_renditions to render images that lost their renditions')
+        self.stdout.write(self.style.SUCCESS('Room images deduplicated!'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from core import renditions
+from core.models import RoomImage
+
+
+class Command(BaseCommand):
+    help = 'Generate the card/detail/admin renditions of room images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Number of images to load per batch',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Regenerate every image, not only those missing renditions',
+        )
+
+    def handle(self, *args, **options):
+        images = RoomImage.objects.exclude(image='').order_by('pk')
+        generated = failed = 0
+        for image in images.iterator(chunk_size=options['batch_size']):
+            if not options['all'] and renditions.is_current(image):
+                continue
+            if renditions.generate_for(image.pk) is None:
+                failed += 1
+            else:
+                generated += 1
+        self.stdout.write(f'Generated renditions for {generated} images ({failed} failed)')
+        self.stdout.write(self.style.SUCCESS('Room image renditions generated!'))
@@ -0,0 +1,69 @@
+import csv
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import geo
+from core.models import Profile, Room
+
+
+class Command(BaseCommand):
+    help = 'Import ZIP centroids from a US Census ZCTA gazetteer file and relocate profiles and rooms'
+
+    def add_arguments(self, parser):
+        parser.add_argument('gazetteer', help='Tab-separated Census ZCTA gazetteer file (GEOID, INTPTLAT, INTPTLONG columns)')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows to update per batch',
+        )
+
+    def handle(self, *args, **options):
+        # The bundled sample is tracked in the repository, so imports go elsewhere
+        path = getattr(settings, 'ZIP_CENTROIDS_FILE', None)
+        if not path:
+            raise CommandError('Set ZIP_CENTROIDS_FILE to the file the imported centroids should be written to')
+        path = Path(path)
+        if path.resolve() == geo.BUNDLED_ZIP_CENTROIDS_FILE:
+            raise CommandError('ZIP_CENTROIDS_FILE must not point at the bundled sample file')
+
+        centroids = {}
+        with open(options['gazetteer'], newline='') as f:
+            reader = csv.DictReader(f, delimiter='\t')
+            # Census files pad the last header with spaces
+            reader.fieldnames = [name.strip() for name in reader.fieldnames]
+            missing = {'GEOID', 'INTPTLAT', 'INTPTLONG'} - set(reader.fieldnames)
+            if missing:
+                raise CommandError(f'Gazetteer file is missing columns: {", ".join(sorted(missing))}')
+            for row in reader:
+                zip_code = geo.normalize_zip(row['GEOID'])
+                if zip_code:
+                    centroids[zip_code] = (float(row['INTPTLAT']), float(row['INTPTLONG']))
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', newline='') as f:
+            f.write('# ZIP code centroids (ZCTA internal points) from the US Census gazetteer.\n')
+            writer = csv.writer(f)
+            writer.writerow(['zip', 'latitude', 'longitude'])
+            for zip_code in sorted(centroids):
+                writer.writerow([zip_code, *centroids[zip_code]])
+        self.stdout.write(f'Wrote {len(centroids)} ZIP centroids to {path}')
+
+        geo.zip_centroids.cache_clear()
+        batch_size = options['batch_size']
+        for model in (Profile, Room):
+            changed = []
+            rows = model.objects.only('id', 'zip_code', 'latitude', 'longitude').order_by('pk')
+            for obj in rows.iterator(chunk_size=batch_size):
+                before = (obj.latitude, obj.longitude)
+                geo.locate(obj)
+                if (obj.latitude, obj.longitude) != before:
+                    changed.append(obj)
+            with transaction.atomic():
+                model.objects.bulk_update(changed, ['latitude', 'longitude'], batch_size=batch_size)
+            self.stdout.write(f'Relocated {len(changed)} {model._meta.verbose_name_plural.lower()}')
+
+        self.stdout.write(self.style.SUCCESS('ZIP centroids imported!'))
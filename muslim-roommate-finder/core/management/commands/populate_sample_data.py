@@ -4,6 +4,7 @@ from core.models import (
     Profile, RoomType, Amenity, Room, RoomImage, 
     RoommateProfile, Contact, Message
 )
+from core.slugs import assign_slugs
 from decimal import Decimal
 import random
 from datetime import date, timedelta
@@ -126,33 +127,40 @@ class Command(BaseCommand):
         amenities = list(Amenity.objects.all())
         profiles = list(Profile.objects.all())
 
-        for i in range(15):
+        # Titles are the natural key here; skip rooms created by an earlier run
+        titles = {i: f'Sample Room {i+1} in {random.choice(cities)}' for i in range(15)}
+        existing = set(Room.objects.filter(title__in=titles.values()).values_list('title', flat=True))
+
+        new_rooms = []
+        for i, title in titles.items():
+            if title in existing:
+                continue
             room_type = random.choice(room_types)
             owner = random.choice(profiles)
-            city = random.choice(cities)
+            city = title.rsplit(' in ', 1)[1]
             neighborhood = random.choice(neighborhoods)
-            
-            room, created = Room.objects.get_or_create(
-                title=f'Sample Room {i+1} in {city}',
-                defaults={
-                    'user': owner,
-                    'description': f'This is a beautiful {room_type.name.lower()} in {neighborhood}, {city}. Perfect for students and professionals.',
-                    'room_type': room_type,
-                    'city': city,
-                    'neighborhood': neighborhood,
-                    'price': Decimal(str(random.randint(600, 1200))),
-                    'available_from': date.today() + timedelta(days=random.randint(1, 30)),
-                    'halal_kitchen': random.choice([True, False]),
-                    'prayer_friendly': random.choice([True, False]),
-                    'guests_allowed': random.choice([True, False]),
-                    'contact_email': owner.contact_email or owner.user.email,
-                    'is_active': True,
-                }
-            )
+            new_rooms.append(Room(
+                title=title,
+                user=owner,
+                description=f'This is a beautiful {room_type.name.lower()} in {neighborhood}, {city}. Perfect for students and professionals.',
+                room_type=room_type,
+                city=city,
+                neighborhood=neighborhood,
+                price=Decimal(str(random.randint(600, 1200))),
+                available_from=date.today() + timedelta(days=random.randint(1, 30)),
+                halal_kitchen=random.choice([True, False]),
+                prayer_friendly=random.choice([True, False]),
+                guests_allowed=random.choice([True, False]),
+                contact_email=owner.contact_email or owner.user.email,
+                is_active=True,
+            ))
 
-            if created:
-                # Add random amenities
-                room.amenities.set(random.sample(amenities, random.randint(2, 5)))
+        # One slug query per distinct title instead of one per candidate slug
+        assign_slugs(new_rooms, lambda room: room.title, lambda room: 'room')
+        for room in new_rooms:
+            room.save()
+            # Add random amenities
+            room.amenities.set(random.sample(amenities, random.randint(2, 5)))
 
         self.stdout.write(
             self.style.SUCCESS('Successfully populated sample data!')
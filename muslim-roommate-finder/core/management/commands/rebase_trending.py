@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core import trending
+
+
+class Command(BaseCommand):
+    help = 'Move the trending epoch to now and rescale room scores (schedule daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Recompute the scores from recent favorites and messages instead of rescaling them',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            trending_rooms = trending.rebuild()
+        else:
+            trending_rooms = trending.rebase()
+        self.stdout.write(f'{trending_rooms} room(s) trending')
+        self.stdout.write(self.style.SUCCESS('Trending scores rebased!'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import matching
+
+
+class Command(BaseCommand):
+    help = 'Rescore every room seeker against every active room and rebuild the match lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of seekers or rooms to score per batch',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            seekers, rooms = matching.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(f'Scored {seekers} seekers against {rooms} rooms')
+        self.stdout.write(self.style.SUCCESS('Room matches rebuilt!'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Profile, Room
+from core.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for rooms and profiles from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows to index per batch',
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f'Rebuilding search index with {type(backend).__name__}...')
+
+        for model in (Room, Profile):
+            with transaction.atomic():
+                total = backend.rebuild(model, batch_size=options['batch_size'])
+            self.stdout.write(f'Indexed {total} {model._meta.verbose_name_plural.lower()}')
+
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt!'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import similarity
+
+
+class Command(BaseCommand):
+    help = 'Re-encode every profile and recompute all precomputed similar profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of profiles to score per batch',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = similarity.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(f'Scored {total} profiles')
+        self.stdout.write(self.style.SUCCESS('Similar profiles rebuilt!'))
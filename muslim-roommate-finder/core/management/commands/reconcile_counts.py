@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core import counts
+
+
+class Command(BaseCommand):
+    help = 'Recount the maintained listing row counters (after bulk updates or imports)'
+
+    def handle(self, *args, **options):
+        for name in counts.COUNTERS:
+            self.stdout.write(f'{name}: {counts.recount(name)}')
+        self.stdout.write(self.style.SUCCESS('Row counters reconciled!'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core import ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute room review counts, averages and star histograms from the reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        fixed = ratings.reconcile(batch_size=options['batch_size'])
+        self.stdout.write(f'{fixed} room(s) had drifted')
+        self.stdout.write(self.style.SUCCESS('Room ratings reconciled!'))
@@ -0,0 +1,322 @@
+"""
+Compatibility scores between room seekers and room listings.
+
+Seekers (profiles with `is_looking_for_room`) and active rooms are loaded as
+two NumPy matrices, and every seeker/room pair in a block is scored at once
+with array broadcasting on:
+
+* location: same city, else same metro area;
+* rent against the seeker's RoommateProfile budget (full marks at or under
+  budget, falling to zero at `BUDGET_TOLERANCE` over it);
+* the halal kitchen / prayer-friendly preferences, which a room either meets
+  or misses, and guests being allowed.
+
+The best `MATCHES_PER_LIST` rooms of each seeker and the best seekers of each
+room are stored as RoomMatch rows (side "seeker" and "room"), so "best rooms
+for you" is one indexed lookup.
+
+Saving a seeker or a room (when a scored field was written) rescores it after
+the save commits (see core.rescoring): only the other side is loaded, to
+score that one row against it. The opposite lists it can enter are found
+from their last (rank-N) rows rather than by grouping every list, and it is
+merged into them, and into the lists that named it, without rescoring their
+other entries. Only a full list it dropped off the end of is recomputed, which
+reads its own side too. `rebuild()` (the `rebuild_room_matches` command)
+recomputes everything, `REFRESH_BATCH` lists per block.
+"""
+import numpy as np
+from django.db import transaction
+
+from .models import Profile, Room, RoomMatch
+from .similarity import place_code
+
+MATCHES_PER_LIST = 10
+BUDGET_TOLERANCE = 0.25
+# Lists recomputed per scoring block, bounding the (block x other side) matrix
+REFRESH_BATCH = 500
+
+WEIGHTS = {
+    'city': 3.0,
+    'metro': 1.5,
+    'budget': 2.0,
+    'preference': 1.0,
+    'guests': 0.5,
+}
+
+# Columns shared by both matrices
+OWNER, PRICE, PRICE_KNOWN, HALAL, PRAYER, GUESTS, CITY, METRO = range(8)
+MATRIX_WIDTH = 8
+
+SEEKER_FIELDS = ['id', 'halal_kitchen', 'prayer_friendly', 'guests_allowed', 'city', 'metro', 'roommate_profile__budget']
+ROOM_FIELDS = ['id', 'user_id', 'price', 'halal_kitchen', 'prayer_friendly', 'guests_allowed', 'city', 'metro']
+
+
+def seekers():
+    return Profile.objects.filter(is_looking_for_room=True)
+
+
+def active_rooms():
+    return Room.objects.filter(is_active=True)
+
+
+def encode_seeker(row):
+    """Seeker row: OWNER holds the profile id so seekers never match their own rooms."""
+    vector = np.zeros(MATRIX_WIDTH)
+    vector[OWNER] = row['id']
+    if row['roommate_profile__budget']:
+        vector[PRICE] = row['roommate_profile__budget']
+        vector[PRICE_KNOWN] = 1
+    vector[HALAL] = row['halal_kitchen']
+    vector[PRAYER] = row['prayer_friendly']
+    vector[GUESTS] = row['guests_allowed']
+    vector[CITY] = place_code(row['city'])
+    vector[METRO] = place_code(row['metro'])
+    return vector
+
+
+def encode_room(row):
+    vector = np.zeros(MATRIX_WIDTH)
+    vector[OWNER] = row['user_id']
+    vector[PRICE] = row['price']
+    vector[PRICE_KNOWN] = 1
+    vector[HALAL] = row['halal_kitchen']
+    vector[PRAYER] = row['prayer_friendly']
+    vector[GUESTS] = row['guests_allowed']
+    vector[CITY] = place_code(row['city'])
+    vector[METRO] = place_code(row['metro'])
+    return vector
+
+
+def load(queryset, fields, encoder):
+    """(ids, matrix) for a queryset, one query."""
+    rows = list(queryset.order_by('pk').values(*fields))
+    ids = np.array([row['id'] for row in rows], dtype=np.int64)
+    matrix = np.array([encoder(row) for row in rows]).reshape(len(rows), MATRIX_WIDTH)
+    return ids, matrix
+
+
+def load_seekers():
+    return load(seekers(), SEEKER_FIELDS, encode_seeker)
+
+
+def load_rooms():
+    return load(active_rooms(), ROOM_FIELDS, encode_room)
+
+
+def _same(s, r, column):
+    left = s[:, column][:, None]
+    return (left == r[:, column][None, :]) & (left != 0)
+
+
+def scores(s, r):
+    """Compatibility of every seeker row with every room row, shape (len(s), len(r))."""
+    w = WEIGHTS
+    total = w['city'] * _same(s, r, CITY) + w['metro'] * (_same(s, r, METRO) & ~_same(s, r, CITY))
+
+    budget = s[:, PRICE][:, None]
+    over = np.maximum(r[:, PRICE][None, :] - budget, 0) / np.where(budget > 0, budget, 1)
+    budget_fit = np.clip(1 - over / BUDGET_TOLERANCE, 0, 1)
+    # Seekers without a budget get half marks for every room
+    total = total + w['budget'] * np.where(s[:, PRICE_KNOWN][:, None] > 0, budget_fit, 0.5)
+
+    for column in (HALAL, PRAYER):
+        wants = s[:, column][:, None] > 0
+        has = r[:, column][None, :] > 0
+        total = total + w['preference'] * (wants & has) - w['preference'] * (wants & ~has)
+    total = total + w['guests'] * ((s[:, GUESTS][:, None] > 0) == (r[:, GUESTS][None, :] > 0))
+
+    return np.where(s[:, OWNER][:, None] == r[:, OWNER][None, :], -np.inf, total)
+
+
+def top_matches(block, ids, k=MATCHES_PER_LIST):
+    """
+    Best `k` columns of each row of `block` as [[(id, score), ...], ...], best
+    first with ties broken by id. Impossible pairs (-inf) are left out.
+    """
+    k = min(k, block.shape[1])
+    if k == 0:
+        return [[] for _ in range(block.shape[0])]
+    # The k-th best score of each row; columns tied with it are taken lowest id
+    # first (ids ascend with the columns), so lists don't depend on partition order
+    kth = -np.partition(-block, k - 1, axis=1)[:, k - 1:k]
+    tied = block == kth
+    needed = k - (block > kth).sum(axis=1, keepdims=True)
+    chosen = (block > kth) | (tied & (np.cumsum(tied, axis=1) <= needed))
+    top = np.nonzero(chosen)[1].reshape(block.shape[0], k)
+    top_scores = np.take_along_axis(block, top, axis=1)
+    order = np.lexsort((ids[top], -top_scores), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    return [
+        [(int(ids[c]), float(v)) for c, v in zip(row, row_scores) if np.isfinite(v)]
+        for row, row_scores in zip(top, top_scores)
+    ]
+
+
+def _store(side, lists):
+    """Replace the `side` lists of the given owners: {owner_id: [(other_id, score), ...]}."""
+    owner, other = ('seeker_id', 'room_id') if side == 'seeker' else ('room_id', 'seeker_id')
+    RoomMatch.objects.filter(side=side, **{f'{owner}__in': list(lists)}).delete()
+    RoomMatch.objects.bulk_create([
+        RoomMatch(side=side, rank=rank, score=score, **{owner: pk, other: other_pk})
+        for pk, matches in lists.items()
+        for rank, (other_pk, score) in enumerate(matches, 1)
+    ])
+
+
+def _blocks(pks, data, queryset, fields, encoder, batch_size):
+    """
+    (ids, matrix) blocks of the rows `pks`, taken from `data` when it is
+    already loaded, else read `batch_size` rows at a time.
+    """
+    pks = sorted(set(pks))
+    if data is not None:
+        ids, matrix = data
+        rows = np.flatnonzero(np.isin(ids, pks))
+        for start in range(0, len(rows), batch_size):
+            block = rows[start:start + batch_size]
+            yield ids[block], matrix[block]
+        return
+    for start in range(0, len(pks), batch_size):
+        yield load(queryset.filter(pk__in=pks[start:start + batch_size]), fields, encoder)
+
+
+def refresh_seekers(profile_ids, seeker_data=None, room_data=None, batch_size=REFRESH_BATCH):
+    """Recompute the room lists of the given seekers, `batch_size` seekers per block."""
+    room_ids, r = room_data or load_rooms()
+    for ids, s in _blocks(profile_ids, seeker_data, seekers(), SEEKER_FIELDS, encode_seeker, batch_size):
+        _store('seeker', dict(zip(ids.tolist(), top_matches(scores(s, r), room_ids))))
+
+
+def refresh_rooms(room_pks, seeker_data=None, room_data=None, batch_size=REFRESH_BATCH):
+    """Recompute the seeker lists of the given rooms, `batch_size` rooms per block."""
+    seeker_ids, s = seeker_data or load_seekers()
+    for ids, r in _blocks(room_pks, room_data, active_rooms(), ROOM_FIELDS, encode_room, batch_size):
+        _store('room', dict(zip(ids.tolist(), top_matches(scores(s, r).T, seeker_ids))))
+
+
+def listed_by(side, other_pk):
+    """
+    Owners of the `side` lists that include `other_pk`: the rooms listing a
+    seeker (side "room") or the seekers listing a room (side "seeker").
+    """
+    owner, other = ('seeker_id', 'room_id') if side == 'seeker' else ('room_id', 'seeker_id')
+    return list(RoomMatch.objects.filter(side=side, **{other: other_pk}).values_list(owner, flat=True))
+
+
+def _ranks_before(score, pk, other_score, other_pk):
+    """Whether (score, pk) is listed ahead of (other_score, other_pk): higher score, then lower id."""
+    return (-score, pk) < (-other_score, other_pk)
+
+
+def _lists_to_refresh(side, score_for, changed_id):
+    """
+    Owners on `side` whose list can change because `changed_id` was rescored
+    to `score_for` ({owner_id: score}): lists that named it, lists that are
+    not full (no rank-N row; other saves may still be waiting to be merged
+    into them, so counting rows elsewhere would not tell), and full lists
+    whose last entry it now beats. Only the rank-N rows are read, one per
+    list, instead of grouping every list.
+    """
+    owner, other = ('seeker_id', 'room_id') if side == 'seeker' else ('room_id', 'seeker_id')
+    affected = set(listed_by(side, changed_id))
+    finite = {pk: score for pk, score in score_for.items() if np.isfinite(score)}
+    if not finite:
+        return affected
+    tails = RoomMatch.objects.filter(side=side, rank=MATCHES_PER_LIST)
+    last = {pk: (last_pk, lowest) for pk, last_pk, lowest in tails.values_list(owner, other, 'score')}
+    for pk, score in finite.items():
+        if pk not in last or _ranks_before(score, changed_id, last[pk][1], last[pk][0]):
+            affected.add(pk)
+    return affected
+
+
+def _merge(side, owner_ids, changed_id, score_for, batch_size=REFRESH_BATCH):
+    """
+    Put `changed_id` into the `side` lists of `owner_ids` at its new score
+    (leaving it out where `score_for` has none), without rescoring the rest of
+    each list. A full list that named it and now ranks it below its old last
+    entry may have to take in a row it never listed, so those owners are
+    returned for a full refresh instead.
+    """
+    owner, other = ('seeker_id', 'room_id') if side == 'seeker' else ('room_id', 'seeker_id')
+    owner_ids = sorted(owner_ids)
+    recompute = set()
+    for start in range(0, len(owner_ids), batch_size):
+        block = owner_ids[start:start + batch_size]
+        current = {pk: [] for pk in block}
+        rows = RoomMatch.objects.filter(side=side, **{f'{owner}__in': block}).order_by(owner, 'rank')
+        for pk, other_pk, score in rows.values_list(owner, other, 'score'):
+            current[pk].append((other_pk, score))
+
+        merged = {}
+        for pk, entries in current.items():
+            score = score_for.get(pk, -np.inf)
+            kept = [entry for entry in entries if entry[0] != changed_id]
+            if len(kept) < len(entries) and len(entries) == MATCHES_PER_LIST:
+                last_pk, lowest = entries[-1]
+                if not np.isfinite(score) or not _ranks_before(score, changed_id, lowest, last_pk):
+                    recompute.add(pk)
+                    continue
+            if np.isfinite(score):
+                kept.append((changed_id, score))
+            merged[pk] = sorted(kept, key=lambda entry: (-entry[1], entry[0]))[:MATCHES_PER_LIST]
+        _store(side, merged)
+    return recompute
+
+
+def update_seeker(profile_id):
+    """
+    Rescore one profile after a save, as a seeker if it is looking for a room.
+    Only the rooms are loaded: room lists take the seeker in (or drop it) by
+    merging, and only lists it fell off the end of are recomputed in full.
+    """
+    row = seekers().filter(pk=profile_id).values(*SEEKER_FIELDS).first()
+    with transaction.atomic():
+        if row is None:
+            score_for, room_data = {}, None
+            RoomMatch.objects.filter(side='seeker', seeker_id=profile_id).delete()
+        else:
+            room_data = load_rooms()
+            room_ids, r = room_data
+            row_scores = scores(encode_seeker(row)[None, :], r)
+            _store('seeker', {profile_id: top_matches(row_scores, room_ids)[0]})
+            score_for = dict(zip(room_ids.tolist(), row_scores[0].tolist()))
+        affected = _lists_to_refresh('room', score_for, profile_id)
+        recompute = _merge('room', affected, profile_id, score_for)
+        if recompute:
+            refresh_rooms(recompute, room_data=room_data)
+
+
+def update_room(room_pk):
+    """
+    Rescore one room after a save; inactive rooms drop out of every list. Only
+    the seekers are loaded, as in `update_seeker`.
+    """
+    row = active_rooms().filter(pk=room_pk).values(*ROOM_FIELDS).first()
+    with transaction.atomic():
+        if row is None:
+            score_for, seeker_data = {}, None
+            RoomMatch.objects.filter(side='room', room_id=room_pk).delete()
+        else:
+            seeker_data = load_seekers()
+            seeker_ids, s = seeker_data
+            column = scores(s, encode_room(row)[None, :])[:, 0]
+            _store('room', {room_pk: top_matches(column[None, :], seeker_ids)[0]})
+            score_for = dict(zip(seeker_ids.tolist(), column.tolist()))
+        affected = _lists_to_refresh('seeker', score_for, room_pk)
+        recompute = _merge('seeker', affected, room_pk, score_for)
+        if recompute:
+            refresh_seekers(recompute, seeker_data=seeker_data)
+
+
+def rebuild(batch_size=REFRESH_BATCH):
+    """Recompute every list. Returns (seeker count, room count)."""
+    seeker_data = load_seekers()
+    room_data = load_rooms()
+    seeker_ids, _ = seeker_data
+    room_ids, _ = room_data
+    RoomMatch.objects.all().delete()
+    refresh_seekers(seeker_ids.tolist(), seeker_data, room_data, batch_size)
+    refresh_rooms(room_ids.tolist(), seeker_data, room_data, batch_size)
+    return len(seeker_ids), len(room_ids)
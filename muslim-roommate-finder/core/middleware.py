@@ -0,0 +1,126 @@
+"""
+Per-request SQL instrumentation and query budgets.
+
+QueryBudgetMiddleware wraps every database connection for the duration of a
+request and records how many queries ran, how long they took in total, and
+how many were repeats:
+
+* duplicate queries: identical SQL *and* parameters run more than once;
+* similar queries: the same SQL with different parameters (the N+1 shape).
+
+In DEBUG the numbers are returned as `X-DB-*` response headers; otherwise they
+are logged to the `core.queries` logger. Views declare how many queries they
+may run with the `@query_budget(n)` decorator. Going over budget is logged as a
+warning, and raises QueryBudgetExceeded when `QUERY_BUDGET_ENFORCE` is on (the
+test suite turns it on so regressions fail loudly).
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('core.queries')
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a view runs more queries than its declared budget."""
+
+
+def query_budget(max_queries):
+    """Declare the maximum number of SQL queries a view may run per request."""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+class QueryStats:
+    """execute_wrapper that tallies queries for one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.executions = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+            self.executions[(sql, repr(params))] += 1
+
+    @property
+    def duplicates(self):
+        return sum(n - 1 for n in self.executions.values() if n > 1)
+
+    @property
+    def similar(self):
+        return sum(n - 1 for n in self.statements.values() if n > 1)
+
+    def most_repeated(self):
+        if not self.statements:
+            return None, 0
+        return self.statements.most_common(1)[0]
+
+
+def view_name(view_func):
+    if view_func is None:
+        return 'unknown'
+    # Admin and class-based views are wrapped; fall back to the wrapped name
+    func = getattr(view_func, 'view_class', None) or view_func
+    return f"{func.__module__}.{getattr(func, '__qualname__', type(func).__name__)}"
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        request.query_stats = stats
+        request.query_budget_view = None
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+
+        view_func = request.query_budget_view
+        budget = getattr(view_func, 'query_budget', None)
+        name = view_name(view_func)
+        over_budget = budget is not None and stats.count > budget
+
+        if settings.DEBUG:
+            response['X-DB-Query-Count'] = str(stats.count)
+            response['X-DB-Time-Ms'] = f'{stats.duration * 1000:.1f}'
+            response['X-DB-Duplicate-Queries'] = str(stats.duplicates)
+            response['X-DB-Similar-Queries'] = str(stats.similar)
+            if budget is not None:
+                response['X-DB-Query-Budget'] = str(budget)
+        else:
+            logger.info(
+                '%s %s view=%s queries=%d db_ms=%.1f duplicates=%d similar=%d',
+                request.method, request.path, name, stats.count,
+                stats.duration * 1000, stats.duplicates, stats.similar,
+            )
+
+        if over_budget:
+            sql, repeats = stats.most_repeated()
+            message = (
+                f'{name} ran {stats.count} queries, over its budget of {budget} '
+                f'(most repeated, {repeats}x: {sql})'
+            )
+            logger.warning(message)
+            if getattr(settings, 'QUERY_BUDGET_ENFORCE', False):
+                raise QueryBudgetExceeded(message)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget_view = view_func
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+SEARCH_TABLES = {
+    "core_room": ("core_room_search", ("title", "city", "neighborhood", "description")),
+    "core_profile": ("core_profile_search", ("name", "city", "neighborhood", "bio")),
+}
+
+POSTGRES_WEIGHT_LABELS = ("A", "B", "B", "C")
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for source, (table, fields) in SEARCH_TABLES.items():
+        if vendor == "sqlite":
+            columns = ", ".join(f"coalesce({f}, '')" for f in fields)
+            schema_editor.execute(f"CREATE VIRTUAL TABLE {table} USING fts5({', '.join(fields)})")
+            schema_editor.execute(f"INSERT INTO {table} (rowid, {', '.join(fields)}) SELECT id, {columns} FROM {source}")
+        elif vendor == "postgresql":
+            document = " || ".join(
+                f"setweight(to_tsvector('english', coalesce({f}, '')), '{label}')"
+                for f, label in zip(fields, POSTGRES_WEIGHT_LABELS)
+            )
+            schema_editor.execute(
+                f"CREATE TABLE {table} ("
+                f"object_id bigint PRIMARY KEY REFERENCES {source} (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                f"document tsvector NOT NULL)"
+            )
+            schema_editor.execute(f"CREATE INDEX {table}_document_gin ON {table} USING gin (document)")
+            schema_editor.execute(f"INSERT INTO {table} (object_id, document) SELECT id, {document} FROM {source}")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor not in ("sqlite", "postgresql"):
+        return
+    for table, _ in SEARCH_TABLES.values():
+        schema_editor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0006_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_search_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MetroArea",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, verbose_name="Metro Area")),
+                ("slug", models.SlugField(unique=True, verbose_name="URL Slug")),
+            ],
+            options={
+                "verbose_name": "Metro Area",
+                "verbose_name_plural": "Metro Areas",
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="MetroAreaPlace",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=100, unique=True, verbose_name="City or Neighborhood"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Metro Area Place",
+                "verbose_name_plural": "Metro Area Places",
+                "ordering": ["name"],
+            },
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="metro",
+            field=models.SlugField(
+                blank=True, db_index=False, editable=False, verbose_name="Metro Area"
+            ),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="metro",
+            field=models.SlugField(
+                blank=True, db_index=False, editable=False, verbose_name="Metro Area"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(
+                fields=["metro", "created_at"], name="core_profil_metro_877994_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(
+                fields=["metro", "created_at"], name="core_room_metro_6ac949_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="metroareaplace",
+            name="metro_area",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="places",
+                to="core.metroarea",
+                verbose_name="Metro Area",
+            ),
+        ),
+    ]
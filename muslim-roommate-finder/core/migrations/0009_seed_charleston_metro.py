@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# The areas previously hard-coded in the charleston_only filter and the
+# similar-profiles metro fallback.
+CHARLESTON_PLACES = [
+    "charleston",
+    "charleston county",
+    "downtown",
+    "james island",
+    "mount pleasant",
+    "west ashley",
+]
+
+
+def seed_charleston_metro(apps, schema_editor):
+    MetroArea = apps.get_model("core", "MetroArea")
+    MetroAreaPlace = apps.get_model("core", "MetroAreaPlace")
+    Profile = apps.get_model("core", "Profile")
+    Room = apps.get_model("core", "Room")
+
+    metro, _ = MetroArea.objects.get_or_create(slug="charleston", defaults={"name": "Charleston, SC"})
+    for name in CHARLESTON_PLACES:
+        MetroAreaPlace.objects.get_or_create(name=name, defaults={"metro_area": metro})
+
+    for model in (Profile, Room):
+        for name in CHARLESTON_PLACES:
+            model.objects.filter(city__iexact=name).update(metro=metro.slug)
+            model.objects.filter(city__isnull=True, neighborhood__iexact=name).update(metro=metro.slug)
+            model.objects.filter(city="", neighborhood__iexact=name).update(metro=metro.slug)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0008_metro_areas"),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_charleston_metro, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:56
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_seed_charleston_metro"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(
+                django.db.models.functions.text.Lower("city"),
+                name="core_profile_city_lower_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(
+                django.db.models.functions.text.Lower("neighborhood"),
+                name="core_profile_nbhd_lower_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(
+                django.db.models.functions.text.Lower("city"),
+                django.db.models.functions.text.Lower("neighborhood"),
+                name="core_room_city_nbhd_lower_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(
+                django.db.models.functions.text.Lower("neighborhood"),
+                name="core_room_nbhd_lower_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_lower_location_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfileVector",
+            fields=[
+                (
+                    "profile",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="feature_vector",
+                        serialize=False,
+                        to="core.profile",
+                        verbose_name="Profile",
+                    ),
+                ),
+                ("vector", models.BinaryField(verbose_name="Feature Vector")),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Updated At"),
+                ),
+            ],
+            options={
+                "verbose_name": "Profile Vector",
+                "verbose_name_plural": "Profile Vectors",
+            },
+        ),
+        migrations.CreateModel(
+            name="SimilarProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField(verbose_name="Rank")),
+                ("score", models.FloatField(verbose_name="Similarity Score")),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="similar_links",
+                        to="core.profile",
+                        verbose_name="Profile",
+                    ),
+                ),
+                (
+                    "similar",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="similar_to_links",
+                        to="core.profile",
+                        verbose_name="Similar Profile",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Similar Profile",
+                "verbose_name_plural": "Similar Profiles",
+                "ordering": ["profile", "rank"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("profile", "rank"),
+                        name="core_similarprofile_profile_rank_uniq",
+                    )
+                ],
+            },
+        ),
+    ]
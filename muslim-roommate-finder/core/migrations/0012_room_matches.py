@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_similar_profiles"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RoomMatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "side",
+                    models.CharField(
+                        choices=[
+                            ("seeker", "Best rooms for the seeker"),
+                            ("room", "Best seekers for the room"),
+                        ],
+                        max_length=6,
+                        verbose_name="List",
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField(verbose_name="Rank")),
+                ("score", models.FloatField(verbose_name="Match Score")),
+                (
+                    "room",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="seeker_matches",
+                        to="core.room",
+                        verbose_name="Room",
+                    ),
+                ),
+                (
+                    "seeker",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="room_matches",
+                        to="core.profile",
+                        verbose_name="Seeker",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Room Match",
+                "verbose_name_plural": "Room Matches",
+                "ordering": ["side", "rank"],
+                "indexes": [
+                    models.Index(
+                        fields=["seeker", "side", "rank"],
+                        name="core_roomma_seeker__e0541e_idx",
+                    ),
+                    models.Index(
+                        fields=["room", "side", "rank"],
+                        name="core_roomma_room_id_e3430b_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("seeker", "room", "side"),
+                        name="core_roommatch_pair_side_uniq",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:06
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_room_matches"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(
+                django.db.models.functions.text.Upper("state"),
+                name="core_profile_state_upper_idx",
+            ),
+        ),
+    ]
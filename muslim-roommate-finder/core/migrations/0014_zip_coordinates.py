@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:08
+
+import csv
+from pathlib import Path
+
+from django.conf import settings
+from django.db import migrations, models
+
+BUNDLED_ZIP_CENTROIDS_FILE = Path(__file__).resolve().parent.parent / "data" / "zip_centroids.csv"
+
+
+def read_centroids():
+    """
+    {zip: (latitude, longitude)} from the imported centroid file, else the
+    bundled sample. A frozen copy of core.geo's loader, so later changes to
+    the app code can't change what this migration does.
+    """
+    path = getattr(settings, "ZIP_CENTROIDS_FILE", None)
+    path = Path(path) if path and Path(path).exists() else BUNDLED_ZIP_CENTROIDS_FILE
+    with open(path, newline="") as f:
+        rows = csv.DictReader(line for line in f if not line.startswith("#"))
+        return {row["zip"]: (float(row["latitude"]), float(row["longitude"])) for row in rows}
+
+
+def locate_profiles(apps, schema_editor):
+    Profile = apps.get_model("core", "Profile")
+    centroids = read_centroids()
+    located = []
+    for profile in Profile.objects.exclude(zip_code__isnull=True).exclude(zip_code="").only("id", "zip_code"):
+        centroid = centroids.get(profile.zip_code.strip()[:5])
+        if centroid:
+            profile.latitude, profile.longitude = centroid
+            located.append(profile)
+    Profile.objects.bulk_update(located, ["latitude", "longitude"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_profile_state_upper_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="latitude",
+            field=models.FloatField(
+                blank=True, editable=False, null=True, verbose_name="Latitude"
+            ),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="longitude",
+            field=models.FloatField(
+                blank=True, editable=False, null=True, verbose_name="Longitude"
+            ),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="latitude",
+            field=models.FloatField(
+                blank=True, editable=False, null=True, verbose_name="Latitude"
+            ),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="longitude",
+            field=models.FloatField(
+                blank=True, editable=False, null=True, verbose_name="Longitude"
+            ),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="zip_code",
+            field=models.CharField(blank=True, max_length=10, verbose_name="ZIP Code"),
+        ),
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(
+                fields=["latitude", "longitude"], name="core_profil_latitud_4176fa_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(
+                fields=["latitude", "longitude"], name="core_room_latitud_b5ba53_idx"
+            ),
+        ),
+        migrations.RunPython(locate_profiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:10
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def keep_one_primary_per_room(apps, schema_editor):
+    """Rooms with several primary images keep only the earliest one."""
+    RoomImage = apps.get_model("core", "RoomImage")
+    rooms = (
+        RoomImage.objects.filter(is_primary=True)
+        .order_by()
+        .values("room_id")
+        .annotate(primaries=Count("id"))
+        .filter(primaries__gt=1)
+        .values_list("room_id", flat=True)
+    )
+    for room_id in rooms:
+        primaries = RoomImage.objects.filter(room_id=room_id, is_primary=True).order_by("created_at", "id")
+        RoomImage.objects.filter(pk__in=list(primaries.values_list("pk", flat=True)[1:])).update(is_primary=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_zip_coordinates"),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_one_primary_per_room, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="roomimage",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_primary", True)),
+                fields=("room",),
+                name="core_roomimage_one_primary_per_room",
+            ),
+        ),
+    ]
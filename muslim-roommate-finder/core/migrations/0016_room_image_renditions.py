@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_one_primary_room_image"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="roomimage",
+            name="renditions",
+            field=models.JSONField(
+                blank=True, default=dict, editable=False, verbose_name="Renditions"
+            ),
+        ),
+    ]
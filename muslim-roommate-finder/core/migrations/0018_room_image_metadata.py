@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0017_stored_images"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="roomimage",
+            name="byte_size",
+            field=models.PositiveBigIntegerField(
+                blank=True, editable=False, null=True, verbose_name="File Size (bytes)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="roomimage",
+            name="dominant_color",
+            field=models.CharField(
+                blank=True, editable=False, max_length=7, verbose_name="Dominant Colour"
+            ),
+        ),
+        migrations.AddField(
+            model_name="roomimage",
+            name="height",
+            field=models.PositiveIntegerField(
+                blank=True, editable=False, null=True, verbose_name="Height"
+            ),
+        ),
+        migrations.AddField(
+            model_name="roomimage",
+            name="width",
+            field=models.PositiveIntegerField(
+                blank=True, editable=False, null=True, verbose_name="Width"
+            ),
+        ),
+    ]
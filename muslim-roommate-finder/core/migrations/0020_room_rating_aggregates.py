@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:27
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def count_existing_reviews(apps, schema_editor):
+    Room = apps.get_model("core", "Room")
+    RoomReview = apps.get_model("core", "RoomReview")
+    rows = RoomReview.objects.order_by().values("room_id").annotate(
+        review_count=Count("id"),
+        rating_sum=Sum("rating"),
+        **{f"ratings_{stars}": Count("id", filter=Q(rating=stars)) for stars in range(1, 6)},
+    )
+    for row in rows:
+        room_id = row.pop("room_id")
+        Room.objects.filter(pk=room_id).update(avg_rating=row["rating_sum"] / row["review_count"], **row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0019_row_counts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="room",
+            name="avg_rating",
+            field=models.FloatField(
+                blank=True, editable=False, null=True, verbose_name="Average Rating"
+            ),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="rating_sum",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Rating Total"
+            ),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="ratings_1",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="1-Star Reviews"
+            ),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="ratings_2",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="2-Star Reviews"
+            ),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="ratings_3",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="3-Star Reviews"
+            ),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="ratings_4",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="4-Star Reviews"
+            ),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="ratings_5",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="5-Star Reviews"
+            ),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="review_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Reviews"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(
+                fields=["avg_rating", "id"], name="core_room_avg_rat_c20edc_idx"
+            ),
+        ),
+        migrations.RunPython(count_existing_reviews, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:30
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0020_room_rating_aggregates"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrendingEpoch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("started_at", models.DateTimeField(verbose_name="Started At")),
+            ],
+            options={
+                "verbose_name": "Trending Epoch",
+                "verbose_name_plural": "Trending Epochs",
+            },
+        ),
+        migrations.AddField(
+            model_name="message",
+            name="room",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="messages",
+                to="core.room",
+                verbose_name="Room",
+            ),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="trending_score",
+            field=models.FloatField(
+                default=0, editable=False, verbose_name="Trending Score"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(
+                django.db.models.functions.text.Lower("city"),
+                models.OrderBy(models.F("trending_score"), descending=True),
+                name="core_room_city_trending_idx",
+            ),
+        ),
+    ]
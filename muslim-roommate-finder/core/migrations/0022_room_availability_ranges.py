@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:32
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+GIST_INDEX = "core_roomavailability_range_gist"
+
+
+def merge_existing_windows(apps, schema_editor):
+    """Swap inverted windows, then merge each room's overlapping or adjacent ones."""
+    RoomAvailability = apps.get_model("core", "RoomAvailability")
+    for window in RoomAvailability.objects.filter(end_date__lt=models.F("start_date")):
+        window.start_date, window.end_date = window.end_date, window.start_date
+        window.save(update_fields=["start_date", "end_date"])
+
+    merged, absorbed, current = {}, [], None
+    for window in RoomAvailability.objects.order_by("room_id", "start_date", "id").iterator():
+        if current and window.room_id == current.room_id and window.start_date <= current.end_date + timedelta(days=1):
+            if window.end_date > current.end_date:
+                current.end_date = window.end_date
+                merged[current.pk] = current
+            absorbed.append(window.pk)
+            continue
+        current = window
+    # Deleted after the loop, not while the cursor over the table is still open
+    for start in range(0, len(absorbed), 500):
+        RoomAvailability.objects.filter(pk__in=absorbed[start:start + 500]).delete()
+    for window in merged.values():
+        window.save(update_fields=["end_date"])
+
+
+def create_range_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE INDEX {GIST_INDEX} ON core_roomavailability "
+            f"USING gist (daterange(start_date, end_date, '[]'))"
+        )
+
+
+def drop_range_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {GIST_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0021_trending_rooms"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_existing_windows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="roomavailability",
+            index=models.Index(
+                fields=["room", "start_date"], name="core_roomav_room_id_dd02fc_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="roomavailability",
+            index=models.Index(
+                fields=["end_date", "start_date", "room"],
+                name="core_roomav_end_dat_8c9017_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="roomavailability",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("end_date__gte", models.F("start_date"))),
+                name="core_roomavailability_end_after_start",
+            ),
+        ),
+        migrations.RunPython(create_range_index, drop_range_index),
+    ]
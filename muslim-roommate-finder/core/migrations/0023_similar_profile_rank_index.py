@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0022_room_availability_ranges"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="similarprofile",
+            index=models.Index(
+                fields=["rank", "score"], name="core_simila_rank_d91921_idx"
+            ),
+        ),
+    ]
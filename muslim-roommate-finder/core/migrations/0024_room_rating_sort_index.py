@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:49
+
+from django.db import migrations, models
+
+RATING_INDEX = "core_room_rating_sort_idx"
+
+
+def create_rating_index(apps, schema_editor):
+    """
+    Postgres sorts NULLs first in a DESC index, so it needs NULLS LAST to serve
+    the rating sort. SQLite sorts NULLs lowest already and rejects NULLS LAST
+    in CREATE INDEX.
+    """
+    nulls = " NULLS LAST" if schema_editor.connection.vendor == "postgresql" else ""
+    schema_editor.execute(f"CREATE INDEX {RATING_INDEX} ON core_room (avg_rating DESC{nulls}, id DESC)")
+
+
+def drop_rating_index(apps, schema_editor):
+    schema_editor.execute(f"DROP INDEX IF EXISTS {RATING_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0023_similar_profile_rank_index"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="room",
+            name="core_room_avg_rat_c20edc_idx",
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_rating_index, drop_rating_index),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="room",
+                    index=models.Index(
+                        models.OrderBy(
+                            models.F("avg_rating"), descending=True, nulls_last=True
+                        ),
+                        models.OrderBy(models.F("id"), descending=True),
+                        name=RATING_INDEX,
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0024_room_rating_sort_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="roommatch",
+            index=models.Index(
+                fields=["side", "rank", "score"], name="core_roomma_side_43dfe5_idx"
+            ),
+        ),
+    ]
@@ -1,6 +1,6 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce, Lower, Upper
 from django.contrib.auth.models import User
-from django.utils.text import slugify
 from django.urls import reverse
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -10,6 +10,61 @@ import os
 from django.core.files.base import ContentFile
 from io import BytesIO
 
+from django_cleanup import cleanup
+
+from . import availability, image_store, ratings, renditions as image_renditions, trending, uploads
+from .geo import locate
+from .slugs import save_with_unique_slug, slug_base
+
+# Enables `field__lower=...` / `field__upper=...` lookups, which match the LOWER(...)/UPPER(...) indexes below
+models.CharField.register_lookup(Lower)
+models.CharField.register_lookup(Upper)
+
+# --- Change tracking ---
+class ChangeTrackingMixin:
+    """
+    Remembers the values a row was loaded (or last saved) with, so a plain
+    `save()` writes only the fields that changed, and a save that changes
+    nothing writes nothing and sends no signals.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded()
+        return instance
+
+    def _remember_loaded(self):
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields if field.attname in self.__dict__
+        }
+
+    def changed_fields(self):
+        """Attnames changed since the row was loaded or saved, or None when unknown (e.g. new rows)."""
+        loaded = getattr(self, "_loaded_values", None)
+        if self._state.adding or loaded is None:
+            return None
+        return {
+            field.attname for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+            and (field.attname not in loaded or self.__dict__[field.attname] != loaded[field.attname])
+        }
+
+    def _limit_update_fields(self, kwargs, changed, exclude=(), include=()):
+        """
+        For a plain save of an existing row, set `update_fields` to the
+        `changed` fields plus `include` (and auto_now fields when anything
+        changes), never `exclude`. Explicit update_fields are left alone.
+        """
+        if self._state.adding or kwargs.get("update_fields") is not None or kwargs.get("force_insert"):
+            return
+        fields = [f for f in self._meta.concrete_fields if not f.primary_key and f.attname not in exclude]
+        if changed is not None:
+            changed = (set(changed) | set(include)) - set(exclude)
+            fields = [f for f in fields if f.attname in changed or (changed and getattr(f, "auto_now", False))]
+        kwargs["update_fields"] = [f.attname for f in fields]
+
 # --- Define U.S. states as a dictionary (outside the class) ---
 US_STATES = {
     "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas",
@@ -27,8 +82,105 @@ US_STATES = {
     "WI": "Wisconsin", "WY": "Wyoming",
 }
 
+# Full state name (upper case) -> abbreviation, built once at import
+US_STATE_ABBREVIATIONS = {name.upper(): abbr for abbr, name in US_STATES.items()}
+
+
+def state_abbreviation(state):
+    """Abbreviation for a state given as "SC", "sc" or "South Carolina"; None if unknown."""
+    value = (state or "").strip().upper()
+    if value in US_STATES:
+        return value
+    return US_STATE_ABBREVIATIONS.get(value)
+
+# --- Metro areas ---
+CHARLESTON_METRO = "charleston"
+
+
+def normalize_place_name(name):
+    """Canonical form used to match city/neighborhood names to a metro."""
+    return " ".join((name or "").split()).lower()
+
+
+def metro_lookup_name(city, neighborhood=None):
+    """The place name a location is matched on: its city, else its neighborhood."""
+    return normalize_place_name(city) or normalize_place_name(neighborhood)
+
+
+class MetroArea(models.Model):
+    name = models.CharField(max_length=100, verbose_name="Metro Area")
+    slug = models.SlugField(unique=True, verbose_name="URL Slug")
+
+    class Meta:
+        verbose_name = "Metro Area"
+        verbose_name_plural = "Metro Areas"
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class MetroAreaPlace(models.Model):
+    metro_area = models.ForeignKey(MetroArea, on_delete=models.CASCADE, related_name="places", verbose_name="Metro Area")
+    name = models.CharField(max_length=100, unique=True, verbose_name="City or Neighborhood")
+
+    class Meta:
+        verbose_name = "Metro Area Place"
+        verbose_name_plural = "Metro Area Places"
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.metro_area})"
+
+    def save(self, *args, **kwargs):
+        self.name = normalize_place_name(self.name)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def resolve(cls, city, neighborhood=None):
+        """
+        Return the metro slug for a location, or '' if it is not in any metro.
+        The neighborhood is only consulted when no city is given (see
+        metro_lookup_name), so a "Downtown" in another city is not pulled
+        into the wrong metro.
+        """
+        name = metro_lookup_name(city, neighborhood)
+        if not name:
+            return ""
+        return cls.objects.filter(name=name).values_list("metro_area__slug", flat=True).first() or ""
+
+
 # --- Profiles ---
-class Profile(models.Model):
+def area_terms(cities=None, zip_codes=None):
+    """`cities` lower-cased and `zip_codes` as strings, both stripped, with blanks dropped."""
+    cities = [c.strip().lower() for c in cities or [] if c and c.strip()]
+    zip_codes = [str(z).strip() for z in zip_codes or [] if str(z).strip()]
+    return cities, zip_codes
+
+
+class ProfileQuerySet(models.QuerySet):
+    def in_area(self, cities=None, state=None, zip_codes=None):
+        """
+        Profiles in the given area, with the rules of Profile.is_in_area:
+        cities match case-insensitively, `state` may be an abbreviation or a
+        full name (matched against the stored abbreviation), and profiles
+        without any location never match. Each criterion is an indexed lookup.
+        """
+        cities, zip_codes = area_terms(cities, zip_codes)
+        profiles = self.filter(models.Q(city__gt="") | models.Q(state__gt="") | models.Q(zip_code__gt=""))
+        if cities:
+            profiles = profiles.filter(city__lower__in=cities)
+        if state:
+            abbreviation = state_abbreviation(state)
+            if not abbreviation:
+                return profiles.none()
+            profiles = profiles.filter(state__upper=abbreviation)
+        if zip_codes:
+            profiles = profiles.filter(zip_code__in=zip_codes)
+        return profiles
+
+
+class Profile(ChangeTrackingMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name="User Account")
     name = models.CharField(max_length=100, verbose_name="Full Name")
     age = models.PositiveIntegerField(null=True, blank=True, verbose_name="Age")
@@ -44,9 +196,14 @@ class Profile(models.Model):
     contact_email = models.EmailField(blank=True, verbose_name="Contact Email")
     slug = models.SlugField(unique=True, blank=True, verbose_name="URL Slug")
     zip_code = models.CharField(max_length=10, blank=True, null=True, verbose_name="ZIP Code", db_index=True)
+    latitude = models.FloatField(null=True, blank=True, editable=False, verbose_name="Latitude")
+    longitude = models.FloatField(null=True, blank=True, editable=False, verbose_name="Longitude")
+    metro = models.SlugField(blank=True, db_index=False, editable=False, verbose_name="Metro Area")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At", null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At", null=True, blank=True)
 
+    objects = ProfileQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Profile"
         verbose_name_plural = "Profiles"
@@ -54,6 +211,12 @@ class Profile(models.Model):
             models.Index(fields=['city', 'state']),
             models.Index(fields=['is_looking_for_room']),
             models.Index(fields=['gender']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['metro', 'created_at']),
+            models.Index(Lower('city'), name='core_profile_city_lower_idx'),
+            models.Index(Lower('neighborhood'), name='core_profile_nbhd_lower_idx'),
+            models.Index(Upper('state'), name='core_profile_state_upper_idx'),
+            models.Index(fields=['latitude', 'longitude']),
         ]
 
     def __str__(self):
@@ -63,50 +226,40 @@ class Profile(models.Model):
         return reverse("profile_detail", kwargs={"profile_id": self.id})
 
     def is_charleston_area(self):
-        if not self.city or not self.state:
-            return False
-        return (
-            self.city.strip().lower() == "charleston"
-            and self.state.strip().lower() in ["sc", "south carolina"]
-        )
+        return self.metro == CHARLESTON_METRO
 
     def is_in_area(self, cities=None, state=None, zip_codes=None):
+        """
+        Whether this profile is in the given area. To filter many profiles use
+        `Profile.objects.in_area(...)`, which applies the same rules in SQL.
+        """
+        cities, zip_codes = area_terms(cities, zip_codes)
         if not (self.city or self.state or self.zip_code):
             return False
-
-        city_match = True
-        state_match = True
-        zip_match = True
-
-        if cities:
-            city_match = self.city and self.city.strip().lower() in [c.lower() for c in cities]
-
+        if cities and (self.city or "").strip().lower() not in cities:
+            return False
         if state:
-            state_input = state.upper()
-            state_fullnames = {v.upper(): k for k, v in US_STATES.items()}
-
-            if state_input in US_STATES:
-                state_match = self.state and self.state.strip().upper() == state_input
-            elif state_input in state_fullnames:
-                state_match = self.state and self.state.strip().upper() == state_fullnames[state_input]
-            else:
-                state_match = False
-
-        if zip_codes:
-            zip_match = self.zip_code and self.zip_code.strip() in [str(z).strip() for z in zip_codes]
+            abbreviation = state_abbreviation(state)
+            if not abbreviation or (self.state or "").strip().upper() != abbreviation:
+                return False
+        if zip_codes and (self.zip_code or "").strip() not in zip_codes:
+            return False
+        return True
 
-        return city_match and state_match and zip_match
-    
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.name or self.user.username)
-            slug = base_slug
-            counter = 1
-            while Profile.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        changed = self.changed_fields()
+        if changed is None or changed & {"city", "neighborhood"}:
+            self.metro = MetroAreaPlace.resolve(self.city, self.neighborhood)
+        if changed is None or "zip_code" in changed:
+            locate(self)
+        self._limit_update_fields(kwargs, self.changed_fields(), include=() if self.slug else ("slug",))
+        if self.slug:
+            saved = super().save(*args, **kwargs)
+        else:
+            base = slug_base(Profile, self.name, self.user.username)
+            saved = save_with_unique_slug(self, base, super().save, *args, **kwargs)
+        self._remember_loaded()
+        return saved
 
 class RoommateProfile(models.Model):
     profile = models.OneToOneField(Profile, on_delete=models.CASCADE, related_name="roommate_profile", verbose_name="Profile")
@@ -121,6 +274,43 @@ class RoommateProfile(models.Model):
     def __str__(self):
         return f"Roommate Profile: {self.profile.name}"
 
+
+class ProfileVector(models.Model):
+    """Encoded similarity features of a profile (see core.similarity)."""
+    profile = models.OneToOneField(Profile, on_delete=models.CASCADE, primary_key=True, related_name="feature_vector", verbose_name="Profile")
+    vector = models.BinaryField(verbose_name="Feature Vector")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
+
+    class Meta:
+        verbose_name = "Profile Vector"
+        verbose_name_plural = "Profile Vectors"
+
+    def __str__(self):
+        return f"Vector for {self.profile_id}"
+
+
+class SimilarProfile(models.Model):
+    """A precomputed nearest neighbour of a profile, kept by core.similarity."""
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="similar_links", verbose_name="Profile")
+    similar = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="similar_to_links", verbose_name="Similar Profile")
+    rank = models.PositiveSmallIntegerField(verbose_name="Rank")
+    score = models.FloatField(verbose_name="Similarity Score")
+
+    class Meta:
+        verbose_name = "Similar Profile"
+        verbose_name_plural = "Similar Profiles"
+        ordering = ['profile', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'rank'], name='core_similarprofile_profile_rank_uniq'),
+        ]
+        indexes = [
+            # Last entries of full lists, see core.similarity.update_profile
+            models.Index(fields=['rank', 'score']),
+        ]
+
+    def __str__(self):
+        return f"{self.profile_id} ~ {self.similar_id} (#{self.rank})"
+
 # --- Messaging ---
 class Contact(models.Model):
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="contacts", verbose_name="Profile")
@@ -140,6 +330,7 @@ class Contact(models.Model):
 class Message(models.Model):
     sender = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="sent_messages", verbose_name="Sender")
     recipient = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="received_messages", verbose_name="Recipient")
+    room = models.ForeignKey("Room", on_delete=models.SET_NULL, null=True, blank=True, related_name="messages", verbose_name="Room")
     content = models.TextField(verbose_name="Message Content")
     timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Sent At")
     is_read = models.BooleanField(default=False, verbose_name="Is Read")
@@ -179,7 +370,32 @@ class Amenity(models.Model):
     def __str__(self):
         return self.name
 
-class Room(models.Model):
+class RoomQuerySet(models.QuerySet):
+    def for_listing(self):
+        """
+        Fetch rooms ready for listing cards: the owner is joined in and the
+        primary image is prefetched, so rendering N cards costs a constant
+        number of queries instead of 1 + 2N.
+        """
+        primary_first = RoomImage.objects.order_by('-is_primary', 'created_at', 'id')
+        return self.select_related('user').prefetch_related(
+            models.Prefetch('images', queryset=primary_first[:1], to_attr='prefetched_primary_images')
+        )
+
+    def with_image_count(self):
+        """
+        Annotate `image_total` as a correlated subquery, so it is only
+        evaluated for the rows actually fetched (one admin page) rather than
+        grouping the whole table as a JOIN + COUNT would.
+        """
+        counts = (
+            RoomImage.objects.filter(room=models.OuterRef('pk')).order_by()
+            .values('room').annotate(total=models.Count('pk')).values('total')
+        )
+        return self.annotate(image_total=Coalesce(models.Subquery(counts), 0))
+
+
+class Room(ChangeTrackingMixin, models.Model):
     user = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="rooms", verbose_name="Owner")
     title = models.CharField(max_length=200, verbose_name="Room Title")
     description = models.TextField(blank=True, verbose_name="Description")
@@ -187,6 +403,10 @@ class Room(models.Model):
     amenities = models.ManyToManyField(Amenity, blank=True, verbose_name="Amenities")
     city = models.CharField(max_length=100, verbose_name="City", db_index=True)
     neighborhood = models.CharField(max_length=100, blank=True, verbose_name="Neighborhood")
+    zip_code = models.CharField(max_length=10, blank=True, verbose_name="ZIP Code")
+    latitude = models.FloatField(null=True, blank=True, editable=False, verbose_name="Latitude")
+    longitude = models.FloatField(null=True, blank=True, editable=False, verbose_name="Longitude")
+    metro = models.SlugField(blank=True, db_index=False, editable=False, verbose_name="Metro Area")
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Monthly Rent")
     available_from = models.DateField(null=True, blank=True, verbose_name="Available From")
     halal_kitchen = models.BooleanField(default=False, verbose_name="Halal Kitchen")
@@ -195,9 +415,22 @@ class Room(models.Model):
     slug = models.SlugField(unique=True, blank=True, verbose_name="URL Slug")
     contact_email = models.EmailField(blank=True, verbose_name="Contact Email")
     is_active = models.BooleanField(default=True, verbose_name="Active Listing")
+    # Review aggregates, kept by core.ratings
+    review_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Reviews")
+    rating_sum = models.PositiveIntegerField(default=0, editable=False, verbose_name="Rating Total")
+    avg_rating = models.FloatField(null=True, blank=True, editable=False, verbose_name="Average Rating")
+    ratings_1 = models.PositiveIntegerField(default=0, editable=False, verbose_name="1-Star Reviews")
+    ratings_2 = models.PositiveIntegerField(default=0, editable=False, verbose_name="2-Star Reviews")
+    ratings_3 = models.PositiveIntegerField(default=0, editable=False, verbose_name="3-Star Reviews")
+    ratings_4 = models.PositiveIntegerField(default=0, editable=False, verbose_name="4-Star Reviews")
+    ratings_5 = models.PositiveIntegerField(default=0, editable=False, verbose_name="5-Star Reviews")
+    # Time-decayed demand, kept by core.trending
+    trending_score = models.FloatField(default=0, editable=False, verbose_name="Trending Score")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At", null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At", null=True, blank=True)
 
+    objects = RoomQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Room"
         verbose_name_plural = "Rooms"
@@ -207,6 +440,16 @@ class Room(models.Model):
             models.Index(fields=['price']),
             models.Index(fields=['available_from']),
             models.Index(fields=['is_active']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['metro', 'created_at']),
+            models.Index(Lower('city'), Lower('neighborhood'), name='core_room_city_nbhd_lower_idx'),
+            models.Index(Lower('neighborhood'), name='core_room_nbhd_lower_idx'),
+            models.Index(fields=['latitude', 'longitude']),
+            # Same direction and NULLS placement as the rating sort, so Postgres can scan it in order
+            models.Index(
+                models.F('avg_rating').desc(nulls_last=True), models.F('id').desc(), name='core_room_rating_sort_idx'
+            ),
+            models.Index(Lower('city'), models.F('trending_score').desc(), name='core_room_city_trending_idx'),
         ]
 
     def __str__(self):
@@ -218,6 +461,8 @@ class Room(models.Model):
     @property
     def primary_image(self):
         """Get the primary image for this room"""
+        if hasattr(self, 'prefetched_primary_images'):
+            return self.prefetched_primary_images[0] if self.prefetched_primary_images else None
         try:
             return self.images.filter(is_primary=True).first() or self.images.first()
         except:
@@ -226,38 +471,103 @@ class Room(models.Model):
     @property
     def image_count(self):
         """Get the number of images for this room"""
+        if hasattr(self, 'image_total'):
+            return self.image_total
         return self.images.count()
     
+    @property
+    def rating_histogram(self):
+        """[(stars, review count), ...] from 5 stars down to 1"""
+        return [(stars, getattr(self, ratings.star_field(stars))) for stars in reversed(ratings.STARS)]
+
     def get_price_display(self):
         """Format price for display"""
         return f"${self.price:,.2f}"
     
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.title)
-            slug = base_slug
-            counter = 1
-            while Room.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        changed = self.changed_fields()
+        if changed is None or changed & {"city", "neighborhood"}:
+            self.metro = MetroAreaPlace.resolve(self.city, self.neighborhood)
+        if changed is None or "zip_code" in changed:
+            locate(self)
+        # The review aggregates and trending score are only written by core.ratings and
+        # core.trending, so a stale copy can't overwrite them
+        maintained = ratings.RATING_FIELDS + [trending.SCORE_FIELD]
+        self._limit_update_fields(
+            kwargs, self.changed_fields(), exclude=maintained, include=() if self.slug else ("slug",)
+        )
+        if self.slug:
+            saved = super().save(*args, **kwargs)
+        else:
+            saved = save_with_unique_slug(self, slug_base(Room, self.title, "room"), super().save, *args, **kwargs)
+        self._remember_loaded()
+        return saved
 
 def validate_image_size(image):
     """Validate image file size (max 5MB)"""
-    if image.size > 5 * 1024 * 1024:  # 5MB
-        raise ValidationError("Image file too large ( > 5MB )")
+    uploads.validate_size(image)
 
 def validate_image_format(image):
-    """Validate image format"""
-    allowed_formats = ['JPEG', 'JPG', 'PNG', 'WEBP']
-    try:
-        with Image.open(image) as img:
-            if img.format not in allowed_formats:
-                raise ValidationError(f"Unsupported image format. Allowed: {', '.join(allowed_formats)}")
-    except Exception as e:
-        raise ValidationError("Invalid image file")
+    """Validate image format and dimensions from the file header"""
+    uploads.probe(image)
+
+class RoomImageQuerySet(models.QuerySet):
+    def promote_first(self, room_id, candidates=None):
+        """
+        Make the earliest of `candidates` (default: all of the room's images)
+        primary if the room has no primary image, in one UPDATE. Returns the
+        number of rows promoted (0 or 1).
+        """
+        candidates = RoomImage.objects.filter(room_id=room_id) if candidates is None else candidates
+        first = candidates.order_by('created_at', 'id').values('id')[:1]
+        has_primary = RoomImage.objects.filter(room_id=room_id, is_primary=True)
+        try:
+            with transaction.atomic():
+                return RoomImage.objects.filter(pk=models.Subquery(first)).filter(~models.Exists(has_primary)).update(is_primary=True)
+        except IntegrityError:
+            # A concurrent upload became primary first
+            return 0
+
+    def attach(self, room, files, primary=None):
+        """
+        Add many images to `room` in one transaction: one bulk INSERT plus at
+        most two UPDATEs. `primary` is the index in `files` of the image to make
+        primary; otherwise the first upload becomes primary if the room has none.
+        """
+        images = [RoomImage(room=room, image=f) for f in files]
+        with transaction.atomic():
+            for image in images:
+                image._store_upload()
+            RoomImage.objects.bulk_create(images)
+            if primary is not None:
+                images[primary].make_primary()
+            elif images:
+                promoted = self.promote_first(room.pk, RoomImage.objects.filter(pk__in=[i.pk for i in images]))
+                images[0].is_primary = bool(promoted)
+            # bulk_create sends no post_save
+            for image in images:
+                if not image_renditions.is_current(image):
+                    image_renditions.schedule(image.pk)
+        return images
+
+
+class StoredImage(models.Model):
+    """A content-addressed image file and the number of RoomImages using it (see core.image_store)"""
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name="SHA-256")
+    name = models.CharField(max_length=255, unique=True, verbose_name="Storage Name")
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="References")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
 
+    class Meta:
+        verbose_name = "Stored Image"
+        verbose_name_plural = "Stored Images"
+
+    def __str__(self):
+        return self.name
+
+
+# Files can be shared between rows; core.image_store deletes them instead
+@cleanup.ignore
 class RoomImage(models.Model):
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="images", verbose_name="Room")
     image = models.ImageField(
@@ -268,51 +578,128 @@ class RoomImage(models.Model):
     )
     is_primary = models.BooleanField(default=False, verbose_name="Primary Image")
     caption = models.CharField(max_length=200, blank=True, verbose_name="Caption")
+    renditions = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Renditions")
+    # Stored at upload so pages and the admin never open or stat the file
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Width")
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Height")
+    byte_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False, verbose_name="File Size (bytes)")
+    dominant_color = models.CharField(max_length=7, blank=True, editable=False, verbose_name="Dominant Colour")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At", null=True, blank=True)
 
+    objects = RoomImageQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Room Image"
         verbose_name_plural = "Room Images"
         ordering = ['-is_primary', 'created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['room'],
+                condition=models.Q(is_primary=True),
+                name='core_roomimage_one_primary_per_room',
+            ),
+        ]
 
     def __str__(self):
         return f"Image for {self.room.title}"
 
     def save(self, *args, **kwargs):
-        # If this is set as primary, unset all other primary images for this room
-        if self.is_primary:
-            RoomImage.objects.filter(room=self.room, is_primary=True).update(is_primary=False)
-        
-        # Auto-set as primary if it's the first image for this room
-        if not self.pk and not RoomImage.objects.filter(room=self.room).exists():
-            self.is_primary = True
-            
-        super().save(*args, **kwargs)
-    
-    def get_thumbnail_url(self, size=(300, 200)):
-        """Generate a thumbnail URL for the image"""
+        replaced = None
+        stored = None
+        try:
+            # The reference taken on the stored file commits or rolls back with the row
+            with transaction.atomic():
+                if self.image and not self.image._committed:
+                    if not self._state.adding:
+                        replaced = RoomImage.objects.filter(pk=self.pk).only('image', 'renditions').first()
+                    self._store_upload()
+                    stored = self.image.name
+
+                if self.is_primary:
+                    self._demote_others()
+                    super().save(*args, **kwargs)
+                else:
+                    adding = self._state.adding
+                    super().save(*args, **kwargs)
+                    if adding:
+                        # The first image of a room becomes its primary image
+                        promoted = RoomImage.objects.promote_first(self.room_id, RoomImage.objects.filter(pk=self.pk))
+                        self.is_primary = bool(promoted)
+
+                if replaced is not None and replaced.image.name != self.image.name:
+                    image_store.release(replaced)
+        except Exception:
+            if stored:
+                # Written for this save only; kept if another image uses it
+                image_store.delete_files(stored)
+            raise
+
+    def _store_upload(self):
+        """
+        Apply the EXIF orientation, strip metadata, and store the upload under
+        its content address, sharing the file (and its renditions) with
+        identical uploads.
+        """
+        upload = self.image.file
+        info = None
+        try:
+            upload = uploads.normalize(upload) or upload
+            info = uploads.probe(upload)
+        except (ValidationError, OSError, ValueError, Image.DecompressionBombError):
+            # Unreadable files are the validators' job; store them as given
+            pass
+        self.width, self.height = (info.width, info.height) if info else (None, None)
+        self.byte_size = upload.size
+        name, shared = image_store.retain(upload, image_store.extension_for(self.image, info and info.format))
+        self.image = name
+        self.renditions, self.dominant_color = image_store.shared_renditions(name, self.pk) if shared else ({}, '')
+
+    def _demote_others(self):
+        # Demote before promoting: the one-primary index is checked row by row,
+        # so a single swap statement could fail depending on row order.
+        RoomImage.objects.filter(room_id=self.room_id, is_primary=True).exclude(pk=self.pk).update(is_primary=False)
+
+    def make_primary(self):
+        """Make this the room's primary image: one UPDATE to demote, one to promote."""
+        with transaction.atomic():
+            self._demote_others()
+            RoomImage.objects.filter(pk=self.pk).update(is_primary=True)
+        self.is_primary = True
+
+    def get_thumbnail_url(self, size=image_renditions.DEFAULT_RENDITION):
+        """
+        URL of a downscaled rendition: `size` is a rendition name ("card",
+        "detail", "admin") or a (width, height) it should cover. Falls back to
+        the original while the rendition is still being generated.
+        """
         if not self.image:
             return None
-        
-        # For now, return the original image URL
-        # In production, you might want to generate actual thumbnails
+        if image_renditions.is_current(self):
+            return self.image.storage.url(self.renditions[image_renditions.pick(size)])
+        image_renditions.schedule(self.pk)
         return self.image.url
     
     def get_file_size(self):
-        """Get the file size in a human-readable format"""
+        """Get the file size in a human-readable format, from the stored byte size"""
         if not self.image:
             return "No image"
-        
-        try:
-            size = self.image.size
-            for unit in ['B', 'KB', 'MB', 'GB']:
-                if size < 1024.0:
-                    return f"{size:.1f} {unit}"
-                size /= 1024.0
-            return f"{size:.1f} TB"
-        except:
+        if self.byte_size is None:
+            # Not backfilled yet (see backfill_image_metadata)
             return "Unknown size"
 
+        size = self.byte_size
+        for unit in ['B', 'KB', 'MB', 'GB']:
+            if size < 1024.0:
+                return f"{size:.1f} {unit}"
+            size /= 1024.0
+        return f"{size:.1f} TB"
+
+    def get_dimensions(self):
+        """Width × height of the original, from the stored dimensions"""
+        if not self.width or not self.height:
+            return "Unknown"
+        return f"{self.width}×{self.height}"
+
 class RoomAmenity(models.Model):
     room = models.ForeignKey(Room, on_delete=models.CASCADE, verbose_name="Room")
     amenity = models.ForeignKey(Amenity, on_delete=models.CASCADE, verbose_name="Amenity")
@@ -331,10 +718,31 @@ class RoomAvailability(models.Model):
         verbose_name = "Room Availability"
         verbose_name_plural = "Room Availabilities"
         ordering = ['start_date']
+        indexes = [
+            models.Index(fields=['room', 'start_date']),
+            # Stay-containment search (see core.availability)
+            models.Index(fields=['end_date', 'start_date', 'room']),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(end_date__gte=models.F('start_date')),
+                name='core_roomavailability_end_after_start',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.room.title} available {self.start_date} to {self.end_date}"
 
+    def clean(self):
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            raise ValidationError({"end_date": "End date must be on or after the start date."})
+
+    def save(self, *args, **kwargs):
+        # Overlapping or adjacent windows of the room are merged into this one
+        with transaction.atomic():
+            availability.merge(self)
+            super().save(*args, **kwargs)
+
 class RoomVerification(models.Model):
     room = models.OneToOneField(Room, on_delete=models.CASCADE, verbose_name="Room")
     is_verified = models.BooleanField(default=False, verbose_name="Is Verified")
@@ -388,6 +796,87 @@ class RoomReview(models.Model):
     def __str__(self):
         return f"{self.reviewer.name} review of {self.room.title}: {self.rating}/5"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        review = super().from_db(db, field_names, values)
+        # What the room's aggregates currently count for this review
+        review._counted_rating = (review.__dict__.get("room_id"), review.__dict__.get("rating"))
+        return review
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not {"room", "room_id", "rating"} & set(update_fields):
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            if self._state.adding:
+                previous = None
+            elif None not in getattr(self, "_counted_rating", (None,)):
+                previous = self._counted_rating
+            else:
+                previous = RoomReview.objects.filter(pk=self.pk).values_list("room_id", "rating").first()
+            super().save(*args, **kwargs)
+            current = (self.room_id, self.rating)
+            ratings.review_changed(previous, current)
+            self._counted_rating = current
+
+# --- Matching ---
+class RoomMatch(models.Model):
+    """A precomputed seeker/room pairing, kept by core.matching."""
+    SIDE_CHOICES = [
+        ("seeker", "Best rooms for the seeker"),
+        ("room", "Best seekers for the room"),
+    ]
+
+    seeker = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="room_matches", verbose_name="Seeker")
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="seeker_matches", verbose_name="Room")
+    side = models.CharField(max_length=6, choices=SIDE_CHOICES, verbose_name="List")
+    rank = models.PositiveSmallIntegerField(verbose_name="Rank")
+    score = models.FloatField(verbose_name="Match Score")
+
+    class Meta:
+        verbose_name = "Room Match"
+        verbose_name_plural = "Room Matches"
+        ordering = ['side', 'rank']
+        indexes = [
+            models.Index(fields=['seeker', 'side', 'rank']),
+            models.Index(fields=['room', 'side', 'rank']),
+            # Last entries of full lists, see core.matching._lists_to_refresh
+            models.Index(fields=['side', 'rank', 'score']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['seeker', 'room', 'side'], name='core_roommatch_pair_side_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.seeker_id} <-> {self.room_id} ({self.side} #{self.rank})"
+
+
+# --- Counts ---
+class RowCount(models.Model):
+    """A maintained row count for one listing scope (see core.counts)"""
+    name = models.CharField(max_length=100, unique=True, verbose_name="Name")
+    count = models.BigIntegerField(default=0, verbose_name="Count")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
+
+    class Meta:
+        verbose_name = "Row Count"
+        verbose_name_plural = "Row Counts"
+
+    def __str__(self):
+        return f"{self.name}: {self.count}"
+
+# --- Trending ---
+class TrendingEpoch(models.Model):
+    """The single reference time trending scores are scaled against (see core.trending)"""
+    started_at = models.DateTimeField(verbose_name="Started At")
+
+    class Meta:
+        verbose_name = "Trending Epoch"
+        verbose_name_plural = "Trending Epochs"
+
+    def __str__(self):
+        return f"Trending epoch {self.started_at:%Y-%m-%d %H:%M}"
+
 # --- Signals ---
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -396,5 +885,7 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, "profile"):
+    # Only a profile loaded through this user object can carry unsaved edits;
+    # Profile.save itself writes nothing when nothing changed
+    if User.profile.related.is_cached(instance):
         instance.profile.save()
@@ -0,0 +1,123 @@
+"""
+Full-page cache for anonymous visitors of the listing pages.
+
+Anonymous traffic to `/` and the room search hits a handful of query strings,
+so rendered pages are cached per view under the *normalized* query string
+(parameters sorted, empty values dropped). Every key also carries a content
+version that the receivers in `core.signals` bump whenever a rendered field of
+a Room or Profile changes, which retires all cached pages at once without
+having to find them.
+
+Logged-in users, and anonymous users with a pending flash message, always get
+a freshly rendered page. Hits and misses are counted in the cache and can be
+read with `page_cache_stats()` or `python manage.py page_cache_stats` (the
+command only sees live counters when CACHES is shared, e.g. Redis).
+"""
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 5)
+
+VERSION_KEY = 'page_cache:version'
+# Columns that never appear on a cached page; saves touching only these keep the cache
+UNRENDERED_FIELDS = {'updated_at', 'slug'}
+HITS_KEY = 'page_cache:hits'
+MISSES_KEY = 'page_cache:misses'
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Missing (first use, or evicted): start counting again.
+        cache.add(key, 0, None)
+        return cache.incr(key)
+
+
+def content_version():
+    return cache.get_or_set(VERSION_KEY, 1, None)
+
+
+def bump_content_version():
+    """Invalidate every cached page."""
+    _incr(VERSION_KEY)
+
+
+def affects_cached_pages(update_fields):
+    """Whether a save that wrote `update_fields` (None: every field) can change a cached page."""
+    return update_fields is None or bool(set(update_fields) - UNRENDERED_FIELDS)
+
+
+def normalize_query(query_dict):
+    """Canonical query string: keys sorted, values sorted, empty values dropped."""
+    items = []
+    for key in sorted(query_dict):
+        values = sorted(v for v in query_dict.getlist(key) if v.strip())
+        items.extend((key, v) for v in values)
+    return urlencode(items)
+
+
+def page_cache_key(view_name, request):
+    digest = hashlib.md5(normalize_query(request.GET).encode()).hexdigest()
+    return f'page_cache:{view_name}:{content_version()}:{digest}'
+
+
+def page_cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def reset_page_cache_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def _has_pending_messages(request):
+    if 'messages' in request.COOKIES:
+        return True
+    session = getattr(request, 'session', None)
+    return bool(session and session.session_key and '_messages' in session)
+
+
+def _cacheable_request(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not _has_pending_messages(request)
+    )
+
+
+def cache_anonymous_page(view):
+    """Serve `view` from the page cache for anonymous GET requests."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable_request(request):
+            return view(request, *args, **kwargs)
+
+        key = page_cache_key(view.__name__, request)
+        cached = cache.get(key)
+        if cached is not None:
+            _incr(HITS_KEY)
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Page-Cache'] = 'HIT'
+            return response
+
+        _incr(MISSES_KEY)
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            cache.set(key, (response.content, response['Content-Type']), PAGE_CACHE_TIMEOUT)
+        response['X-Page-Cache'] = 'MISS'
+        return response
+
+    return wrapper
@@ -0,0 +1,138 @@
+"""
+Cursor (keyset) pagination for the listing feeds.
+
+Pages are keyed on (created_at, id) -- or (search_rank, id) for ranked
+search results -- instead of OFFSET, so fetching page 500
+costs the same as fetching page 1: the database seeks straight to the cursor
+through the index and reads `per_page + 1` rows.
+
+`created_at` is nullable on Profile and Room, so rows without a key value
+are ordered after every other row (oldest end of the feed) and then by id.
+"""
+from datetime import datetime
+
+from django.core import signing
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_SALT = "core.pagination.cursor"
+
+NEXT = "n"
+PREVIOUS = "p"
+
+
+class InvalidCursor(Exception):
+    """Raised when a cursor token is malformed or has been tampered with."""
+
+
+def _field(obj, name):
+    """Read `name` from a model instance or a `values()` row."""
+    return obj[name] if isinstance(obj, dict) else getattr(obj, name)
+
+
+def encode_cursor(obj, direction, key="created_at"):
+    """Build an opaque, signed token pointing just past `obj`."""
+    value = _field(obj, key)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return signing.dumps([key, value, _field(obj, "id"), direction], salt=CURSOR_SALT)
+
+
+def decode_cursor(token, key="created_at"):
+    """Return (value, pk, direction) from a token made by encode_cursor."""
+    try:
+        token_key, value, pk, direction = signing.loads(token, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise InvalidCursor(token)
+    if token_key != key or direction not in (NEXT, PREVIOUS) or not isinstance(pk, int):
+        raise InvalidCursor(token)
+    if isinstance(value, str):
+        value = parse_datetime(value)
+        if value is None:
+            raise InvalidCursor(token)
+    return value, pk, direction
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset, highest key first."""
+
+    def __init__(self, object_list, has_next, has_previous, key="created_at"):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.key = key
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def next_token(self):
+        if self.has_next and self.object_list:
+            return encode_cursor(self.object_list[-1], NEXT, self.key)
+        return ""
+
+    @property
+    def previous_token(self):
+        if self.has_previous and self.object_list:
+            return encode_cursor(self.object_list[0], PREVIOUS, self.key)
+        return ""
+
+
+def _after(key, value, pk):
+    """Rows that sort after the cursor in descending order."""
+    if value is None:
+        return Q(**{f"{key}__isnull": True, "id__lt": pk})
+    return (
+        Q(**{f"{key}__lt": value})
+        | Q(**{key: value, "id__lt": pk})
+        | Q(**{f"{key}__isnull": True})
+    )
+
+
+def _before(key, value, pk):
+    """Rows that sort before the cursor in descending order."""
+    if value is None:
+        return Q(**{f"{key}__isnull": False}) | Q(**{f"{key}__isnull": True, "id__gt": pk})
+    return Q(**{f"{key}__gt": value}) | Q(**{key: value, "id__gt": pk})
+
+
+def paginate_keyset(queryset, token=None, per_page=12, key="created_at"):
+    """
+    Return a KeysetPage of `queryset` ordered by (`key`, id) descending.
+
+    `key` is `created_at` for the newest-first feeds, or an annotation such
+    as `search_rank` for relevance-ordered results. `values()` querysets
+    work too, as long as they select `id` and `key`. `token` is a value
+    previously produced by KeysetPage.next_token or previous_token; a missing
+    or invalid token returns the first page.
+    """
+    descending = (F(key).desc(nulls_last=True), F("id").desc())
+    ascending = (F(key).asc(nulls_first=True), F("id").asc())
+
+    cursor = None
+    if token:
+        try:
+            cursor = decode_cursor(token, key)
+        except InvalidCursor:
+            cursor = None
+
+    if cursor is None:
+        rows = list(queryset.order_by(*descending)[:per_page + 1])
+        return KeysetPage(rows[:per_page], len(rows) > per_page, False, key)
+
+    value, pk, direction = cursor
+    if direction == NEXT:
+        rows = list(queryset.filter(_after(key, value, pk)).order_by(*descending)[:per_page + 1])
+        return KeysetPage(rows[:per_page], len(rows) > per_page, True, key)
+
+    rows = list(queryset.filter(_before(key, value, pk)).order_by(*ascending)[:per_page + 1])
+    has_previous = len(rows) > per_page
+    rows = rows[:per_page]
+    rows.reverse()
+    return KeysetPage(rows, True, has_previous, key)
@@ -0,0 +1,117 @@
+"""
+Denormalized review aggregates on Room.
+
+Each Room carries `review_count`, `rating_sum`, `avg_rating` and a per-star
+histogram (`ratings_1` .. `ratings_5`), so listing pages can show, filter and
+sort by rating through the (avg_rating DESC NULLS LAST, id DESC) index instead of grouping the
+reviews table.
+
+They are adjusted incrementally, in the same transaction as the review
+change: `RoomReview.save` applies the difference between the review's stored
+and new rating, and the post_delete receiver in `core.signals` removes a
+deleted review. Every adjustment is one UPDATE built from F() expressions,
+so concurrent reviews of the same room don't lose each other's changes
+(all SET expressions read the row's old values, as in Postgres and SQLite).
+`reconcile()` (the `reconcile_room_ratings` command) recomputes them from the
+reviews if they ever drift, e.g. after `QuerySet.update()` on reviews.
+"""
+from django.apps import apps
+from django.db.models import Case, Count, F, FloatField, Q, Sum, When
+from django.db.models.functions import Cast
+
+STARS = range(1, 6)
+RATING_FIELDS = ['review_count', 'rating_sum', 'avg_rating'] + [f'ratings_{stars}' for stars in STARS]
+
+
+def _models():
+    return apps.get_model('core', 'Room'), apps.get_model('core', 'RoomReview')
+
+
+def star_field(stars):
+    return f'ratings_{stars}'
+
+
+def _changes(rating, sign):
+    """F() updates adding (sign 1) or removing (sign -1) one `rating` review of a room."""
+    count = F('review_count') + sign
+    total = F('rating_sum') + sign * rating
+    return {
+        'review_count': count,
+        'rating_sum': total,
+        star_field(rating): F(star_field(rating)) + sign,
+        'avg_rating': Case(
+            When(Q(review_count__gt=-sign), then=Cast(total, FloatField()) / Cast(count, FloatField())),
+            default=None,
+            output_field=FloatField(),
+        ),
+    }
+
+
+def add_review(room_id, rating):
+    Room, _ = _models()
+    Room.objects.filter(pk=room_id).update(**_changes(rating, 1))
+
+
+def remove_review(room_id, rating):
+    Room, _ = _models()
+    Room.objects.filter(pk=room_id).update(**_changes(rating, -1))
+
+
+def review_changed(previous, current):
+    """
+    Apply a review save: `previous` and `current` are (room_id, rating), or
+    None for a review that did not exist before.
+    """
+    if previous == current:
+        return
+    if previous is not None:
+        remove_review(*previous)
+    add_review(*current)
+
+
+def aggregates(reviews=None):
+    """{room_id: {field: value}} recomputed from the reviews, one GROUP BY query."""
+    _, RoomReview = _models()
+    reviews = RoomReview.objects.all() if reviews is None else reviews
+    rows = reviews.order_by().values('room_id').annotate(
+        review_count=Count('id'),
+        rating_sum=Sum('rating'),
+        **{star_field(stars): Count('id', filter=Q(rating=stars)) for stars in STARS},
+    )
+    result = {}
+    for row in rows:
+        room_id = row.pop('room_id')
+        row['avg_rating'] = row['rating_sum'] / row['review_count']
+        result[room_id] = row
+    return result
+
+
+def empty():
+    return {'review_count': 0, 'rating_sum': 0, 'avg_rating': None, **{star_field(stars): 0 for stars in STARS}}
+
+
+def reconcile(batch_size=500):
+    """Rewrite every room whose stored aggregates disagree with its reviews. Returns the number fixed."""
+    Room, _ = _models()
+    expected = aggregates()
+    # Rooms that have reviews, plus rooms that claim to have some
+    room_ids = set(expected) | set(Room.objects.filter(review_count__gt=0).values_list('id', flat=True))
+    fixed = []
+    room_ids = sorted(room_ids)
+    for start in range(0, len(room_ids), batch_size):
+        rooms = Room.objects.filter(pk__in=room_ids[start:start + batch_size]).only('id', *RATING_FIELDS)
+        for room in rooms:
+            values = expected.get(room.pk, empty())
+            stale = any(getattr(room, field) != value for field, value in values.items() if field != 'avg_rating')
+            if stale or not _same_average(room.avg_rating, values['avg_rating']):
+                for field, value in values.items():
+                    setattr(room, field, value)
+                fixed.append(room)
+    Room.objects.bulk_update(fixed, RATING_FIELDS, batch_size=batch_size)
+    return len(fixed)
+
+
+def _same_average(stored, expected):
+    if stored is None or expected is None:
+        return stored is expected
+    return abs(stored - expected) < 1e-9
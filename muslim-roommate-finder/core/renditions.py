@@ -0,0 +1,184 @@
+"""
+Fixed-size renditions of room images.
+
+Each RoomImage gets a small set of downscaled variants (`RENDITIONS`), saved
+next to the original as e.g. `room_images/kitchen.card.webp` (JPEG when Pillow
+lacks WebP support). Their storage paths are recorded on the image's
+`renditions` field, so building a URL never touches the filesystem.
+
+The original is decoded once: for JPEGs `Image.draft` lets the decoder scale
+down by 1/2, 1/4 or 1/8 while decoding, and each smaller variant is reduced
+from the previous one with `thumbnail(reducing_gap=...)`, which uses
+`Image.reduce` before resampling.
+
+The dominant colour, used as a placeholder background while an image loads,
+is taken from the smallest rendition in the same pass.
+
+Renditions are generated after the upload's transaction commits, on a
+background worker thread (inline when `RENDITIONS_IN_BACKGROUND` is off, as in
+tests). Until they exist `RoomImage.get_thumbnail_url` returns the original
+and schedules the missing work, so nothing breaks while they are produced.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# name -> bounding box (width, height)
+RENDITIONS = {
+    'detail': (1200, 900),
+    'card': (480, 360),
+    'admin': (160, 120),
+}
+DEFAULT_RENDITION = 'card'
+
+FORMAT, EXTENSION = ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+QUALITY = 80
+PENDING_TIMEOUT = 60 * 5
+
+
+def pick(size):
+    """A rendition name, given a name or a (width, height) the image must cover."""
+    if isinstance(size, str):
+        return size if size in RENDITIONS else DEFAULT_RENDITION
+    width, height = size
+    covering = [name for name, (w, h) in RENDITIONS.items() if w >= width and h >= height]
+    return min(covering, key=lambda name: RENDITIONS[name][0]) if covering else 'detail'
+
+
+def rendition_path(original_name, name):
+    root, _ = os.path.splitext(original_name)
+    return f'{root}.{name}.{EXTENSION}'
+
+
+def is_current(room_image):
+    """Whether every rendition exists for the image's current file."""
+    if not room_image.image:
+        return False
+    expected = {name: rendition_path(room_image.image.name, name) for name in RENDITIONS}
+    return all(
+        (room_image.renditions or {}).get(name, '').startswith(os.path.splitext(path)[0])
+        for name, path in expected.items()
+    )
+
+
+def dominant_color(image):
+    """Most common colour of a (small) image as "#rrggbb", after reducing it to a few colours."""
+    reduced = image.convert('RGB').quantize(colors=8)
+    _, index = max(reduced.getcolors())
+    red, green, blue = reduced.getpalette()[index * 3:index * 3 + 3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def render(file):
+    """
+    Decode `file` once and yield (name, encoded bytes, image) for every
+    rendition, largest first.
+    """
+    largest = max(max(size) for size in RENDITIONS.values())
+    with Image.open(file) as original:
+        # JPEG only: decode at the smallest 1/n scale still covering `largest`
+        # on both sides (the orientation may swap width and height)
+        original.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+
+        for name, size in sorted(RENDITIONS.items(), key=lambda item: -item[1][0]):
+            image = image.copy()
+            image.thumbnail(size, reducing_gap=2.0)
+            variant = image if FORMAT == 'WEBP' or image.mode == 'RGB' else image.convert('RGB')
+            buffer = BytesIO()
+            variant.save(buffer, FORMAT, quality=QUALITY)
+            yield name, buffer.getvalue(), image
+
+
+def generate(room_image):
+    """
+    Write every rendition of `room_image` to storage and record their paths,
+    along with the dominant colour (taken from the smallest rendition).
+    """
+    storage = room_image.image.storage
+    old_paths = set((room_image.renditions or {}).values())
+    paths = {}
+    with room_image.image.open('rb') as file:
+        for name, data, image in render(file):
+            path = rendition_path(room_image.image.name, name)
+            if storage.exists(path):
+                storage.delete(path)
+            paths[name] = storage.save(path, ContentFile(data))
+        color = dominant_color(image)
+
+    for stale in old_paths - set(paths.values()):
+        storage.delete(stale)
+    type(room_image).objects.filter(pk=room_image.pk).update(renditions=paths, dominant_color=color)
+    room_image.renditions = paths
+    room_image.dominant_color = color
+    return paths
+
+
+def generate_for(pk):
+    RoomImage = apps.get_model('core', 'RoomImage')
+    room_image = RoomImage.objects.filter(pk=pk).first()
+    if room_image is None or not room_image.image:
+        return None
+    try:
+        return generate(room_image)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.exception('Could not render room image %s', pk)
+        return None
+
+
+@lru_cache(maxsize=1)
+def _executor():
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix='renditions')
+
+
+def _pending_key(pk):
+    return f'renditions:pending:{pk}'
+
+
+def _run(pk):
+    try:
+        generate_for(pk)
+    finally:
+        cache.delete(_pending_key(pk))
+
+
+def _run_in_background(pk):
+    try:
+        _run(pk)
+    finally:
+        # Worker threads open their own connections; don't leak them
+        connections.close_all()
+
+
+def schedule(pk):
+    """Generate the renditions of image `pk` once the current transaction commits."""
+    if not cache.add(_pending_key(pk), 1, PENDING_TIMEOUT):
+        return
+    if getattr(settings, 'RENDITIONS_IN_BACKGROUND', True):
+        transaction.on_commit(lambda: _executor().submit(_run_in_background, pk))
+    else:
+        transaction.on_commit(lambda: _run(pk))
+
+
+
+def rendition_size(room_image, name):
+    """(width, height) of a rendition, computed from the stored original dimensions."""
+    box_width, box_height = RENDITIONS[name]
+    width, height = room_image.width, room_image.height
+    if not width or not height:
+        return None
+    scale = min(box_width / width, box_height / height, 1)
+    return max(round(width * scale), 1), max(round(height * scale), 1)
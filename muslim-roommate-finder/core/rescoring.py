@@ -0,0 +1,65 @@
+"""
+Deferred rescoring of similar profiles (core.similarity) and seeker/room
+matches (core.matching).
+
+A save only schedules the work: it runs once the saving transaction commits,
+on a background worker thread (inline when `RESCORING_IN_BACKGROUND` is off,
+as in tests), so editing a profile or a listing never reads the vector or
+match tables inside the request's transaction. In the background, a job
+already queued for the same object is not queued again; its pending mark is
+cleared as it starts, so a save made while it runs queues a fresh one.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from . import matching, similarity
+
+logger = logging.getLogger(__name__)
+
+PENDING_TIMEOUT = 60 * 5
+
+
+def rescore_profile(profile_id):
+    # The vector covers every seeker feature, so unchanged means no rescoring
+    if similarity.update_profile(profile_id):
+        matching.update_seeker(profile_id)
+
+
+JOBS = {
+    'profile': rescore_profile,
+    'room': matching.update_room,
+}
+
+
+@lru_cache(maxsize=1)
+def _executor():
+    # A single worker, so two jobs never rewrite the same lists at once
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='rescoring')
+
+
+def _pending_key(job, pk):
+    return f'rescoring:pending:{job}:{pk}'
+
+
+def _run_in_background(job, pk):
+    cache.delete(_pending_key(job, pk))
+    try:
+        JOBS[job](pk)
+    except Exception:
+        logger.exception('Could not rescore %s %s', job, pk)
+    finally:
+        # Worker threads open their own connections; don't leak them
+        connections.close_all()
+
+
+def schedule(job, pk):
+    """Run rescoring `job` for object `pk` once the current transaction commits."""
+    if not getattr(settings, 'RESCORING_IN_BACKGROUND', True):
+        transaction.on_commit(lambda: JOBS[job](pk))
+    elif cache.add(_pending_key(job, pk), 1, PENDING_TIMEOUT):
+        transaction.on_commit(lambda: _executor().submit(_run_in_background, job, pk))
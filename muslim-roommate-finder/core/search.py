@@ -0,0 +1,205 @@
+"""
+Full-text search over Rooms and Profiles.
+
+Each searchable model gets a side index table (`core_room_search`,
+`core_profile_search`) keyed by the model's primary key:
+
+* SQLite: an FTS5 virtual table, ranked with bm25().
+* PostgreSQL: a tsvector column with a GIN index, ranked with ts_rank().
+
+Any other database falls back to the old `icontains` filters. The backend is
+picked from the connection vendor; set `SEARCH_BACKEND` to a dotted class path
+to override it. Indexes are kept in sync by signals in `core.signals` and can
+be rebuilt with `python manage.py rebuild_search_index`.
+
+Every backend's `search()` returns the queryset filtered to matching rows and
+annotated with `search_rank` (higher is more relevant), so results can be
+paginated with `paginate_keyset(..., key="search_rank")`.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+# Indexed columns per model, most important first.
+SEARCH_FIELDS = {
+    "room": ("title", "city", "neighborhood", "description"),
+    "profile": ("name", "city", "neighborhood", "bio"),
+}
+
+# Relative importance of each column above (bm25 column weights / tsvector A-D).
+FIELD_WEIGHTS = (10.0, 5.0, 5.0, 1.0)
+POSTGRES_WEIGHT_LABELS = ("A", "B", "B", "C")
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def index_table(model):
+    return f"core_{model._meta.model_name}_search"
+
+
+def tokenize(query):
+    """Split free text into the word tokens the index understands."""
+    return TOKEN_RE.findall(query or "")
+
+
+class BaseSearchBackend:
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def index(self, instance):
+        pass
+
+    def remove(self, instance):
+        pass
+
+    def rebuild(self, model, batch_size=500):
+        """Re-index every row of `model`; returns the number of rows indexed."""
+        return 0
+
+
+class LikeSearchBackend(BaseSearchBackend):
+    """Unindexed substring search; used when no full-text engine is available."""
+
+    def search(self, queryset, query):
+        model_name = queryset.model._meta.model_name
+        condition = Q()
+        for field in SEARCH_FIELDS[model_name]:
+            condition |= Q(**{f"{field}__icontains": query})
+        return queryset.filter(condition).annotate(search_rank=Value(1.0, output_field=FloatField()))
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """SQLite FTS5 index with prefix matching on every query term."""
+
+    def match_expression(self, query):
+        return " ".join(f'"{token}"*' for token in tokenize(query))
+
+    def search(self, queryset, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset.none()
+        model = queryset.model
+        table = index_table(model)
+        weights = ", ".join(str(w) for w in FIELD_WEIGHTS)
+        matches = RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", (expression,))
+        rank = RawSQL(
+            f"SELECT -bm25({table}, {weights}) FROM {table} "
+            f"WHERE {table} MATCH %s AND rowid = {model._meta.db_table}.id",
+            (expression,),
+            output_field=FloatField(),
+        )
+        return queryset.filter(id__in=matches).annotate(search_rank=rank)
+
+    def index(self, instance):
+        table = index_table(type(instance))
+        fields = SEARCH_FIELDS[instance._meta.model_name]
+        values = [getattr(instance, f) or "" for f in fields]
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [instance.pk])
+            cursor.execute(
+                f"INSERT INTO {table} (rowid, {', '.join(fields)}) VALUES (%s, {', '.join(['%s'] * len(fields))})",
+                [instance.pk, *values],
+            )
+
+    def remove(self, instance):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {index_table(type(instance))} WHERE rowid = %s", [instance.pk])
+
+    def rebuild(self, model, batch_size=500):
+        table = index_table(model)
+        fields = SEARCH_FIELDS[model._meta.model_name]
+        insert = f"INSERT INTO {table} (rowid, {', '.join(fields)}) VALUES (%s, {', '.join(['%s'] * len(fields))})"
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table}")
+            rows = model.objects.order_by().values_list("pk", *fields)
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append([row[0], *(value or "" for value in row[1:])])
+                if len(batch) >= batch_size:
+                    cursor.executemany(insert, batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(insert, batch)
+                total += len(batch)
+        return total
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """tsvector documents in a GIN-indexed side table, ranked with ts_rank."""
+
+    config = "english"
+
+    def tsquery(self, query):
+        return " & ".join(f"{token}:*" for token in tokenize(query))
+
+    def document_sql(self, fields):
+        parts = [
+            f"setweight(to_tsvector('{self.config}', coalesce(%s, '')), '{label}')"
+            for _, label in zip(fields, POSTGRES_WEIGHT_LABELS)
+        ]
+        return " || ".join(parts)
+
+    def search(self, queryset, query):
+        expression = self.tsquery(query)
+        if not expression:
+            return queryset.none()
+        model = queryset.model
+        table = index_table(model)
+        matches = RawSQL(
+            f"SELECT object_id FROM {table} WHERE document @@ to_tsquery('{self.config}', %s)",
+            (expression,),
+        )
+        rank = RawSQL(
+            f"SELECT ts_rank(document, to_tsquery('{self.config}', %s)) FROM {table} "
+            f"WHERE object_id = {model._meta.db_table}.id",
+            (expression,),
+            output_field=FloatField(),
+        )
+        return queryset.filter(id__in=matches).annotate(search_rank=rank)
+
+    def index(self, instance):
+        table = index_table(type(instance))
+        fields = SEARCH_FIELDS[instance._meta.model_name]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (object_id, document) VALUES (%s, {self.document_sql(fields)}) "
+                f"ON CONFLICT (object_id) DO UPDATE SET document = EXCLUDED.document",
+                [instance.pk, *(getattr(instance, f) for f in fields)],
+            )
+
+    def remove(self, instance):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {index_table(type(instance))} WHERE object_id = %s", [instance.pk])
+
+    def rebuild(self, model, batch_size=500):
+        table = index_table(model)
+        fields = SEARCH_FIELDS[model._meta.model_name]
+        source = model._meta.db_table
+        columns = [f"{source}.{model._meta.get_field(f).column}" for f in fields]
+        document = self.document_sql(fields) % tuple(columns)
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {table}")
+            cursor.execute(f"INSERT INTO {table} (object_id, document) SELECT {source}.id, {document} FROM {source}")
+            return cursor.rowcount
+
+
+@lru_cache(maxsize=None)
+def _backend_for(vendor, override):
+    if override:
+        return import_string(override)()
+    if vendor == "sqlite":
+        return SQLiteFTSBackend()
+    if vendor == "postgresql":
+        return PostgresSearchBackend()
+    return LikeSearchBackend()
+
+
+def get_search_backend():
+    return _backend_for(connection.vendor, getattr(settings, "SEARCH_BACKEND", None))
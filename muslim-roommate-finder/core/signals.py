@@ -0,0 +1,167 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import counts, image_store, matching, ratings, renditions, rescoring, similarity, trending
+from .facets import facet_fields, invalidate_facets
+from .models import Message, Profile, RoommateProfile, Room, RoomFavorite, RoomImage, RoomReview
+from .page_cache import affects_cached_pages, bump_content_version
+from .search import get_search_backend
+
+
+# --- Search index ---
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=Profile)
+def update_search_index(sender, instance, **kwargs):
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Room)
+@receiver(post_delete, sender=Profile)
+def remove_from_search_index(sender, instance, **kwargs):
+    get_search_backend().remove(instance)
+
+
+# --- Facet cache ---
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Room)
+@receiver(post_delete, sender=Profile)
+def clear_facet_cache(sender, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & facet_fields(sender):
+        return
+    invalidate_facets(sender)
+
+
+# --- Row counters ---
+@receiver(pre_save, sender=Room)
+@receiver(pre_save, sender=Profile)
+def remember_counted_membership(sender, instance, update_fields=None, **kwargs):
+    instance._counted_before = counts.stored_membership(sender, instance, update_fields)
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=Profile)
+def adjust_row_counters(sender, instance, **kwargs):
+    for name, before in getattr(instance, '_counted_before', {}).items():
+        counts.adjust(name, counts.matches(name, instance) - before)
+
+
+@receiver(post_delete, sender=Room)
+@receiver(post_delete, sender=Profile)
+def decrement_row_counters(sender, instance, **kwargs):
+    for name in counts.counters_for(sender):
+        if counts.matches(name, instance):
+            counts.adjust(name, -1)
+
+
+def deleting_rooms(origin):
+    """Whether a cascading delete started from rooms, whose derived columns need no update."""
+    return isinstance(origin, Room) or (isinstance(origin, QuerySet) and origin.model is Room)
+
+
+# --- Review aggregates ---
+@receiver(post_delete, sender=RoomReview)
+def remove_review_rating(sender, instance, origin=None, **kwargs):
+    if not deleting_rooms(origin):
+        ratings.remove_review(instance.room_id, instance.rating)
+
+
+# --- Trending scores ---
+@receiver(post_save, sender=RoomFavorite)
+def record_favorite(sender, instance, created=False, **kwargs):
+    if created:
+        trending.record(instance.room_id, 'favorite', instance.created_at)
+
+
+@receiver(post_delete, sender=RoomFavorite)
+def withdraw_favorite(sender, instance, origin=None, **kwargs):
+    if not deleting_rooms(origin):
+        trending.record(instance.room_id, 'favorite', instance.created_at, sign=-1)
+
+
+@receiver(post_save, sender=Message)
+def record_room_message(sender, instance, created=False, **kwargs):
+    if created and instance.room_id:
+        trending.record(instance.room_id, 'message', instance.timestamp)
+
+
+# --- Page cache ---
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Room)
+@receiver(post_delete, sender=Profile)
+def expire_cached_pages(sender, update_fields=None, **kwargs):
+    if affects_cached_pages(update_fields):
+        bump_content_version()
+
+
+# --- Similar profiles ---
+@receiver(post_save, sender=Profile)
+def update_profile_vector(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not set(update_fields) & set(similarity.FEATURE_FIELDS):
+        return
+    rescoring.schedule('profile', instance.pk)
+
+
+@receiver(post_save, sender=RoommateProfile)
+@receiver(post_delete, sender=RoommateProfile)
+def update_profile_budget_vector(sender, instance, origin=None, **kwargs):
+    # Skip when the RoommateProfile goes as part of deleting its profile
+    if origin is None or isinstance(origin, RoommateProfile):
+        rescoring.schedule('profile', instance.profile_id)
+
+
+@receiver(pre_delete, sender=Profile)
+def remember_similar_profile_listers(sender, instance, **kwargs):
+    instance._similar_listed_by = similarity.listed_by(instance.pk)
+    instance._matched_rooms = matching.listed_by('room', instance.pk)
+
+
+@receiver(post_delete, sender=Profile)
+def refresh_similar_profile_listers(sender, instance, **kwargs):
+    listers = getattr(instance, '_similar_listed_by', [])
+    if listers:
+        similarity.refresh_neighbours(listers)
+    rooms = getattr(instance, '_matched_rooms', [])
+    if rooms:
+        matching.refresh_rooms(rooms)
+
+
+# --- Seeker/room matches ---
+@receiver(post_save, sender=Room)
+def update_room_matches(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not set(update_fields) & set(matching.ROOM_FIELDS + ['is_active']):
+        return
+    rescoring.schedule('room', instance.pk)
+
+
+@receiver(pre_delete, sender=Room)
+def remember_matched_seekers(sender, instance, **kwargs):
+    instance._matched_seekers = matching.listed_by('seeker', instance.pk)
+
+
+@receiver(post_delete, sender=Room)
+def refresh_matched_seekers(sender, instance, **kwargs):
+    seekers = getattr(instance, '_matched_seekers', [])
+    if seekers:
+        matching.refresh_seekers(seekers)
+
+
+# --- Room images ---
+@receiver(post_delete, sender=RoomImage)
+def promote_next_room_image(sender, instance, origin=None, **kwargs):
+    # Nothing to promote when the whole room is being deleted
+    if instance.is_primary and not deleting_rooms(origin):
+        RoomImage.objects.promote_first(instance.room_id)
+
+
+@receiver(post_save, sender=RoomImage)
+def render_room_image(sender, instance, **kwargs):
+    if instance.image and not renditions.is_current(instance):
+        renditions.schedule(instance.pk)
+
+
+@receiver(post_delete, sender=RoomImage)
+def release_room_image_file(sender, instance, **kwargs):
+    image_store.release(instance)
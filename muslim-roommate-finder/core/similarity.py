@@ -0,0 +1,242 @@
+"""
+Similar-profile recommendations.
+
+Every profile is encoded as a small NumPy feature vector (age, gender, the
+halal_kitchen/prayer_friendly/guests_allowed preferences, whether they are
+looking for a room, RoommateProfile budget, and hashed city, neighborhood and
+metro codes) stored in ProfileVector. Scores are computed for a block of
+profiles against all others at once with array broadcasting, and the top
+`SIMILAR_PROFILES_K` neighbours of each profile are stored as SimilarProfile
+rows, so `profile_detail` reads them with one indexed lookup.
+
+Saving a profile (or its RoommateProfile) re-encodes only that profile, after
+the save commits (see core.rescoring). If its vector changed, its own neighbours are recomputed, along with the neighbours of
+every profile that either listed it or would now rank it above its current
+last neighbour (read from the rank-K rows, not a GROUP BY over every list),
+`REFRESH_BATCH` lists per block. `rebuild()` (the `rebuild_similar_profiles`
+command) recomputes everything from scratch the same way.
+"""
+import zlib
+
+import numpy as np
+from django.db import transaction
+
+from .models import Profile, ProfileVector, SimilarProfile, normalize_place_name
+
+SIMILAR_PROFILES_K = 6
+# Neighbour lists recomputed per scoring block, bounding the (block x profiles) matrix
+REFRESH_BATCH = 500
+
+# Columns of the feature vector
+AGE, AGE_KNOWN, GENDER, HALAL, PRAYER, GUESTS, LOOKING, BUDGET, BUDGET_KNOWN, CITY, NEIGHBORHOOD, METRO = range(12)
+VECTOR_SIZE = 12
+PREFERENCES = [HALAL, PRAYER, GUESTS]
+
+# Score contributions; a perfect match in the same neighborhood scores 10.25
+WEIGHTS = {
+    'neighborhood': 1.5,
+    'city': 2.0,
+    'metro': 1.0,
+    'gender': 2.0,
+    'age': 1.0,
+    'preference': 0.5,
+    'looking': 0.25,
+    'budget': 1.0,
+}
+# Age difference (years) and budget ratio at which those terms drop to zero
+AGE_SPREAD = 15
+BUDGET_SPREAD = 2
+
+# Profile values() columns the vector is built from
+FEATURE_FIELDS = [
+    'age', 'gender', 'halal_kitchen', 'prayer_friendly', 'guests_allowed',
+    'is_looking_for_room', 'city', 'neighborhood', 'metro',
+]
+ROW_FIELDS = ['id', *FEATURE_FIELDS, 'roommate_profile__budget']
+
+
+def place_code(*parts):
+    """Stable non-zero code for a place name, 0 when it is blank."""
+    names = [normalize_place_name(p) for p in parts]
+    if not names[-1]:
+        return 0
+    return zlib.crc32('|'.join(names).encode()) + 1
+
+
+def encode(row):
+    """Feature vector for one Profile values() row (see ROW_FIELDS)."""
+    vector = np.zeros(VECTOR_SIZE)
+    if row['age']:
+        vector[AGE] = row['age']
+        vector[AGE_KNOWN] = 1
+    vector[GENDER] = {'male': 1, 'female': -1}.get(row['gender'], 0)
+    vector[HALAL] = row['halal_kitchen']
+    vector[PRAYER] = row['prayer_friendly']
+    vector[GUESTS] = row['guests_allowed']
+    vector[LOOKING] = row['is_looking_for_room']
+    budget = row['roommate_profile__budget']
+    if budget:
+        vector[BUDGET] = np.log2(budget)
+        vector[BUDGET_KNOWN] = 1
+    vector[CITY] = place_code(row['city'])
+    vector[NEIGHBORHOOD] = place_code(row['city'], row['neighborhood'])
+    vector[METRO] = place_code(row['metro'])
+    return vector
+
+
+def _to_bytes(vector):
+    return vector.astype(np.float64).tobytes()
+
+
+def _from_bytes(data):
+    return np.frombuffer(bytes(data), dtype=np.float64)
+
+
+def _same_place(queries, candidates, column):
+    q = queries[:, column][:, None]
+    return (q == candidates[:, column][None, :]) & (q != 0)
+
+
+def scores(queries, candidates):
+    """Similarity of every query row to every candidate row, shape (len(queries), len(candidates))."""
+    w = WEIGHTS
+    total = (
+        w['neighborhood'] * _same_place(queries, candidates, NEIGHBORHOOD)
+        + w['city'] * _same_place(queries, candidates, CITY)
+        + w['metro'] * _same_place(queries, candidates, METRO)
+    )
+    total = total + w['gender'] * (queries[:, GENDER][:, None] * candidates[:, GENDER][None, :] > 0)
+
+    both_aged = queries[:, AGE_KNOWN][:, None] * candidates[:, AGE_KNOWN][None, :]
+    age_gap = np.abs(queries[:, AGE][:, None] - candidates[:, AGE][None, :])
+    total = total + w['age'] * both_aged * np.clip(1 - age_gap / AGE_SPREAD, 0, 1)
+
+    prefs = queries[:, PREFERENCES][:, None, :] == candidates[:, PREFERENCES][None, :, :]
+    total = total + w['preference'] * prefs.sum(axis=2)
+    total = total + w['looking'] * (queries[:, LOOKING][:, None] == candidates[:, LOOKING][None, :])
+
+    both_budgets = queries[:, BUDGET_KNOWN][:, None] * candidates[:, BUDGET_KNOWN][None, :]
+    budget_gap = np.abs(queries[:, BUDGET][:, None] - candidates[:, BUDGET][None, :])
+    total = total + w['budget'] * both_budgets * np.clip(1 - budget_gap / np.log2(BUDGET_SPREAD), 0, 1)
+    return total
+
+
+def nearest(ids, matrix, rows, k=SIMILAR_PROFILES_K):
+    """
+    Top-k neighbours of `matrix[rows]` among all of `matrix`, as
+    {profile_id: [(neighbour_id, score), ...]} ordered best first (ties by id).
+    """
+    rows = np.asarray(rows, dtype=int)
+    k = min(k, len(ids) - 1)
+    if k <= 0 or not len(rows):
+        return {int(ids[r]): [] for r in rows}
+
+    block = scores(matrix[rows], matrix)
+    block[np.arange(len(rows)), rows] = -np.inf  # never your own neighbour
+    top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(block, top, axis=1)
+    order = np.lexsort((ids[top], -top_scores), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    return {
+        int(ids[r]): [(int(ids[c]), float(s)) for c, s in zip(top[i], top_scores[i])]
+        for i, r in enumerate(rows)
+    }
+
+
+def load_matrix():
+    """All stored vectors as (ids, matrix), one query."""
+    stored = list(ProfileVector.objects.order_by('profile_id').values_list('profile_id', 'vector'))
+    ids = np.array([pk for pk, _ in stored], dtype=np.int64)
+    matrix = np.array([_from_bytes(v) for _, v in stored]).reshape(len(stored), VECTOR_SIZE)
+    return ids, matrix
+
+
+def _replace_links(neighbours):
+    SimilarProfile.objects.filter(profile_id__in=list(neighbours)).delete()
+    SimilarProfile.objects.bulk_create([
+        SimilarProfile(profile_id=pk, similar_id=other, rank=rank, score=score)
+        for pk, links in neighbours.items()
+        for rank, (other, score) in enumerate(links, 1)
+    ])
+
+
+def refresh_neighbours(profile_ids, ids=None, matrix=None, batch_size=REFRESH_BATCH):
+    """Recompute and store the neighbour lists of `profile_ids`, `batch_size` lists per block."""
+    if ids is None:
+        ids, matrix = load_matrix()
+    position = {int(pk): i for i, pk in enumerate(ids)}
+    rows = [position[pk] for pk in profile_ids if pk in position]
+    with transaction.atomic():
+        for start in range(0, len(rows), batch_size):
+            _replace_links(nearest(ids, matrix, rows[start:start + batch_size]))
+
+
+def update_profile(profile_id):
+    """
+    Re-encode one profile after it (or its RoommateProfile) was saved and
+    refresh the neighbour lists it can affect. Returns False when the vector
+    did not change and nothing had to be recomputed.
+    """
+    row = Profile.objects.filter(pk=profile_id).values(*ROW_FIELDS).first()
+    if row is None:
+        return False
+    data = _to_bytes(encode(row))
+    stored = ProfileVector.objects.filter(profile_id=profile_id).values_list('vector', flat=True).first()
+    if stored is not None and bytes(stored) == data:
+        return False
+
+    # Read and score outside the write transaction, with the new vector in place of the stored one
+    ids, matrix = load_matrix()
+    position = int(np.searchsorted(ids, profile_id))
+    if position == len(ids) or ids[position] != profile_id:
+        ids, matrix = np.insert(ids, position, profile_id), np.insert(matrix, position, 0, axis=0)
+    matrix[position] = encode(row)
+    # Similarity is symmetric, so this row is also every other profile's score for it
+    row_scores = scores(matrix[[position]], matrix)[0]
+
+    others = ids != profile_id
+    affected = set(listed_by(profile_id))
+    if len(ids) - 1 <= SIMILAR_PROFILES_K:
+        # No more profiles than list slots: every list can hold every other profile
+        affected.update(ids[others].tolist())
+    elif others.any():
+        # Lists are full, so their lowest score is the rank-K row; only lists whose
+        # lowest is below this profile's score for them can take it in
+        score_for = dict(zip(ids.tolist(), row_scores.tolist()))
+        full_lists = SimilarProfile.objects.filter(rank=SIMILAR_PROFILES_K, score__lt=float(row_scores[others].max()))
+        for pk, lowest in full_lists.values_list('profile_id', 'score'):
+            if pk != profile_id and score_for.get(pk, -np.inf) > lowest:
+                affected.add(pk)
+
+    with transaction.atomic():
+        ProfileVector.objects.update_or_create(profile_id=profile_id, defaults={'vector': data})
+        refresh_neighbours([profile_id, *sorted(affected)], ids, matrix)
+    return True
+
+
+def listed_by(profile_id):
+    """Ids of the profiles that currently list `profile_id` as a neighbour."""
+    return list(SimilarProfile.objects.filter(similar_id=profile_id).values_list('profile_id', flat=True))
+
+
+def rebuild(batch_size=REFRESH_BATCH):
+    """Re-encode every profile and recompute all neighbour lists. Returns the profile count."""
+    rows = Profile.objects.order_by('pk').values(*ROW_FIELDS)
+    ids = []
+    vectors = []
+    for row in rows.iterator(chunk_size=batch_size):
+        ids.append(row['id'])
+        vectors.append(encode(row))
+    ids = np.array(ids, dtype=np.int64)
+    matrix = np.array(vectors).reshape(len(ids), VECTOR_SIZE)
+
+    ProfileVector.objects.all().delete()
+    ProfileVector.objects.bulk_create(
+        [ProfileVector(profile_id=int(pk), vector=_to_bytes(v)) for pk, v in zip(ids, matrix)],
+        batch_size=batch_size,
+    )
+    SimilarProfile.objects.all().delete()
+    refresh_neighbours(ids.tolist(), ids, matrix, batch_size)
+    return len(ids)
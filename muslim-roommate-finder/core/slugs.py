@@ -0,0 +1,123 @@
+"""
+Unique slug allocation for Profile and Room.
+
+Slugs follow the pattern `base`, `base-1`, `base-2`, ... up to MAX_SUFFIX, so a
+slug always fits the column. The next free slug for a base is found with one
+aggregate query (is `base` taken, and what is the highest numeric suffix in
+use), instead of probing candidates one by one; only when that reaches
+MAX_SUFFIX are the unused numbers below it looked up.
+Two concurrent saves can still pick the same slug, so `save_with_unique_slug`
+saves inside a savepoint and allocates again when the slug's unique
+constraint rejects the row.
+
+`assign_slugs` allocates slugs for many unsaved instances at once (one query
+per distinct base), for bulk creation paths such as `populate_sample_data`.
+"""
+import re
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Count, Max, Q
+from django.db.models.functions import Cast, Substr
+from django.utils.text import slugify
+
+SLUG_ATTEMPTS = 5
+# Room for a "-NNNNN" suffix within the slug column
+SUFFIX_ROOM = 6
+MAX_SUFFIX = 10 ** (SUFFIX_ROOM - 1) - 1
+
+
+def slug_base(model, text, fallback):
+    """Slugified `text` (or `fallback`), cut so a suffix still fits the column."""
+    max_length = model._meta.get_field('slug').max_length
+    base = slugify(text or '') or slugify(fallback or '') or model._meta.model_name
+    return base[:max_length - SUFFIX_ROOM].strip('-')
+
+
+def _numbered(base):
+    # Anchored and bounded to the suffix room, so only short all-digit tails are
+    # cast (not "base-downtown-2", nor "base-5551234567" from a phone number title)
+    pattern = rf'^{re.escape(base)}-[0-9]{{1,{SUFFIX_ROOM - 1}}}$'
+    return Q(slug__startswith=f'{base}-', slug__regex=pattern)
+
+
+def _suffix(base):
+    return Cast(Substr('slug', len(base) + 2), BigIntegerField())
+
+
+def _slug_usage(model, base):
+    """(is `base` itself taken, highest numeric suffix in use or None), one query."""
+    usage = model._default_manager.filter(Q(slug=base) | _numbered(base)).aggregate(
+        taken=Count('pk', filter=Q(slug=base)),
+        top=Max(_suffix(base), filter=~Q(slug=base)),
+    )
+    return bool(usage['taken']), usage['top']
+
+
+def free_suffixes(model, base, top):
+    """
+    Free numeric suffixes for `base`: counting up from `top`, then, once
+    MAX_SUFFIX is reached (e.g. a "Room 99999" title took the last one), the
+    unused numbers below it, read in one more query.
+    """
+    top = top or 0
+    yield from range(top + 1, MAX_SUFFIX + 1)
+    used = set(
+        model._default_manager.filter(_numbered(base)).annotate(suffix=_suffix(base)).values_list('suffix', flat=True)
+    )
+    yield from (suffix for suffix in range(1, min(top, MAX_SUFFIX) + 1) if suffix not in used)
+
+
+def _next_numbered(base, suffixes):
+    suffix = next(suffixes, None)
+    if suffix is None:
+        raise IntegrityError(f'No free slug left for "{base}"')
+    return f'{base}-{suffix}'
+
+
+def next_free_slug(model, base):
+    taken, top = _slug_usage(model, base)
+    if not taken and top is None:
+        return base
+    return _next_numbered(base, free_suffixes(model, base, top))
+
+
+def save_with_unique_slug(instance, base, save, *args, **kwargs):
+    """
+    Give `instance` the next free slug for `base` and call `save`, retrying
+    with a fresh slug if a concurrent save took it first.
+    """
+    model = type(instance)
+    for attempt in range(SLUG_ATTEMPTS):
+        instance.slug = next_free_slug(model, base)
+        try:
+            with transaction.atomic():
+                return save(*args, **kwargs)
+        except IntegrityError:
+            lost_race = model._default_manager.filter(slug=instance.slug).exists()
+            if not lost_race or attempt == SLUG_ATTEMPTS - 1:
+                instance.slug = ''
+                raise
+
+
+def assign_slugs(instances, text, fallback=None):
+    """
+    Set a unique slug on every unsaved instance without one. `text` and
+    `fallback` are callables returning the text a slug is built from.
+    """
+    by_base = defaultdict(list)
+    for instance in instances:
+        if not instance.slug:
+            model = type(instance)
+            fallback_text = fallback(instance) if fallback else ''
+            by_base[(model, slug_base(model, text(instance), fallback_text))].append(instance)
+
+    for (model, base), group in by_base.items():
+        taken, top = _slug_usage(model, base)
+        suffixes = free_suffixes(model, base, top)
+        if not taken and top is None:
+            group[0].slug = base
+            group = group[1:]
+        for instance in group:
+            instance.slug = _next_numbered(base, suffixes)
+    return instances
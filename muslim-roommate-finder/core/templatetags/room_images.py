@@ -0,0 +1,56 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.safestring import mark_safe
+
+from core import renditions
+from core.renditions import DEFAULT_RENDITION, RENDITIONS
+
+register = template.Library()
+
+DEFAULT_SIZES = '(max-width: 768px) 100vw, 33vw'
+
+
+@register.filter
+def rendition(room_image, name=DEFAULT_RENDITION):
+    """URL of a RoomImage rendition: {{ image|rendition:"detail" }}."""
+    if not room_image:
+        return ''
+    return room_image.get_thumbnail_url(name) or ''
+
+
+@register.simple_tag
+def responsive_image(room_image, name=DEFAULT_RENDITION, sizes=DEFAULT_SIZES, loading='lazy', **attrs):
+    """
+    <img> for a RoomImage with a srcset of every rendition, explicit width and
+    height (so the page doesn't reflow as images load) and the dominant colour
+    as a placeholder background. Built from stored metadata only:
+
+        {% responsive_image image "card" class="img-fluid" alt=room.title %}
+    """
+    if not room_image:
+        return ''
+    attrs.setdefault('alt', room_image.caption or 'Room image')
+    attrs.update(src=room_image.get_thumbnail_url(name), loading=loading, decoding='async')
+
+    size = None
+    if renditions.is_current(room_image):
+        storage = room_image.image.storage
+        candidates = {}
+        # Renditions of an original smaller than their box all come out at the
+        # original's size; list each width once, from the smallest box
+        for rendition_name in sorted(room_image.renditions, key=lambda name: RENDITIONS[name]):
+            rendition_size = renditions.rendition_size(room_image, rendition_name)
+            if rendition_size:
+                candidates.setdefault(rendition_size[0], storage.url(room_image.renditions[rendition_name]))
+        if candidates:
+            attrs['srcset'] = ', '.join(f'{url} {width}w' for width, url in sorted(candidates.items()))
+            attrs['sizes'] = sizes
+        size = renditions.rendition_size(room_image, renditions.pick(name))
+    elif room_image.width and room_image.height:
+        size = room_image.width, room_image.height
+
+    if size:
+        attrs['width'], attrs['height'] = size
+    if room_image.dominant_color:
+        attrs['style'] = f'background-color: {room_image.dominant_color}'
+    return mark_safe(f'<img{flatatt(attrs)}>')
@@ -1,3 +1,1583 @@
-from django.test import TestCase
+import hashlib
+import os
+import random
+import shutil
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig, ValidationError
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse, QueryDict
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from . import views
+from .facets import PROFILE_COUNT_FACETS, count_facets, get_facet
+from .filters import filter_rooms
+from .lookups import location_q
+from .middleware import QueryBudgetExceeded, QueryBudgetMiddleware, query_budget
+from . import availability, counts, geo, image_store, matching, ratings, renditions, rescoring, similarity, slugs, trending, uploads
+from .models import Message, MetroArea, MetroAreaPlace, Profile, RoommateProfile, Room, RoomAvailability, RoomFavorite, RoomImage, RoomMatch, RoomReview, RowCount, SimilarProfile, StoredImage, TrendingEpoch
+from .page_cache import content_version, normalize_query, page_cache_stats
+from .pagination import paginate_keyset
+from .search import get_search_backend
+
+
+def make_profile(username, **fields):
+    """Create a User and fill in the Profile the post_save signal creates for it."""
+    user = User.objects.create_user(username=username)
+    profile = user.profile
+    fields.setdefault("name", username.title())
+    fields.setdefault("gender", "male")
+    for key, value in fields.items():
+        setattr(profile, key, value)
+    profile.save()
+    return profile
+
+
+def make_room(owner, title="Private Room", **fields):
+    fields.setdefault("city", "Charleston")
+    fields.setdefault("price", Decimal("800.00"))
+    return Room.objects.create(user=owner, title=title, **fields)
+
+
+def make_image_file(name="photo.jpg", size=(40, 30), color="green"):
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, "JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+class CoreTestCase(TestCase):
+    """TestCase that starts from an empty cache, so cached pages and facets never leak between tests."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+
+class MediaTestCase(CoreTestCase):
+    """TestCase that writes uploaded files to a throwaway MEDIA_ROOT."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class KeysetPaginationTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        owner = make_profile("owner")
+        self.rooms = [make_room(owner, title=f"Room {i}") for i in range(7)]
+        # Force ties on created_at so the id tiebreaker is exercised.
+        Room.objects.filter(pk__in=[r.pk for r in self.rooms[:4]]).update(
+            created_at=self.rooms[0].created_at
+        )
+        Room.objects.filter(pk=self.rooms[6].pk).update(created_at=None)
+
+    def walk(self, queryset, per_page):
+        seen, token = [], None
+        while True:
+            page = paginate_keyset(queryset, token, per_page)
+            seen.extend(r.pk for r in page)
+            if not page.has_next:
+                return seen
+            token = page.next_token
+
+    def test_forward_walk_visits_every_row_once(self):
+        seen = self.walk(Room.objects.all(), per_page=3)
+        self.assertEqual(sorted(seen), sorted(r.pk for r in self.rooms))
+        self.assertEqual(seen[-1], self.rooms[6].pk)
+
+    def test_previous_token_returns_to_prior_page(self):
+        first = paginate_keyset(Room.objects.all(), None, 3)
+        second = paginate_keyset(Room.objects.all(), first.next_token, 3)
+        back = paginate_keyset(Room.objects.all(), second.previous_token, 3)
+        self.assertEqual([r.pk for r in back], [r.pk for r in first])
+        self.assertFalse(back.has_previous)
+        self.assertTrue(back.has_next)
+
+    def test_invalid_token_falls_back_to_first_page(self):
+        page = paginate_keyset(Room.objects.all(), "not-a-token", 3)
+        self.assertEqual(len(page), 3)
+        self.assertFalse(page.has_previous)
+
+    def test_home_next_link_keeps_filters(self):
+        url = reverse("home") + "?city=Charleston&gender=male"
+        with mock.patch.object(views, "HOME_PAGE_SIZE", 2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        token = response.context["available_rooms"].next_token
+        self.assertContains(response, "city=Charleston&amp;gender=male&amp;" + urlencode({"rooms_cursor": token}))
+
+
+class ListingQueryCountTests(MediaTestCase):
+    def add_rooms(self, count):
+        for i in range(count):
+            owner = make_profile(f"owner{Room.objects.count()}")
+            room = make_room(owner, title=f"Room {i}")
+            RoomImage.objects.create(room=room, image=make_image_file())
+            RoomImage.objects.create(room=room, image=make_image_file(), is_primary=True)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_home_query_count_is_constant(self):
+        self.add_rooms(2)
+        small = self.count_queries(reverse("home"))
+        self.add_rooms(6)
+        self.assertEqual(self.count_queries(reverse("home")), small)
+
+    def test_advanced_search_query_count_is_constant(self):
+        self.add_rooms(2)
+        small = self.count_queries(reverse("advanced_search"))
+        self.add_rooms(6)
+        self.assertEqual(self.count_queries(reverse("advanced_search")), small)
+
+    def test_for_listing_resolves_explicit_primary_image(self):
+        self.add_rooms(1)
+        room = Room.objects.for_listing().get()
+        with self.assertNumQueries(0):
+            primary = room.primary_image
+            owner_name = room.user.name
+        self.assertTrue(primary.is_primary)
+        self.assertEqual(primary, Room.objects.get().primary_image)
+        self.assertTrue(owner_name)
+
+
+class SearchBackendTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = make_profile("owner", city="Charleston")
+        self.title_match = make_room(self.owner, title="Quiet room near the mosque")
+        self.body_match = make_room(self.owner, title="Sunny studio", description="Short walk to the mosque")
+        self.other = make_room(self.owner, title="Garage apartment", city="Summerville")
+
+    def search(self, query):
+        return list(get_search_backend().search(Room.objects.all(), query).order_by("-search_rank"))
+
+    def test_ranks_title_matches_above_description_matches(self):
+        self.assertEqual(self.search("mosque"), [self.title_match, self.body_match])
+
+    def test_matches_word_prefixes(self):
+        self.assertEqual(self.search("summ"), [self.other])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.other.title = "Mosque-adjacent garage"
+        self.other.save()
+        self.assertIn(self.other, self.search("mosque"))
+        self.title_match.delete()
+        self.assertNotIn(self.title_match.pk, [r.pk for r in self.search("mosque")])
+
+    def test_rebuild_command_restores_index(self):
+        Room.objects.filter(pk=self.other.pk).update(title="Renamed via bulk update")
+        self.assertEqual(self.search("renamed"), [])
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.search("renamed"), [self.other])
+
+    def test_home_search_uses_index(self):
+        response = self.client.get(reverse("home"), {"search": "mosque"})
+        self.assertEqual(list(response.context["available_rooms"]), [self.title_match, self.body_match])
+
+
+class FacetCacheTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        owner = make_profile("owner", city="Mount Pleasant")
+        make_profile("second", city="Mount Pleasant")
+        make_profile("third", city="Summerville")
+        make_room(owner, city="Mount Pleasant")
+
+    def test_counts_per_value(self):
+        self.assertEqual(get_facet("profile_city"), [("Mount Pleasant", 2), ("Summerville", 1)])
+        self.assertEqual(get_facet("room_city"), [("Mount Pleasant", 1)])
+
+    def test_cached_until_model_changes(self):
+        get_facet("profile_city")
+        with self.assertNumQueries(0):
+            get_facet("profile_city")
+        make_profile("fourth", city="Summerville")
+        self.assertEqual(get_facet("profile_city"), [("Mount Pleasant", 2), ("Summerville", 2)])
+
+    def test_only_facet_fields_drop_the_cache(self):
+        get_facet("profile_city")
+        profile = Profile.objects.get(user__username="third")
+        profile.bio = "Unrelated to any facet"
+        profile.save()
+        with self.assertNumQueries(0):
+            get_facet("profile_city")
+        profile.city = "Mount Pleasant"
+        profile.save()
+        self.assertEqual(get_facet("profile_city"), [("Mount Pleasant", 3)])
+
+    def test_home_dropdown_shows_counts(self):
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, "Mount Pleasant (2)")
+
+
+class FacetCountTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        make_profile("amina", gender="female", city="Charleston", halal_kitchen=True)
+        make_profile("yusuf", gender="male", city="Charleston", bio="Quiet mosque regular")
+        make_profile("omar", gender="male", city="Summerville", halal_kitchen=True)
+
+    def test_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            facets = count_facets(Profile.objects.all(), PROFILE_COUNT_FACETS)
+        self.assertEqual(facets.total, 3)
+        self.assertEqual(facets.counts["male"], 2)
+        self.assertEqual(facets.counts["halal_kitchen"], 2)
+        self.assertEqual(facets.cities, [("Charleston", 2), ("Summerville", 1)])
+
+    def test_counts_follow_search_filter(self):
+        results = get_search_backend().search(Profile.objects.all(), "mosque")
+        facets = count_facets(results, PROFILE_COUNT_FACETS)
+        self.assertEqual(facets.total, 1)
+        self.assertEqual(facets.counts["female"], 0)
+
+
+class MetroAreaTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = make_profile("owner", city="Mount Pleasant")
+
+    def test_metro_filled_on_save(self):
+        self.assertEqual(self.owner.metro, "charleston")
+        self.assertTrue(self.owner.is_charleston_area())
+        room = make_room(self.owner, city="  west   ASHLEY ")
+        self.assertEqual(room.metro, "charleston")
+        self.assertEqual(make_room(self.owner, city="Atlanta", neighborhood="Downtown").metro, "")
+
+    def test_charleston_only_filters_on_metro(self):
+        inside = make_room(self.owner, title="Inside", city="James Island")
+        make_room(self.owner, title="Outside", city="Columbia")
+        response = self.client.get(reverse("home"), {"charleston_only": "1"})
+        self.assertEqual(list(response.context["available_rooms"]), [inside])
+
+    def test_new_metro_needs_no_code_changes(self):
+        atlanta = MetroArea.objects.create(name="Atlanta, GA", slug="atlanta")
+        room = make_room(self.owner, city="Decatur")
+        MetroAreaPlace.objects.create(metro_area=atlanta, name="Decatur")
+        call_command("backfill_metros", stdout=StringIO())
+        room.refresh_from_db()
+        self.assertEqual(room.metro, "atlanta")
+        response = self.client.get(reverse("home"), {"metro": "atlanta"})
+        self.assertEqual(list(response.context["available_rooms"]), [room])
+
+
+class LocationLookupTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        owner = make_profile("owner")
+        self.mount_pleasant = make_room(owner, city="Mount Pleasant")
+        self.north = make_room(owner, city="North Charleston")
+        self.charleston = make_room(owner, city="charleston")
+
+    def filter_rooms(self, value):
+        known = [f.value for f in get_facet("room_city")]
+        return set(Room.objects.filter(location_q("city", value, known)))
+
+    def test_dropdown_value_matches_exactly(self):
+        self.assertEqual(self.filter_rooms("Charleston"), {self.charleston})
+        self.assertIn("LOWER(", str(Room.objects.filter(location_q("city", "Charleston", ["charleston"])).query))
+
+    def test_prefix_uses_range_on_lowered_column(self):
+        self.assertEqual(self.filter_rooms("mount"), {self.mount_pleasant})
+        query = str(Room.objects.filter(location_q("city", "mount", ["Mount Pleasant"])).query)
+        self.assertIn('LOWER("core_room"."city") >=', query)
+
+    def test_free_text_keeps_substring_semantics(self):
+        self.assertEqual(self.filter_rooms("charles"), {self.north, self.charleston})
+        self.assertEqual(self.filter_rooms("pleas"), {self.mount_pleasant})
+
+
+class PageCacheTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = make_profile("owner")
+        make_room(self.owner, title="Cached room")
+
+    def test_anonymous_pages_are_cached_per_normalized_query(self):
+        first = self.client.get("/?gender=male&city=&search=room")
+        second = self.client.get("/?search=room&gender=male")
+        self.assertEqual(first["X-Page-Cache"], "MISS")
+        self.assertEqual(second["X-Page-Cache"], "HIT")
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(page_cache_stats()["hits"], 1)
+        self.assertEqual(page_cache_stats()["misses"], 1)
+
+    def test_room_change_expires_cached_pages(self):
+        self.client.get(reverse("home"))
+        make_room(self.owner, title="Brand new listing")
+        response = self.client.get(reverse("home"))
+        self.assertEqual(response["X-Page-Cache"], "MISS")
+        self.assertContains(response, "Brand new listing")
+
+    def test_login_and_unrendered_saves_keep_cached_pages(self):
+        user = self.owner.user
+        user.set_password("pw")
+        user.save()
+        version = content_version()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.client.login(username="owner", password="pw"))
+        # Only auth and session queries: the profile is not re-saved or re-indexed
+        self.assertFalse([q["sql"] for q in queries if "core_" in q["sql"]])
+        profile = Profile.objects.get(pk=self.owner.pk)
+        profile.save()
+        self.assertEqual(content_version(), version)
+
+        profile.bio = "Now with a bio"
+        profile.save()
+        self.assertEqual(content_version(), version + 1)
+
+    def test_logged_in_users_bypass_cache(self):
+        self.client.get(reverse("home"))
+        self.client.force_login(self.owner.user)
+        response = self.client.get(reverse("home"))
+        self.assertNotIn("X-Page-Cache", response)
+        self.assertContains(response, "Logout")
+
+    def test_normalize_query(self):
+        query = QueryDict("b=2&a=&amenities=3&amenities=1")
+        self.assertEqual(normalize_query(query), "amenities=1&amenities=3&b=2")
+
+
+class SearchApiTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = make_profile("owner", city="Charleston", bio="Long biography " * 50)
+        self.rooms = [
+            make_room(self.owner, title=f"Room {i}", price=Decimal(500 + 100 * i), description="Long text " * 100)
+            for i in range(5)
+        ]
+
+    def test_sparse_fieldset_selects_only_requested_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("api_rooms"), {"fields": "id,title,owner_name"})
+        data = response.json()
+        self.assertEqual(set(data["results"][0]), {"id", "title", "owner_name"})
+        self.assertEqual(data["results"][0]["owner_name"], "Owner")
+        select = [q["sql"] for q in ctx.captured_queries if '"core_room"."title"' in q["sql"]][0]
+        self.assertNotIn('"core_room"."description"', select)
+
+    def test_filters_and_cursor_pagination(self):
+        url = reverse("api_rooms")
+        first = self.client.get(url, {"min_rent": "600", "page_size": "2", "fields": "id,price"}).json()
+        self.assertEqual([r["id"] for r in first["results"]], [self.rooms[4].pk, self.rooms[3].pk])
+        second = self.client.get(first["next"]).json()
+        self.assertEqual([r["id"] for r in second["results"]], [self.rooms[2].pk, self.rooms[1].pk])
+        self.assertIsNone(second["next"])
+        self.assertIn("min_rent=600", second["previous"])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(reverse("api_profiles"), {"fields": "name,password"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.json()["error"])
+
+    def test_profiles_default_fields_skip_bio(self):
+        data = self.client.get(reverse("api_profiles"), {"city": "Charleston"}).json()
+        self.assertEqual(len(data["results"]), 1)
+        self.assertNotIn("bio", data["results"][0])
+
+    def test_search_results_are_ranked(self):
+        data = self.client.get(reverse("api_rooms"), {"search": "room 3", "fields": "title"}).json()
+        self.assertEqual(data["results"][0]["title"], "Room 3")
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class QueryBudgetTests(CoreTestCase):
+    """
+    Every view with a @query_budget is exercised on the sample dataset. The
+    test settings enforce budgets, so a view that regresses raises
+    QueryBudgetExceeded and fails here.
+    """
+
+    def setUp(self):
+        super().setUp()
+        call_command("populate_sample_data", stdout=StringIO())
+        self.owner = Profile.objects.filter(rooms__isnull=False).first()
+        self.room = self.owner.rooms.first()
+
+    def assert_within_budget(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        self.assertTrue(settings.QUERY_BUDGET_ENFORCE)
+        return response
+
+    def test_anonymous_pages(self):
+        for url in [
+            reverse("home"),
+            reverse("home") + "?search=room&charleston_only=1",
+            reverse("home") + "?city=Charleston&neighborhood=Downtown&gender=male",
+            reverse("advanced_search") + "?min_rent=500&amenities=1&amenities=2",
+            reverse("profile_detail", args=[self.owner.pk]),
+            reverse("api_rooms") + "?fields=id,title,owner_name,room_type",
+            reverse("api_profiles") + "?search=sample",
+        ]:
+            cache.clear()
+            self.assert_within_budget(url)
+
+    def test_logged_in_pages(self):
+        self.client.force_login(self.owner.user)
+        for url in [
+            reverse("home"),
+            reverse("dashboard"),
+            reverse("my_listings"),
+            reverse("room_detail", args=[self.room.pk]),
+        ]:
+            cache.clear()
+            self.assert_within_budget(url)
+
+
+class QueryBudgetMiddlewareTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        make_profile("owner")
+
+    def run_view(self, budget):
+        @query_budget(budget)
+        def view(request):
+            list(Profile.objects.all())
+            list(Profile.objects.all())
+            return HttpResponse("ok")
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = QueryBudgetMiddleware(get_response)
+        return middleware(RequestFactory().get("/"))
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers_report_counts_and_duplicates(self):
+        response = self.run_view(budget=5)
+        self.assertEqual(response["X-DB-Query-Count"], "2")
+        self.assertEqual(response["X-DB-Duplicate-Queries"], "1")
+        self.assertEqual(response["X-DB-Query-Budget"], "5")
+
+    def test_exceeding_budget_raises_when_enforced(self):
+        with self.assertLogs("core.queries", "WARNING"):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.run_view(budget=1)
+
+    @override_settings(QUERY_BUDGET_ENFORCE=False)
+    def test_exceeding_budget_only_logs_when_not_enforced(self):
+        with self.assertLogs("core.queries", "WARNING") as logs:
+            response = self.run_view(budget=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("over its budget of 1", logs.output[0])
+
+
+class SimilarProfileTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        # Rescoring runs after commit (see core.rescoring)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.amir = make_profile("amir", age=25, city="Charleston", neighborhood="Downtown", halal_kitchen=True)
+            self.bilal = make_profile("bilal", age=26, city="Charleston", neighborhood="Downtown", halal_kitchen=True)
+            self.carl = make_profile("carl", age=45, city="Charleston", neighborhood="West Ashley")
+            self.dana = make_profile("dana", age=25, gender="female", city="Columbia")
+
+    def neighbours(self, profile):
+        return list(profile.similar_links.values_list("similar__name", flat=True))
+
+    def test_neighbours_ranked_by_location_gender_age_and_preferences(self):
+        self.assertEqual(self.neighbours(self.amir), ["Bilal", "Carl", "Dana"])
+        self.assertEqual(self.neighbours(self.dana)[-1], "Carl")
+
+    def test_budget_counts_towards_similarity(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RoommateProfile.objects.create(profile=self.amir, budget=900)
+        before = self.amir.similar_links.get(similar=self.carl).score
+        with self.captureOnCommitCallbacks(execute=True):
+            RoommateProfile.objects.create(profile=self.carl, budget=950)
+        after = self.amir.similar_links.get(similar=self.carl).score
+        self.assertGreater(after, before + 0.9)
+
+    def test_new_and_changed_profiles_update_other_lists(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            twin = make_profile("twin", age=25, city="Charleston", neighborhood="Downtown", halal_kitchen=True)
+        self.assertEqual(self.neighbours(self.amir)[0], "Twin")
+
+        twin.city = "Columbia"
+        twin.neighborhood = ""
+        with self.captureOnCommitCallbacks(execute=True):
+            twin.save()
+        self.assertEqual(self.neighbours(self.amir)[0], "Bilal")
+
+    def test_unchanged_save_does_not_recompute(self):
+        self.assertFalse(similarity.update_profile(self.amir.pk))
+        self.amir.age = 30
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks() as callbacks:
+            self.amir.save()
+        # Nothing is read or rescored until the save commits
+        self.assertFalse([q for q in queries if "core_similarprofile" in q["sql"] or "core_profilevector" in q["sql"]])
+        self.assertEqual(len(callbacks), 1)
+        self.amir.age = 25
+        self.amir.save()
+        with CaptureQueriesContext(connection) as queries:
+            callbacks[0]()
+        self.assertFalse([q for q in queries if "core_similarprofile" in q["sql"]])
+
+    @override_settings(RESCORING_IN_BACKGROUND=True)
+    def test_background_rescoring_is_queued_once_per_profile(self):
+        with mock.patch("core.rescoring._executor") as executor, self.captureOnCommitCallbacks(execute=True):
+            self.amir.age = 30
+            self.amir.save()
+            self.amir.halal_kitchen = False
+            self.amir.save()
+        executor.return_value.submit.assert_called_once_with(rescoring._run_in_background, "profile", self.amir.pk)
+
+    def test_growing_past_the_list_size_keeps_lists_exact(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(6):
+                make_profile(f"extra{i}", age=30 + i, city="Summerville")
+        profile = Profile.objects.get(user__username="extra0")
+        profile.city = "Charleston"
+        profile.neighborhood = "Downtown"
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        self.assertFalse([q for q in queries if "GROUP BY" in q["sql"]])
+        incremental = list(SimilarProfile.objects.values_list("profile_id", "similar_id", "rank"))
+        similarity.rebuild(batch_size=2)
+        self.assertEqual(list(SimilarProfile.objects.values_list("profile_id", "similar_id", "rank")), incremental)
+
+    def test_deleting_a_profile_refills_lists_that_named_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bilal.user.delete()
+        self.assertEqual(self.neighbours(self.amir), ["Carl", "Dana"])
+        self.assertFalse(SimilarProfile.objects.filter(similar_id=self.bilal.pk).exists())
+
+    def test_rebuild_matches_incremental_updates(self):
+        incremental = list(SimilarProfile.objects.values_list("profile_id", "similar_id", "rank"))
+        call_command("rebuild_similar_profiles", stdout=StringIO())
+        self.assertEqual(list(SimilarProfile.objects.values_list("profile_id", "similar_id", "rank")), incremental)
+
+    def test_profile_detail_shows_precomputed_neighbours(self):
+        response = self.client.get(reverse("profile_detail", args=[self.amir.pk]))
+        self.assertEqual([p.name for p in response.context["similar_profiles"]], ["Bilal", "Carl", "Dana"])
+
+
+class RoomMatchTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.owner = make_profile("owner")
+            self.sara = make_profile("sara", gender="female", city="Charleston", is_looking_for_room=True, halal_kitchen=True)
+            RoommateProfile.objects.create(profile=self.sara, budget=900)
+            self.halal = make_room(self.owner, "Halal Room", price=Decimal("850"), halal_kitchen=True)
+            self.pricey = make_room(self.owner, "Pricey Room", price=Decimal("1200"))
+            self.columbia = make_room(self.owner, "Columbia Room", city="Columbia", price=Decimal("800"), halal_kitchen=True)
+
+    def best_rooms(self, seeker):
+        return list(seeker.room_matches.filter(side="seeker").values_list("room__title", flat=True))
+
+    def test_seekers_get_rooms_ranked_by_location_budget_and_preferences(self):
+        self.assertEqual(self.best_rooms(self.sara), ["Halal Room", "Columbia Room", "Pricey Room"])
+        self.assertEqual(list(self.halal.seeker_matches.filter(side="room").values_list("seeker", flat=True)), [self.sara.pk])
+
+    def test_seekers_never_match_their_own_rooms(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_room(self.sara, "Sara's Room", price=Decimal("500"), halal_kitchen=True)
+        self.assertNotIn("Sara's Room", self.best_rooms(self.sara))
+
+    def test_room_changes_update_seeker_lists(self):
+        self.pricey.price = Decimal("700")
+        self.pricey.halal_kitchen = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pricey.save()
+        self.assertEqual(self.best_rooms(self.sara), ["Halal Room", "Pricey Room", "Columbia Room"])
+
+        self.pricey.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pricey.save()
+        self.assertEqual(self.best_rooms(self.sara), ["Halal Room", "Columbia Room"])
+        self.assertFalse(self.pricey.seeker_matches.exists())
+
+    def test_unscored_room_edits_do_not_rescore(self):
+        room = Room.objects.get(pk=self.pricey.pk)
+        with self.assertNumQueries(0):
+            room.save()
+        room.description = "Sunny, quiet street"
+        with CaptureQueriesContext(connection) as queries:
+            room.save()
+        self.assertFalse([q for q in queries if "core_roommatch" in q["sql"]])
+        updates = [q["sql"] for q in queries if q["sql"].startswith('UPDATE "core_room"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"price"', updates[0])
+
+    def test_saves_past_the_list_size_match_a_rebuild(self):
+        rng = random.Random(7)
+        cities = ["Charleston", "Columbia", "Summerville"]
+        with self.captureOnCommitCallbacks(execute=True):
+            people = [
+                make_profile(f"p{i}", city=rng.choice(cities), is_looking_for_room=True, halal_kitchen=rng.random() < 0.5)
+                for i in range(14)
+            ]
+            rooms = [
+                make_room(rng.choice(people + [self.owner]), f"Room {i}", city=rng.choice(cities), price=Decimal(rng.randrange(500, 1300)))
+                for i in range(14)
+            ]
+        for _ in range(12):
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                if rng.random() < 0.5:
+                    room = rng.choice(rooms)
+                    room.price = Decimal(rng.randrange(500, 1300))
+                    room.is_active = rng.random() < 0.8
+                    room.save()
+                else:
+                    person = rng.choice(people)
+                    person.city = rng.choice(cities)
+                    person.is_looking_for_room = rng.random() < 0.8
+                    person.save()
+            self.assertFalse([q for q in queries if "GROUP BY" in q["sql"]])
+        incremental = sorted(RoomMatch.objects.values_list("seeker_id", "room_id", "side", "rank"))
+        matching.rebuild()
+        self.assertEqual(sorted(RoomMatch.objects.values_list("seeker_id", "room_id", "side", "rank")), incremental)
+
+    def test_room_saves_rescore_after_commit_from_the_seekers_only(self):
+        self.pricey.price = Decimal("700")
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks() as callbacks:
+            self.pricey.save()
+        self.assertFalse([q for q in queries if "core_roommatch" in q["sql"]])
+        with mock.patch("core.matching.load_rooms", wraps=matching.load_rooms) as load_rooms:
+            for callback in callbacks:
+                callback()
+        load_rooms.assert_not_called()
+        self.assertEqual(self.best_rooms(self.sara), ["Halal Room", "Pricey Room", "Columbia Room"])
+
+    def test_refresh_scores_in_blocks(self):
+        omar = make_profile("omar", city="Charleston", is_looking_for_room=True)
+        with mock.patch("core.matching.scores", wraps=matching.scores) as scored:
+            matching.refresh_seekers([self.sara.pk, omar.pk], batch_size=1)
+        self.assertEqual([call.args[0].shape[0] for call in scored.call_args_list], [1, 1])
+        self.assertEqual(self.best_rooms(self.sara), ["Halal Room", "Columbia Room", "Pricey Room"])
+
+    def test_profiles_that_stop_looking_drop_out(self):
+        self.sara.is_looking_for_room = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sara.save()
+        self.assertFalse(RoomMatch.objects.filter(seeker=self.sara).exists())
+
+    def test_rebuild_matches_incremental_updates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_profile("omar", city="Columbia", is_looking_for_room=True)
+        incremental = sorted(RoomMatch.objects.values_list("seeker_id", "room_id", "side", "rank"))
+        call_command("rebuild_room_matches", stdout=StringIO())
+        self.assertEqual(sorted(RoomMatch.objects.values_list("seeker_id", "room_id", "side", "rank")), incremental)
+
+    def test_dashboard_shows_best_rooms(self):
+        self.client.force_login(self.sara.user)
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual([r.title for r in response.context["matched_rooms"]], ["Halal Room", "Columbia Room", "Pricey Room"])
+
+
+class SlugAllocationTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = make_profile("owner")
+
+    def test_slugs_count_up_from_the_highest_suffix(self):
+        slugs_made = [make_room(self.owner).slug for _ in range(3)]
+        self.assertEqual(slugs_made, ["private-room", "private-room-1", "private-room-2"])
+
+        make_room(self.owner, "Private Room Extra")
+        Room.objects.filter(slug="private-room-2").update(slug="private-room-10")
+        self.assertEqual(make_room(self.owner).slug, "private-room-11")
+
+    def test_longer_slugs_sharing_the_base_are_not_siblings(self):
+        make_room(self.owner)
+        self.assertEqual(make_room(self.owner, "Private Room Downtown 2").slug, "private-room-downtown-2")
+        make_room(self.owner, "Private Room 2025 Plan 3")
+        # Their tails would not cast to an integer (Postgres raises on "downtown-2")
+        self.assertEqual(make_room(self.owner).slug, "private-room-1")
+        self.assertEqual(make_room(self.owner).slug, "private-room-2")
+
+    def test_long_numeric_titles_stay_outside_the_suffix_range(self):
+        self.assertEqual(make_room(self.owner, "Room 5551234567").slug, "room-5551234567")
+        self.assertEqual(make_room(self.owner, "Room 99999").slug, "room-99999")
+        # Past the five suffix digits (and the int4 range on Postgres): not a sibling.
+        # At MAX_SUFFIX, the free numbers below it are used
+        self.assertEqual([make_room(self.owner, "Room").slug for _ in range(2)], ["room-1", "room-2"])
+
+        base = "x" * (Room._meta.get_field("slug").max_length - slugs.SUFFIX_ROOM)
+        make_room(self.owner, base)
+        Room.objects.filter(slug=base).update(slug=f"{base}-{slugs.MAX_SUFFIX}")
+        self.assertEqual([make_room(self.owner, base).slug for _ in range(2)], [f"{base}-1", f"{base}-2"])
+        self.assertLessEqual(max(len(slug) for slug in Room.objects.values_list("slug", flat=True)), 50)
+
+    def test_allocation_is_one_query_however_many_slugs_exist(self):
+        for _ in range(5):
+            make_room(self.owner)
+        with CaptureQueriesContext(connection) as queries:
+            room = make_room(self.owner)
+        slug_lookups = [q for q in queries if q["sql"].startswith("SELECT") and '"core_room"."slug"' in q["sql"]]
+        self.assertEqual(len(slug_lookups), 1)
+        self.assertEqual(room.slug, "private-room-5")
+
+    def test_retries_when_a_concurrent_save_takes_the_slug(self):
+        make_room(self.owner)
+        real_next_free_slug = slugs.next_free_slug
+        with mock.patch("core.slugs.next_free_slug", side_effect=["private-room", real_next_free_slug(Room, "private-room")]):
+            room = make_room(self.owner)
+        self.assertEqual(room.slug, "private-room-1")
+
+    def test_long_and_unsluggable_titles(self):
+        room = make_room(self.owner, "x" * 200)
+        self.assertLessEqual(len(room.slug), Room._meta.get_field("slug").max_length)
+        self.assertEqual(make_room(self.owner, "x" * 200).slug, room.slug + "-1")
+        self.assertEqual(make_room(self.owner, "!!!").slug, "room")
+
+    def test_assign_slugs_for_bulk_creation(self):
+        make_room(self.owner)
+        rooms = [Room(user=self.owner, title=title, city="Charleston", price=1) for title in ["Private Room", "Private Room", "Studio"]]
+        slugs.assign_slugs(rooms, lambda room: room.title)
+        self.assertEqual([r.slug for r in rooms], ["private-room-1", "private-room-2", "studio"])
+        Room.objects.bulk_create(rooms)
+
+
+class AreaFilterTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        make_profile("amir", city="Charleston", state="SC", zip_code="29401")
+        make_profile("bilal", city="charleston", state="sc", zip_code="29403")
+        make_profile("carl", city="Columbia", state="SC", zip_code="29201")
+        make_profile("dana", city="Charlotte", state="NC", zip_code="28202")
+        make_profile("eve")
+
+    def names(self, profiles):
+        return sorted(p.name for p in profiles)
+
+    def test_in_area_matches_is_in_area(self):
+        areas = [
+            {"cities": ["CHARLESTON"]},
+            {"state": "sc"},
+            {"state": "South Carolina", "cities": ["Columbia", "Charleston"]},
+            {"state": "North Carolina"},
+            {"state": "Atlantis"},
+            {"zip_codes": [29401, "28202 "]},
+            {"cities": ["Charleston"], "zip_codes": ["29403"]},
+            {"cities": [" charleston ", ""], "zip_codes": [" 29401", " "]},
+            {},
+        ]
+        everyone = list(Profile.objects.all())
+        for area in areas:
+            with self.subTest(area=area):
+                expected = [p for p in everyone if p.is_in_area(**area)]
+                self.assertEqual(self.names(Profile.objects.in_area(**area)), self.names(expected))
+
+    def test_in_area_is_one_query(self):
+        with self.assertNumQueries(1):
+            names = self.names(Profile.objects.in_area(cities=["charleston"], state="South Carolina"))
+        self.assertEqual(names, ["Amir", "Bilal"])
+
+    def test_api_filters_by_state_and_zip(self):
+        response = self.client.get(reverse("api_profiles"), {"state": "south carolina", "zip": "29401,29201"})
+        self.assertEqual(sorted(r["name"] for r in response.json()["results"]), ["Amir", "Carl"])
+
+    def test_admin_state_filter(self):
+        User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.login(username="admin", password="pw")
+        response = self.client.get(reverse("admin:core_profile_changelist"), {"state": "SC"})
+        self.assertEqual(self.names(response.context["cl"].result_list), ["Amir", "Bilal", "Carl"])
+
+    def test_admin_state_choices_come_from_the_facet_cache(self):
+        make_profile("fay", state="North Carolina")
+        User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.login(username="admin", password="pw")
+        url = reverse("admin:core_profile_changelist")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertFalse([q["sql"] for q in queries if '"state"' in q["sql"] and ("DISTINCT" in q["sql"] or "GROUP BY" in q["sql"])])
+        state_filter = next(f for f in response.context["cl"].filter_specs if getattr(f, "parameter_name", None) == "state")
+        self.assertEqual(state_filter.lookup_choices, [("NC", "North Carolina"), ("SC", "South Carolina")])
+
+
+class ZipRadiusSearchTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = make_profile("owner", zip_code="29401")
+        self.downtown = make_room(self.owner, "Downtown Room", zip_code="29401")
+        self.pleasant = make_room(self.owner, "Mount Pleasant Room", city="Mount Pleasant", zip_code="29464")
+        self.summerville = make_room(self.owner, "Summerville Room", city="Summerville", zip_code="29483")
+        self.nowhere = make_room(self.owner, "Unknown ZIP Room", zip_code="00000")
+
+    def search(self, **params):
+        return filter_rooms(QueryDict(urlencode(params)))
+
+    def test_coordinates_follow_the_zip_code(self):
+        self.assertEqual((self.owner.latitude, self.owner.longitude), geo.zip_centroid("29401"))
+        self.assertEqual((self.downtown.latitude, self.downtown.longitude), geo.zip_centroid("29401-1234"))
+        self.assertIsNone(self.nowhere.latitude)
+
+        self.downtown.zip_code = ""
+        self.downtown.save()
+        self.assertIsNone(Room.objects.get(pk=self.downtown.pk).latitude)
+
+    def test_radius_filter_uses_exact_distance(self):
+        self.assertEqual({r.title for r in self.search(near="29401", radius=3)}, {"Downtown Room"})
+        self.assertEqual({r.title for r in self.search(near="29401", radius=10)}, {"Downtown Room", "Mount Pleasant Room"})
+        self.assertEqual(len(self.search(near="29401", radius=30)), 3)
+
+        room = self.search(near="29401", radius=10).get(pk=self.pleasant.pk)
+        expected = geo.haversine_miles(*geo.zip_centroid("29401"), *geo.zip_centroid("29464"))
+        self.assertAlmostEqual(room.distance, expected, places=3)
+
+    def test_bounding_box_contains_the_circle(self):
+        lat, lon = geo.zip_centroid("29401")
+        min_lat, max_lat, min_lon, max_lon = geo.bounding_box(lat, lon, 10)
+        self.assertAlmostEqual(geo.haversine_miles(lat, lon, max_lat, lon), 10, places=3)
+        self.assertGreaterEqual(geo.haversine_miles(lat, lon, lat, min_lon), 10)
+
+    def test_advanced_search_sorts_by_distance(self):
+        response = self.client.get(reverse("advanced_search"), {"near": "29464", "radius": 30, "sort": "distance"})
+        self.assertEqual(
+            [r.title for r in response.context["rooms"]],
+            ["Mount Pleasant Room", "Downtown Room", "Summerville Room"],
+        )
+
+    def test_import_census_gazetteer(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.addCleanup(geo.zip_centroids.cache_clear)
+        gazetteer = f"{directory}/gazetteer.txt"
+        with open(gazetteer, "w") as f:
+            f.write("GEOID\tALAND\tINTPTLAT\tINTPTLONG                                 \n")
+            f.write("00000\t1\t33.5\t-80.5\n")
+
+        with override_settings(ZIP_CENTROIDS_FILE=f"{directory}/zip_centroids.csv"):
+            call_command("import_zip_centroids", gazetteer, stdout=StringIO())
+            self.assertEqual(geo.zip_centroid("00000"), (33.5, -80.5))
+        self.assertEqual(Room.objects.get(pk=self.nowhere.pk).latitude, 33.5)
+
+    def test_import_needs_its_own_file(self):
+        for path in (None, geo.BUNDLED_ZIP_CENTROIDS_FILE):
+            with self.subTest(path=path), override_settings(ZIP_CENTROIDS_FILE=path):
+                with self.assertRaises(CommandError):
+                    call_command("import_zip_centroids", "gazetteer.txt", stdout=StringIO())
+        self.assertIsNotNone(geo.zip_centroid("29401"))
+
+    def test_unknown_near_zip_skips_the_distance_filter(self):
+        notice = "ZIP code 99999 is not in our location data yet, so results are not limited by distance."
+        self.assertEqual(len(self.search(near="99999", radius=3)), 4)
+        response = self.client.get(reverse("advanced_search"), {"near": "99999", "sort": "distance"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["near_notice"], notice)
+        self.assertContains(response, notice)
+        self.assertEqual(len(response.context["rooms"]), 4)
+        self.assertEqual(self.client.get(reverse("advanced_search"), {"near": "29401"}).context["near_notice"], "")
+
+        response = self.client.get(reverse("api_rooms"), {"near": "99999"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["notice"], notice)
+        self.assertEqual(len(response.json()["results"]), 4)
+        self.assertNotIn("notice", self.client.get(reverse("api_rooms"), {"near": "29401"}).json())
+
+        response = self.client.get(reverse("api_rooms"), {"near": "abc"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "Enter a 5-digit ZIP code.")
+
+
+class PrimaryRoomImageTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.room = make_room(make_profile("owner"))
+
+    def primaries(self):
+        return list(self.room.images.filter(is_primary=True).values_list("pk", flat=True))
+
+    def statements(self, queries):
+        """Writes to core_roomimage (StoredImage reference counting is counted separately)."""
+        return [
+            q["sql"] for q in queries
+            if q["sql"].startswith(("INSERT", "UPDATE", "DELETE")) and '"core_roomimage"' in q["sql"]
+        ]
+
+    def test_first_upload_becomes_primary_in_two_statements(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = RoomImage.objects.create(room=self.room, image=make_image_file())
+        self.assertEqual(len(self.statements(queries)), 2)
+        second = RoomImage.objects.create(room=self.room, image=make_image_file())
+        self.assertTrue(first.is_primary)
+        self.assertFalse(second.is_primary)
+        self.assertEqual(self.primaries(), [first.pk])
+
+    def test_explicit_primary_demotes_the_previous_one(self):
+        first = RoomImage.objects.create(room=self.room, image=make_image_file())
+        second = RoomImage.objects.create(room=self.room, image=make_image_file(), is_primary=True)
+        self.assertEqual(self.primaries(), [second.pk])
+        first.make_primary()
+        self.assertEqual(self.primaries(), [first.pk])
+
+    def test_database_allows_one_primary_per_room(self):
+        RoomImage.objects.create(room=self.room, image=make_image_file())
+        second = RoomImage.objects.create(room=self.room, image=make_image_file())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RoomImage.objects.filter(pk=second.pk).update(is_primary=True)
+
+    def test_attach_many_images_in_one_transaction(self):
+        files = [make_image_file(f"photo{i}.jpg") for i in range(5)]
+        with CaptureQueriesContext(connection) as queries:
+            images = RoomImage.objects.attach(self.room, files)
+        self.assertEqual(len(self.statements(queries)), 2)
+        self.assertEqual(self.primaries(), [images[0].pk])
+        self.assertEqual(self.room.images.count(), 5)
+
+        more = RoomImage.objects.attach(self.room, [make_image_file(), make_image_file()], primary=1)
+        self.assertEqual(self.primaries(), [more[1].pk])
+
+    def test_deleting_the_primary_promotes_the_next_image(self):
+        first, second, third = RoomImage.objects.attach(self.room, [make_image_file() for _ in range(3)])
+        first.delete()
+        self.assertEqual(self.primaries(), [second.pk])
+        third.delete()
+        self.assertEqual(self.primaries(), [second.pk])
+        self.room.delete()
+        self.assertFalse(RoomImage.objects.exists())
+
+    def test_bulk_room_deletes_promote_nothing(self):
+        RoomImage.objects.attach(self.room, [make_image_file() for _ in range(2)])
+        with CaptureQueriesContext(connection) as queries:
+            Room.objects.filter(pk=self.room.pk).delete()
+        self.assertFalse([sql for sql in self.statements(queries) if sql.startswith("UPDATE")])
+        self.assertFalse(RoomImage.objects.exists())
+
+
+@override_settings(RENDITIONS_IN_BACKGROUND=False)
+class RoomImageRenditionTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.room = make_room(make_profile("owner"))
+
+    def upload(self, file):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = RoomImage.objects.create(room=self.room, image=file)
+        image.refresh_from_db()
+        return image
+
+    def open_rendition(self, image, name):
+        return Image.open(image.image.storage.open(image.renditions[name]))
+
+    def test_upload_generates_every_rendition(self):
+        image = self.upload(make_image_file(size=(2400, 1600)))
+        self.assertEqual(set(image.renditions), set(renditions.RENDITIONS))
+        expected = {"detail": (1200, 800), "card": (480, 320), "admin": (160, 107)}
+        for name, size in expected.items():
+            with self.open_rendition(image, name) as rendered:
+                self.assertEqual(rendered.size, size)
+                self.assertEqual(rendered.format, renditions.FORMAT)
+        self.assertEqual(image.get_thumbnail_url("detail"), image.image.storage.url(image.renditions["detail"]))
+        self.assertEqual(image.get_thumbnail_url((400, 300)), image.image.storage.url(image.renditions["card"]))
+
+    def test_original_is_served_until_renditions_exist(self):
+        image = RoomImage.objects.create(room=self.room, image=make_image_file())
+        self.assertEqual(image.get_thumbnail_url(), image.image.url)
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            image.get_thumbnail_url()
+        image.refresh_from_db()
+        self.assertTrue(renditions.is_current(image))
+
+    def test_exif_orientation_is_applied(self):
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotate 90° clockwise on display
+        Image.new("RGB", (2000, 1000), "red").save(buffer, "JPEG", exif=exif)
+        image = self.upload(SimpleUploadedFile("rotated.jpg", buffer.getvalue(), content_type="image/jpeg"))
+        with self.open_rendition(image, "detail") as rendered:
+            self.assertEqual(rendered.size, (450, 900))
+
+    def test_delete_removes_rendition_files(self):
+        image = self.upload(make_image_file())
+        storage = image.image.storage
+        paths = list(image.renditions.values())
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertFalse(any(storage.exists(path) for path in paths))
+
+    def test_generate_renditions_command_fills_missing_ones(self):
+        image = RoomImage.objects.create(room=self.room, image=make_image_file())
+        out = StringIO()
+        call_command("generate_renditions", stdout=out)
+        self.assertIn("Generated renditions for 1 images", out.getvalue())
+        image.refresh_from_db()
+        self.assertTrue(renditions.is_current(image))
+
+
+class ImageUploadValidationTests(MediaTestCase):
+    def jpeg_bytes(self, size=(40, 30), **save_options):
+        buffer = BytesIO()
+        Image.new("RGB", size, "blue").save(buffer, "JPEG", **save_options)
+        return buffer.getvalue()
+
+    def test_probe_reads_only_the_header(self):
+        data = self.jpeg_bytes((640, 480))
+        # Drop most of the compressed pixel data: the header is still enough
+        truncated = SimpleUploadedFile("photo.jpg", data[:len(data) // 3])
+        self.assertEqual(uploads.probe(truncated), ("JPEG", 640, 480))
+        self.assertEqual(truncated.tell(), 0)
+
+    def test_probe_rejects_other_formats_and_garbage(self):
+        gif = BytesIO()
+        Image.new("RGB", (10, 10)).save(gif, "GIF")
+        for data in (gif.getvalue(), b"not an image at all"):
+            with self.assertRaises(ValidationError):
+                uploads.probe(SimpleUploadedFile("upload.jpg", data))
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100 * 100)
+    def test_probe_rejects_too_many_pixels(self):
+        with self.assertRaisesMessage(ValidationError, "too large"):
+            uploads.probe(SimpleUploadedFile("big.jpg", self.jpeg_bytes((200, 100))))
+
+    def test_probe_rejects_decompression_bombs(self):
+        with mock.patch.object(Image, "MAX_IMAGE_PIXELS", 1000):
+            with self.assertRaisesMessage(ValidationError, "too many pixels"):
+                uploads.probe(SimpleUploadedFile("bomb.jpg", self.jpeg_bytes((50, 30))))
+
+    def test_save_applies_orientation_and_strips_exif(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x8825] = {2: (32.0, 47.0, 0.0)}  # GPS latitude
+        upload = SimpleUploadedFile("rotated.jpg", self.jpeg_bytes((60, 20), exif=exif))
+        image = RoomImage.objects.create(room=make_room(make_profile("owner")), image=upload)
+        with Image.open(image.image.path) as stored:
+            self.assertEqual(stored.size, (20, 60))
+            self.assertFalse(stored.getexif())
+
+    def test_form_field_uses_the_header(self):
+        from .forms import RoomImageForm
+
+        data = self.jpeg_bytes((64, 48))
+        with mock.patch.object(Image.Image, "verify") as verify:
+            form = RoomImageForm(files={"image": SimpleUploadedFile("photo.jpg", data)})
+            self.assertTrue(form.is_valid(), form.errors)
+        verify.assert_not_called()
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=1024)
+    def test_oversized_file_is_refused_while_streaming(self):
+        request = RequestFactory().post("/upload/", {"image": SimpleUploadedFile("big.jpg", b"x" * 5000)})
+        with self.assertRaises(RequestDataTooBig):
+            request.POST
+
+    @override_settings(UPLOAD_MAX_REQUEST_BYTES=1024)
+    def test_oversized_request_is_refused_before_reading(self):
+        request = RequestFactory().post("/upload/", {"image": SimpleUploadedFile("big.jpg", b"x" * 5000)})
+        with mock.patch.object(uploads.LimitedUploadHandler, "receive_data_chunk") as receive:
+            with self.assertRaises(RequestDataTooBig):
+                request.POST
+        receive.assert_not_called()
+
+
+@override_settings(RENDITIONS_IN_BACKGROUND=False)
+class ContentAddressedImageTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        owner = make_profile("owner")
+        self.first_room = make_room(owner, title="First Room")
+        self.second_room = make_room(owner, title="Second Room")
+
+    def upload(self, room, file):
+        with self.captureOnCommitCallbacks(execute=True):
+            return RoomImage.objects.create(room=room, image=file)
+
+    def stored(self, name):
+        return StoredImage.objects.get(name=name)
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.upload(self.first_room, make_image_file("a.jpg"))
+        second = self.upload(self.second_room, make_image_file("b.jpg"))
+        other = self.upload(self.second_room, make_image_file("c.jpg", color="red"))
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        digest = image_store.content_hash(first.image.open("rb"))
+        self.assertEqual(first.image.name, f"room_images/{digest[:2]}/{digest}.jpg")
+        self.assertEqual(self.stored(first.image.name).ref_count, 2)
+        self.assertEqual(len(os.listdir(os.path.dirname(first.image.path))), 1 + len(renditions.RENDITIONS))
+
+    def test_renditions_are_reused_across_listings(self):
+        first = self.upload(self.first_room, make_image_file())
+        first.refresh_from_db()
+        with mock.patch.object(renditions, "render") as render:
+            second = self.upload(self.second_room, make_image_file())
+        render.assert_not_called()
+        self.assertEqual(second.renditions, first.renditions)
+
+    def test_file_is_deleted_with_its_last_reference(self):
+        first = self.upload(self.first_room, make_image_file())
+        second = self.upload(self.second_room, make_image_file())
+        first.refresh_from_db()
+        storage = first.image.storage
+        paths = [first.image.name, *first.renditions.values()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(all(storage.exists(path) for path in paths))
+        self.assertEqual(self.stored(second.image.name).ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.second_room.delete()
+        self.assertFalse(any(storage.exists(path) for path in paths))
+        self.assertFalse(StoredImage.objects.exists())
+
+    def test_replacing_an_image_releases_the_old_file(self):
+        image = self.upload(self.first_room, make_image_file())
+        old_name = image.image.name
+        image.image = make_image_file(color="red")
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        self.assertFalse(image.image.storage.exists(old_name))
+        self.assertEqual(list(StoredImage.objects.values_list("name", flat=True)), [image.image.name])
+
+    def test_failed_save_keeps_no_reference_or_file(self):
+        shared = self.upload(self.first_room, make_image_file())
+        storage = shared.image.storage
+        for color in ("green", "red"):
+            with self.subTest(color=color), mock.patch.object(RoomImage, "save_base", side_effect=IntegrityError("boom")):
+                with self.assertRaises(IntegrityError):
+                    RoomImage.objects.create(room=self.second_room, image=make_image_file(color=color))
+        self.assertEqual(list(StoredImage.objects.values_list("name", "ref_count")), [(shared.image.name, 1)])
+        self.assertEqual(sorted(os.listdir(os.path.dirname(storage.path(shared.image.name)))), sorted(
+            os.path.basename(path) for path in [shared.image.name, *RoomImage.objects.get().renditions.values()]
+        ))
+
+    def test_upload_handlers_hash_while_streaming(self):
+        data = make_image_file().read()
+        request = RequestFactory().post("/upload/", {"image": SimpleUploadedFile("photo.jpg", data)})
+        self.assertEqual(request.FILES["image"].sha256, hashlib.sha256(data).hexdigest())
+
+    def test_dedupe_command_moves_legacy_files(self):
+        storage = RoomImage._meta.get_field("image").storage
+        legacy = []
+        for room in (self.first_room, self.second_room):
+            name = storage.save("room_images/legacy.jpg", make_image_file())
+            legacy.append(name)
+            RoomImage.objects.bulk_create([RoomImage(room=room, image=name)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("dedupe_room_images", stdout=StringIO())
+        names = set(RoomImage.objects.values_list("image", flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(self.stored(names.pop()).ref_count, 2)
+        self.assertFalse(any(storage.exists(name) for name in legacy))
+
+
+@override_settings(RENDITIONS_IN_BACKGROUND=False)
+class RoomImageMetadataTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.room = make_room(make_profile("owner"))
+
+    def upload(self, file):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = RoomImage.objects.create(room=self.room, image=file)
+        image.refresh_from_db()
+        return image
+
+    def test_metadata_is_stored_at_upload(self):
+        image = self.upload(make_image_file(size=(1600, 1200), color="#3366cc"))
+        self.assertEqual((image.width, image.height), (1600, 1200))
+        self.assertEqual(image.byte_size, os.path.getsize(image.image.path))
+        rgb = [int(image.dominant_color[i:i + 2], 16) for i in (1, 3, 5)]
+        for channel, expected in zip(rgb, (0x33, 0x66, 0xCC)):
+            self.assertAlmostEqual(channel, expected, delta=12)
+
+        with mock.patch.object(FileSystemStorage, "size", side_effect=AssertionError("stat")):
+            self.assertTrue(image.get_file_size().endswith("KB"))
+        self.assertEqual(image.get_dimensions(), "1600×1200")
+
+    def test_responsive_image_tag(self):
+        image = self.upload(make_image_file(size=(1600, 1200)))
+        html = Template('{% load room_images %}{% responsive_image image "card" class="rounded" %}').render(
+            Context({"image": image})
+        )
+        storage = image.image.storage
+        self.assertIn(f'src="{storage.url(image.renditions["card"])}"', html)
+        self.assertIn(f'{storage.url(image.renditions["admin"])} 160w', html)
+        self.assertIn(f'{storage.url(image.renditions["detail"])} 1200w', html)
+        self.assertIn('width="480"', html)
+        self.assertIn('height="360"', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn('sizes="(max-width: 768px) 100vw, 33vw"', html)
+        self.assertIn(f"background-color: {image.dominant_color}", html)
+        self.assertIn('class="rounded"', html)
+
+    def test_responsive_image_tag_lists_each_width_once(self):
+        # Smaller than the card box, so card and detail come out at the original size
+        image = self.upload(make_image_file(size=(300, 200)))
+        html = Template('{% load room_images %}{% responsive_image image "card" %}').render(Context({"image": image}))
+        storage = image.image.storage
+        srcset = html.split('srcset="')[1].split('"')[0]
+        self.assertEqual(srcset, f'{storage.url(image.renditions["admin"])} 160w, {storage.url(image.renditions["card"])} 300w')
+        self.assertIn('width="300"', html)
+        self.assertIn('height="200"', html)
+
+    def test_backfill_command_fills_missing_metadata(self):
+        image = self.upload(make_image_file(size=(300, 200)))
+        RoomImage.objects.update(width=None, height=None, byte_size=None, dominant_color="")
+        call_command("backfill_image_metadata", stdout=StringIO())
+        backfilled = RoomImage.objects.get(pk=image.pk)
+        for field in ("width", "height", "byte_size"):
+            self.assertEqual(getattr(backfilled, field), getattr(image, field))
+        # Read back from the encoded admin rendition, so close to but not exactly the upload's
+        self.assertRegex(backfilled.dominant_color, r"^#[0-9a-f]{6}$")
+
+
+class AdminChangelistTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        admin_user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(admin_user)
+        self.owner = make_profile("owner")
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def add_rooms(self, count, prefix):
+        for i in range(count):
+            room = make_room(make_profile(f"{prefix}{i}"), title=f"{prefix} {i}")
+            RoomImage.objects.bulk_create([RoomImage(room=room, image=f"room_images/{prefix}{i}.jpg")])
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        urls = [reverse("admin:core_room_changelist"), reverse("admin:core_profile_changelist")]
+        self.add_rooms(3, "few")
+        few = [self.changelist_queries(url) for url in urls]
+        self.add_rooms(10, "many")
+        self.assertEqual([self.changelist_queries(url) for url in urls], few)
+
+    def test_room_image_counts_are_annotated(self):
+        room = make_room(self.owner)
+        RoomImage.objects.bulk_create([RoomImage(room=room, image=f"room_images/{i}.jpg") for i in range(3)])
+        response = self.client.get(reverse("admin:core_room_changelist"))
+        self.assertEqual(response.context["cl"].result_list[0].image_total, 3)
+
+    def test_city_choices_come_from_the_facet_cache(self):
+        make_room(self.owner)
+        make_room(self.owner, title="Pleasant", city="Mount Pleasant")
+        make_profile("local", city="Charleston")
+        make_profile("other", city="Summerville")
+        urls = {"room": reverse("admin:core_room_changelist"), "profile": reverse("admin:core_profile_changelist")}
+        for name, url in urls.items():
+            with self.subTest(name):
+                self.client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, {"city": "Charleston"})
+                grouped = [f'{keyword} "core_{name}"."city"' for keyword in ("DISTINCT", "GROUP BY")]
+                self.assertFalse([q["sql"] for q in queries if any(g in q["sql"] for g in grouped)])
+                city_filter = next(f for f in response.context["cl"].filter_specs if getattr(f, "parameter_name", None) == "city")
+                expected = get_facet(f"{name}_city")
+                self.assertEqual(city_filter.lookup_choices, [(f.value, f.value) for f in expected])
+                self.assertEqual({obj.city for obj in response.context["cl"].result_list}, {"Charleston"})
+
+    def test_image_previews_do_not_schedule_renditions(self):
+        room = make_room(self.owner)
+        RoomImage.objects.bulk_create([RoomImage(room=room, image="room_images/pending.jpg")])
+        with mock.patch.object(renditions, "schedule") as schedule:
+            response = self.client.get(reverse("admin:core_room_change", args=[room.pk]))
+        schedule.assert_not_called()
+        self.assertContains(response, '<img src="/media/room_images/pending.jpg" width="80" alt="">')
+
+    def test_large_foreign_keys_use_autocomplete(self):
+        room = make_room(self.owner)
+        other = make_profile("other")
+        response = self.client.get(reverse("admin:core_room_change", args=[room.pk]))
+        self.assertContains(response, "admin-autocomplete")
+        # Only the selected owner is rendered, not every profile
+        self.assertContains(response, f'<option value="{self.owner.pk}" selected>{self.owner.name}</option>')
+        self.assertNotContains(response, f'>{other.name}</option>')
+
+
+class EstimatedCountTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = make_profile("owner")
+        for i in range(4):
+            make_room(self.owner, title=f"Room {i}")
+
+    def counter(self, name):
+        return RowCount.objects.get(name=name).count
+
+    def test_exact_below_threshold(self):
+        total = counts.count(Room.objects.filter(is_active=True), "rooms.active")
+        self.assertEqual((total, total.exact, str(total)), (4, True, "4"))
+
+    @override_settings(EXACT_COUNT_THRESHOLD=2)
+    def test_counter_or_lower_bound_above_threshold(self):
+        with self.assertNumQueries(2):
+            total = counts.count(Room.objects.filter(is_active=True), "rooms.active")
+        self.assertEqual((total, total.exact, str(total)), (4, False, "≈4"))
+
+        filtered = counts.count(Room.objects.filter(city="Charleston"))
+        self.assertEqual((filtered, str(filtered)), (2, "2+"))
+
+    def test_counters_follow_saves_and_deletes(self):
+        room = Room.objects.first()
+        self.assertEqual(self.counter("rooms.active"), 4)
+        room.is_active = False
+        room.save()
+        self.assertEqual(self.counter("rooms.active"), 3)
+        room.save()
+        self.assertEqual(self.counter("rooms.active"), 3)
+        room.is_active = True
+        room.save(update_fields=["is_active"])
+        self.assertEqual(self.counter("rooms.active"), 4)
+
+        make_profile("second")
+        self.assertEqual(self.counter("profiles"), 2)
+        self.owner.delete()
+        self.assertEqual((self.counter("profiles"), self.counter("rooms.active")), (1, 0))
+
+        RowCount.objects.update(count=99)
+        call_command("reconcile_counts", stdout=StringIO())
+        self.assertEqual(self.counter("profiles"), 1)
+
+    @override_settings(EXACT_COUNT_THRESHOLD=2)
+    def test_home_api_and_admin_use_estimates(self):
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, "Available Rooms (≈4)")
+        self.assertIsNone(response.context["room_facets"])
+
+        data = self.client.get(reverse("api_rooms")).json()
+        self.assertEqual((data["count"], data["count_exact"]), (4, False))
+        data = self.client.get(reverse("api_rooms"), {"city": "Charleston"}).json()
+        self.assertEqual((data["count"], data["count_exact"]), (2, False))
+
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        response = self.client.get(reverse("admin:core_room_changelist"))
+        self.assertFalse(response.context["cl"].result_count.exact)
+
+
+class RoomRatingTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = make_profile("owner")
+        self.room = make_room(self.owner, title="Rated Room")
+        self.reviewers = [make_profile(f"reviewer{i}") for i in range(3)]
+
+    def review(self, reviewer, rating, room=None):
+        return RoomReview.objects.create(room=room or self.room, reviewer=reviewer, rating=rating)
+
+    def aggregates(self):
+        return Room.objects.values(*ratings.RATING_FIELDS).get(pk=self.room.pk)
+
+    def test_reviews_update_aggregates_incrementally(self):
+        with self.assertNumQueries(4):
+            # Savepoint, INSERT, UPDATE room, release
+            first = self.review(self.reviewers[0], 5)
+        self.review(self.reviewers[1], 2)
+        self.assertEqual(
+            self.aggregates(),
+            {"review_count": 2, "rating_sum": 7, "avg_rating": 3.5,
+             "ratings_1": 0, "ratings_2": 1, "ratings_3": 0, "ratings_4": 0, "ratings_5": 1},
+        )
+
+        first.rating = 3
+        first.save()
+        first.comment = "Still fine"
+        first.save()
+        room = Room.objects.get(pk=self.room.pk)
+        self.assertEqual((room.review_count, room.avg_rating), (2, 2.5))
+        self.assertEqual(room.rating_histogram, [(5, 0), (4, 0), (3, 1), (2, 1), (1, 0)])
+
+        first.delete()
+        self.reviewers[1].delete()
+        self.assertEqual(self.aggregates(), ratings.empty())
+
+    def test_stale_room_save_keeps_aggregates(self):
+        stale = Room.objects.get(pk=self.room.pk)
+        self.review(self.reviewers[0], 4)
+        stale.title = "Renamed"
+        stale.save()
+        room = Room.objects.get(pk=self.room.pk)
+        self.assertEqual((room.title, room.review_count, room.avg_rating), ("Renamed", 1, 4.0))
+
+    def test_reconcile_fixes_drift(self):
+        self.review(self.reviewers[0], 4)
+        self.review(self.reviewers[1], 5)
+        RoomReview.objects.filter(reviewer=self.reviewers[1]).update(rating=1)
+        other = make_room(self.owner, title="Never Reviewed")
+        Room.objects.filter(pk=other.pk).update(review_count=3, avg_rating=5.0)
+
+        call_command("reconcile_room_ratings", stdout=StringIO())
+        self.assertEqual(self.aggregates(), {**ratings.aggregates()[self.room.pk], "avg_rating": 2.5})
+        self.assertEqual(Room.objects.values(*ratings.RATING_FIELDS).get(pk=other.pk), ratings.empty())
+        self.assertEqual(ratings.reconcile(), 0)
+
+    def test_filter_and_sort_by_rating(self):
+        unrated = make_room(self.owner, title="Unrated")
+        good = make_room(self.owner, title="Good")
+        self.review(self.reviewers[0], 3)
+        self.review(self.reviewers[0], 5, room=good)
+
+        rated = filter_rooms(QueryDict("min_rating=4"))
+        self.assertEqual(list(rated), [good])
+
+        response = self.client.get(reverse("advanced_search"), {"sort": "rating"})
+        self.assertEqual(list(response.context["rooms"]), [good, self.room, unrated])
+
+        response = self.client.get(reverse("home"), {"sort": "rating"})
+        self.assertEqual(list(response.context["available_rooms"]), [good, self.room, unrated])
+
+        data = self.client.get(reverse("api_rooms"), {"sort": "rating", "fields": "title,avg_rating"}).json()
+        self.assertEqual(
+            data["results"],
+            [{"title": "Good", "avg_rating": 5.0}, {"title": "Rated Room", "avg_rating": 3.0},
+             {"title": "Unrated", "avg_rating": None}],
+        )
+
+
+class TrendingRoomTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = make_profile("owner", city="Charleston")
+        self.quiet = make_room(self.owner, title="Quiet")
+        self.popular = make_room(self.owner, title="Popular")
+        self.elsewhere = make_room(self.owner, title="Elsewhere", city="Columbia")
+        self.fans = [User.objects.create_user(f"fan{i}") for i in range(3)]
+
+    def score(self, room):
+        return Room.objects.get(pk=room.pk).trending_score
+
+    def favorite(self, user, room):
+        return RoomFavorite.objects.create(user=user, room=room)
+
+    def test_events_update_scores_in_one_statement(self):
+        trending.current_epoch()
+        favorite = self.favorite(self.fans[0], self.popular)
+        with self.assertNumQueries(2):
+            # Epoch, UPDATE room
+            trending.record(self.quiet.pk, "message")
+        Message.objects.create(sender=self.owner, recipient=self.owner, room=self.quiet, content="Hi")
+        self.assertAlmostEqual(trending.decayed_score(Room.objects.get(pk=self.popular.pk)), 3.0, places=3)
+        self.assertAlmostEqual(trending.decayed_score(Room.objects.get(pk=self.quiet.pk)), 2.0, places=3)
+
+        stale = Room.objects.get(pk=self.popular.pk)
+        Room.objects.filter(pk=self.popular.pk).update(trending_score=10.0)
+        stale.save()
+        self.assertEqual(self.score(self.popular), 10.0)
+
+        Room.objects.filter(pk=self.popular.pk).update(trending_score=0.5)
+        favorite.delete()
+        self.assertEqual(self.score(self.popular), 0.0)
+
+    def test_older_events_weigh_less_and_rebase_rescales(self):
+        epoch = trending.current_epoch()
+        half_life = trending.half_life()
+        trending.record(self.quiet.pk, "favorite", epoch + half_life)
+        trending.record(self.popular.pk, "favorite", epoch + 3 * half_life)
+        self.assertAlmostEqual(self.score(self.popular) / self.score(self.quiet), 4.0)
+
+        self.assertEqual(trending.rebase(now=epoch + 3 * half_life), 2)
+        self.assertEqual(TrendingEpoch.objects.get().started_at, epoch + 3 * half_life)
+        self.assertAlmostEqual(self.score(self.popular), 3.0)
+        self.assertAlmostEqual(self.score(self.quiet), 0.75)
+
+        # Four half-lives later the quiet room has decayed below MIN_SCORE
+        self.assertEqual(trending.rebase(now=epoch + 7 * half_life), 1)
+        self.assertEqual(self.score(self.quiet), 0.0)
+
+    def test_rebuild_from_events(self):
+        self.favorite(self.fans[0], self.popular)
+        self.favorite(self.fans[1], self.popular)
+        self.favorite(self.fans[2], self.quiet)
+        Room.objects.update(trending_score=0.0)
+        call_command("rebase_trending", "--rebuild", stdout=StringIO())
+        self.assertAlmostEqual(self.score(self.popular), 6.0, places=3)
+        self.assertAlmostEqual(self.score(self.quiet), 3.0, places=3)
+
+    def test_trending_strip_in_your_city(self):
+        self.favorite(self.fans[0], self.popular)
+        self.favorite(self.fans[1], self.popular)
+        self.favorite(self.fans[0], self.quiet)
+        self.favorite(self.fans[0], self.elsewhere)
+
+        with self.assertNumQueries(1):
+            rooms = list(trending.trending_in_city("charleston"))
+        self.assertEqual(rooms, [self.popular, self.quiet])
+
+        response = self.client.get(reverse("home"), {"city": "Columbia"})
+        self.assertEqual(list(response.context["trending_rooms"]), [self.elsewhere])
+        self.client.force_login(self.owner.user)
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, "Trending in Charleston")
+        self.assertEqual(list(response.context["trending_rooms"]), [self.popular, self.quiet])
+
+
+class RoomAvailabilityTests(CoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = make_profile("owner")
+        self.room = make_room(self.owner, title="Windowed")
+
+    def window(self, start, end, room=None):
+        return RoomAvailability.objects.create(room=room or self.room, start_date=start, end_date=end)
+
+    def windows(self, room=None):
+        return list(RoomAvailability.objects.filter(room=room or self.room).values_list("start_date", "end_date"))
+
+    def test_overlapping_and_adjacent_windows_merge(self):
+        self.window(date(2026, 1, 1), date(2026, 1, 31))
+        self.window(date(2026, 3, 1), date(2026, 3, 31))
+        self.window(date(2026, 6, 1), date(2026, 6, 30))
+        self.assertEqual(len(self.windows()), 3)
+
+        # Overlaps January, touches March
+        merged = self.window(date(2026, 1, 15), date(2026, 2, 28))
+        self.assertEqual(self.windows(), [(date(2026, 1, 1), date(2026, 3, 31)), (date(2026, 6, 1), date(2026, 6, 30))])
+        self.assertEqual((merged.start_date, merged.end_date), (date(2026, 1, 1), date(2026, 3, 31)))
+
+        other = make_room(self.owner, title="Other")
+        self.window(date(2026, 1, 1), date(2026, 12, 31), room=other)
+        self.assertEqual(len(self.windows()), 2)
+
+        with self.assertRaises(ValidationError):
+            RoomAvailability(room=self.room, start_date=date(2026, 5, 2), end_date=date(2026, 5, 1)).full_clean()
+
+    def test_stay_must_fit_inside_one_window(self):
+        self.window(date(2026, 1, 1), date(2026, 3, 31))
+        self.window(date(2026, 5, 1), date(2026, 8, 31))
+        open_ended = make_room(self.owner, title="Open", available_from=date(2026, 2, 1))
+        make_room(self.owner, title="Later", available_from=date(2026, 9, 1))
+
+        def search(move_in, move_out=None):
+            params = QueryDict(mutable=True)
+            params.update({"move_in": move_in.isoformat(), "move_out": move_out.isoformat() if move_out else ""})
+            return sorted(filter_rooms(params).values_list("title", flat=True))
+
+        self.assertEqual(search(date(2026, 2, 1), date(2026, 3, 31)), ["Open", "Windowed"])
+        self.assertEqual(search(date(2026, 3, 15), date(2026, 5, 15)), ["Open"])
+        self.assertEqual(search(date(2026, 6, 1)), ["Open", "Windowed"])
+        self.assertEqual(search(date(2026, 1, 1), date(2026, 1, 31)), ["Windowed"])
+
+        # A room with windows never falls back to available_from
+        Room.objects.filter(pk=self.room.pk).update(available_from=date(2026, 1, 1))
+        rooms = availability.available_for(Room.objects.all(), date(2026, 4, 1), date(2026, 4, 2))
+        self.assertEqual(list(rooms), [open_ended])
+
+        response = self.client.get(reverse("advanced_search"), {"move_in": "2026-01-05", "move_out": "2026-01-20"})
+        self.assertEqual([room.title for room in response.context["rooms"]], ["Windowed"])
@@ -0,0 +1,129 @@
+"""
+Time-decayed "trending" scores for rooms.
+
+A room's demand at time t is the sum of its events' weights, each halved
+every `TRENDING_HALF_LIFE` since the event happened. Decaying every row as
+time passes would mean rewriting the whole table; instead each event adds
+its weight scaled *up* by 2^((t_event - epoch) / half_life), relative to a
+shared epoch. Every score then shrinks by the same factor as time passes, so
+the stored `Room.trending_score` values rank rooms exactly as the decayed
+sums would, an event is one UPDATE of one row, and "top rooms" is an index
+scan on (LOWER(city), trending_score DESC).
+
+The scaled-up weights grow by 2^(age / half_life), so `rebase()` (the
+`rebase_trending` command, run e.g. daily) moves the epoch forward and
+divides every score by the same factor, zeroing rooms whose decayed score
+fell below `MIN_SCORE`. An event recorded while a rebase is committing may
+be off by that rebase's factor; scores are a ranking signal, so that is
+accepted rather than serializing every event on the epoch row.
+
+Events: a favorite adds `EVENT_WEIGHTS['favorite']` (and removing it takes
+its contribution back out), a message about a room adds
+`EVENT_WEIGHTS['message']`. The receivers live in `core.signals`.
+"""
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Lower
+from django.utils import timezone
+
+SCORE_FIELD = 'trending_score'
+TRENDING_HALF_LIFE = timedelta(days=3)
+EVENT_WEIGHTS = {'favorite': 3.0, 'message': 1.0}
+# Decayed scores below this (in units of one message) are dropped at a rebase
+MIN_SCORE = 0.05
+TRENDING_SHOWN = 4
+
+
+def _models():
+    return apps.get_model('core', 'Room'), apps.get_model('core', 'TrendingEpoch')
+
+
+def half_life():
+    return getattr(settings, 'TRENDING_HALF_LIFE', TRENDING_HALF_LIFE)
+
+
+def current_epoch():
+    _, TrendingEpoch = _models()
+    epoch = TrendingEpoch.objects.values_list('started_at', flat=True).first()
+    if epoch is None:
+        epoch = TrendingEpoch.objects.get_or_create(pk=1, defaults={'started_at': timezone.now()})[0].started_at
+    return epoch
+
+
+def scale(when, epoch):
+    """How much an event at `when` weighs relative to one at `epoch`."""
+    return 2 ** ((when - epoch) / half_life())
+
+
+def record(room_id, event, when=None, sign=1):
+    """Add (or with sign -1, take back) one `event` for a room: a single UPDATE."""
+    Room, _ = _models()
+    amount = EVENT_WEIGHTS[event] * scale(when or timezone.now(), current_epoch())
+    score = F(SCORE_FIELD) + sign * amount
+    if sign < 0:
+        score = Greatest(score, Value(0.0))
+    Room.objects.filter(pk=room_id).update(**{SCORE_FIELD: score})
+
+
+def decayed_score(room, now=None):
+    """A room's score as of `now`, in decayed event weights."""
+    return getattr(room, SCORE_FIELD) / scale(now or timezone.now(), current_epoch())
+
+
+def rebase(now=None):
+    """Move the epoch to `now`, rescaling every score. Returns the number of rooms still trending."""
+    Room, TrendingEpoch = _models()
+    now = now or timezone.now()
+    current_epoch()
+    with transaction.atomic():
+        epoch = TrendingEpoch.objects.select_for_update().get(pk=1)
+        factor = 1 / scale(now, epoch.started_at)
+        scored = Room.objects.filter(**{f'{SCORE_FIELD}__gt': 0})
+        # Below MIN_SCORE after rescaling
+        scored.filter(**{f'{SCORE_FIELD}__lt': MIN_SCORE / factor}).update(**{SCORE_FIELD: 0.0})
+        remaining = scored.update(**{SCORE_FIELD: F(SCORE_FIELD) * factor})
+        epoch.started_at = now
+        epoch.save(update_fields=['started_at'])
+    return remaining
+
+
+def rebuild(now=None):
+    """Recompute every score from the favorites and messages of the last few half-lives."""
+    Room, TrendingEpoch = _models()
+    RoomFavorite, Message = apps.get_model('core', 'RoomFavorite'), apps.get_model('core', 'Message')
+    now = now or timezone.now()
+    since = now - half_life() * 12
+    scores = {}
+    events = [
+        ('favorite', RoomFavorite.objects.filter(created_at__gte=since).values_list('room_id', 'created_at')),
+        ('message', Message.objects.filter(room__isnull=False, timestamp__gte=since).values_list('room_id', 'timestamp')),
+    ]
+    for event, rows in events:
+        for room_id, when in rows.iterator():
+            scores[room_id] = scores.get(room_id, 0.0) + EVENT_WEIGHTS[event] * scale(when, now)
+
+    with transaction.atomic():
+        TrendingEpoch.objects.update_or_create(pk=1, defaults={'started_at': now})
+        Room.objects.filter(**{f'{SCORE_FIELD}__gt': 0}).update(**{SCORE_FIELD: 0.0})
+        rooms = [Room(pk=room_id, **{SCORE_FIELD: score}) for room_id, score in scores.items() if score >= MIN_SCORE]
+        Room.objects.bulk_update(rooms, [SCORE_FIELD], batch_size=500)
+    return len(rooms)
+
+
+def trending_in_city(city, limit=TRENDING_SHOWN, queryset=None):
+    """
+    The active rooms in `city` with the highest scores, best first. `city` is
+    a name, or an expression such as a Subquery of the user's profile city.
+    """
+    Room, _ = _models()
+    if city is None or city == '':
+        return Room.objects.none()
+    rooms = Room.objects.all() if queryset is None else queryset
+    match = city.lower() if isinstance(city, str) else Lower(city)
+    return rooms.filter(
+        is_active=True, city__lower=match, **{f'{SCORE_FIELD}__gt': 0}
+    ).order_by(F(SCORE_FIELD).desc())[:limit]
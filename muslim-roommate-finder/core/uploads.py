@@ -0,0 +1,173 @@
+"""
+Room image upload checks.
+
+`probe` identifies an upload from its header alone: `Image.open` only parses
+the header (pixel data is decoded lazily), and it is limited to the formats we
+accept, so checking the format, the dimensions and the pixel count never
+decodes the image. Decompression bombs are refused there, before anything
+tries to decode them.
+
+`normalize` is the only full decode at upload time: when the header carries
+EXIF or XMP metadata it applies the EXIF orientation and re-encodes the image
+without the metadata (which can include GPS coordinates), in one pass. Images
+without metadata are stored untouched.
+
+`LimitedUploadHandler` runs first in `FILE_UPLOAD_HANDLERS` and refuses
+oversized requests while they stream in, by their declared length or as soon
+as one file goes past `IMAGE_UPLOAD_MAX_BYTES`, so the rest of the body is
+never read or buffered. Like Django's own `DATA_UPLOAD_MAX_MEMORY_SIZE`
+check, it raises `RequestDataTooBig`, which becomes a 400 response. The
+hashing handlers after it compute each file's SHA-256 as chunks arrive, for
+the content-addressed storage in `core.image_store`.
+"""
+import hashlib
+import warnings
+from collections import namedtuple
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig, ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import (
+    FileUploadHandler,
+    MemoryFileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'WEBP')
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+MAX_IMAGE_PIXELS = 50_000_000
+MAX_IMAGE_SIDE = 12_000
+MAX_REQUEST_BYTES = 25 * 1024 * 1024
+JPEG_QUALITY = 90
+
+ImageInfo = namedtuple('ImageInfo', ['format', 'width', 'height'])
+
+
+def max_image_bytes():
+    return getattr(settings, 'IMAGE_UPLOAD_MAX_BYTES', MAX_IMAGE_BYTES)
+
+
+def max_image_pixels():
+    return getattr(settings, 'IMAGE_UPLOAD_MAX_PIXELS', MAX_IMAGE_PIXELS)
+
+
+def _rewind(file):
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+
+def probe(file):
+    """
+    (format, width, height) of an image upload, read from its header only.
+    Raises ValidationError for anything that is not an acceptable image.
+    """
+    _rewind(file)
+    try:
+        with warnings.catch_warnings():
+            # Pillow only warns between MAX_IMAGE_PIXELS and twice that
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            with Image.open(file, formats=ALLOWED_FORMATS) as image:
+                info = ImageInfo(image.format, *image.size)
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise ValidationError("Image has too many pixels.", code='image_too_large')
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+        raise ValidationError(
+            f"Unsupported or invalid image. Allowed: {', '.join(ALLOWED_FORMATS)}",
+            code='invalid_image',
+        )
+    finally:
+        _rewind(file)
+
+    if max(info.width, info.height) > MAX_IMAGE_SIDE or info.width * info.height > max_image_pixels():
+        raise ValidationError(
+            f"Image is too large ({info.width}×{info.height} pixels).",
+            code='image_too_large',
+        )
+    return info
+
+
+def validate_size(file):
+    limit = max_image_bytes()
+    if file.size > limit:
+        raise ValidationError(f"Image file too large ( > {filesizeformat(limit)} )", code='file_too_large')
+
+
+def normalize(file):
+    """
+    The upload with its EXIF orientation applied and its EXIF/XMP metadata
+    removed, as a ContentFile, or None when it carries no metadata. The ICC
+    profile is kept so colours don't shift.
+    """
+    _rewind(file)
+    with Image.open(file, formats=ALLOWED_FORMATS) as original:
+        # Metadata in the header is parsed by open(); nothing is decoded yet
+        if not original.info.get('exif') and not original.info.get('xmp'):
+            _rewind(file)
+            return None
+        image_format = original.format
+        icc_profile = original.info.get('icc_profile')
+        image = ImageOps.exif_transpose(original)
+
+    options = {'icc_profile': icc_profile} if icc_profile else {}
+    if image_format == 'JPEG':
+        options['quality'] = JPEG_QUALITY
+        if image.mode not in ('RGB', 'L', 'CMYK'):
+            image = image.convert('RGB')
+    elif image_format == 'WEBP':
+        options['quality'] = JPEG_QUALITY
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    _rewind(file)
+    return ContentFile(buffer.getvalue())
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Refuse uploads over the size limits before the request body is read."""
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        limit = getattr(settings, 'UPLOAD_MAX_REQUEST_BYTES', MAX_REQUEST_BYTES)
+        if content_length > limit:
+            raise RequestDataTooBig(f"Upload of {content_length} bytes exceeds {limit} bytes.")
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > max_image_bytes():
+            raise RequestDataTooBig(f"Uploaded file {self.file_name!r} exceeds {max_image_bytes()} bytes.")
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+class ContentHashMixin:
+    """Set `sha256` (hex digest) on uploaded files, hashing chunks as they stream in."""
+
+    def new_file(self, *args, **kwargs):
+        # Before super(): MemoryFileUploadHandler raises StopFutureHandlers
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(ContentHashMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(ContentHashMixin, TemporaryFileUploadHandler):
+    pass
@@ -1,18 +1,32 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.db.models import Q
+from django.db.models import F, Subquery
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.models import User
 from .models import Profile, Room, Message, RoomType, Amenity
 from .forms import ProfileForm, ContactForm, RoomForm, UserRegistrationForm
+from . import counts, trending
+from .facets import PROFILE_COUNT_FACETS, ROOM_COUNT_FACETS, count_facets, get_facet
+from .filters import filter_profiles, filter_rooms, is_filtered, metro_filter, near_notice, order_key, room_order_key
+from .middleware import query_budget
+from .page_cache import cache_anonymous_page
+from .pagination import paginate_keyset
 
+HOME_PAGE_SIZE = 12
+SIMILAR_PROFILES_SHOWN = 3
 
+
+@query_budget(12)
+@cache_anonymous_page
 def home(request):
     """
     Home page showing profiles and room listings with search and filters.
-    Supports filtering by city, neighborhood, gender, preferences, age range, and Charleston area.
+    Supports filtering by city, neighborhood, gender, preferences, age range, and metro area
+    (`metro=<slug>`, or `charleston_only` for the Charleston metro).
+    Both sections are keyset-paginated independently via `rooms_cursor` and `profiles_cursor`.
+    A "trending" strip shows the most in-demand rooms in the selected city, or the user's own.
     """
     search_query = request.GET.get('search', '')
     city_filter = request.GET.get('city', '')
@@ -23,70 +37,37 @@ def home(request):
     age_max = request.GET.get('age_max', '')
     charleston_only = request.GET.get('charleston_only', '')
 
-    # Filter Profiles
-    profiles = Profile.objects.all()
-
-    if search_query:
-        profiles = profiles.filter(
-            Q(name__icontains=search_query) |
-            Q(city__icontains=search_query) |
-            Q(neighborhood__icontains=search_query) |
-            Q(bio__icontains=search_query)
-        )
-
-    if city_filter:
-        profiles = profiles.filter(city__icontains=city_filter)
-    if neighborhood_filter:
-        profiles = profiles.filter(neighborhood__icontains=neighborhood_filter)
-    if charleston_only:
-        charleston_areas = ['Downtown', 'West Ashley', 'Mount Pleasant', 'James Island', 'Charleston County']
-        profiles = profiles.filter(city__iregex=r'(' + '|'.join(charleston_areas) + ')')
-    if gender_filter:
-        profiles = profiles.filter(gender=gender_filter)
-    if age_min:
-        profiles = profiles.filter(age__gte=age_min)
-    if age_max:
-        profiles = profiles.filter(age__lte=age_max)
-    if preference_filter:
-        # Map preference filters to Profile fields
-        pref_map = {
-            'halal_kitchen': 'halal_kitchen',
-            'prayer_friendly': 'prayer_friendly',
-            'guests_allowed': 'guests_allowed',
-            'looking_for_room': 'is_looking_for_room',
-            'offering_room': 'is_looking_for_room'
-        }
-        field = pref_map.get(preference_filter)
-        if field:
-            value = True if preference_filter != 'offering_room' else False
-            profiles = profiles.filter(**{field: value})
-
-    # Filter Rooms
-    available_rooms = Room.objects.filter(is_active=True)
-    if search_query:
-        available_rooms = available_rooms.filter(
-            Q(title__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(city__icontains=search_query) |
-            Q(neighborhood__icontains=search_query)
-        )
-    if city_filter:
-        available_rooms = available_rooms.filter(city__icontains=city_filter)
-    if neighborhood_filter:
-        available_rooms = available_rooms.filter(neighborhood__icontains=neighborhood_filter)
-    if charleston_only:
-        charleston_areas = ['Downtown', 'West Ashley', 'Mount Pleasant', 'James Island', 'Charleston County']
-        available_rooms = available_rooms.filter(city__iregex=r'(' + '|'.join(charleston_areas) + ')')
-    if preference_filter in ['halal_kitchen', 'prayer_friendly', 'guests_allowed']:
-        available_rooms = available_rooms.filter(**{preference_filter: True})
-
-    # Unique cities and neighborhoods for filter dropdowns
-    cities = Profile.objects.values_list('city', flat=True).distinct().order_by('city')
-    neighborhoods = Profile.objects.values_list('neighborhood', flat=True).distinct().order_by('neighborhood')
+    profiles = filter_profiles(request.GET)
+    available_rooms = filter_rooms(request.GET, Room.objects.filter(is_active=True).for_listing())
+
+    # Unique cities and neighborhoods (with counts) for filter dropdowns
+    cities = get_facet('profile_city')
+    neighborhoods = get_facet('profile_neighborhood')
+
+    # Large result sets get estimated totals and skip the per-condition breakdown
+    filtered = is_filtered(request.GET)
+    profile_count = counts.count(profiles, None if filtered else 'profiles')
+    rooms_count = counts.count(available_rooms, None if filtered else 'rooms.active')
+    profile_facets = count_facets(profiles, PROFILE_COUNT_FACETS) if profile_count.exact else None
+    room_facets = count_facets(available_rooms, ROOM_COUNT_FACETS) if rooms_count.exact else None
+
+    # Search results are ranked by relevance, everything else is newest first (rooms: or best rated)
+    key = order_key(request.GET)
+    profiles_page = paginate_keyset(profiles, request.GET.get('profiles_cursor'), HOME_PAGE_SIZE, key)
+    rooms_page = paginate_keyset(
+        available_rooms, request.GET.get('rooms_cursor'), HOME_PAGE_SIZE, room_order_key(request.GET)
+    )
+
+    # One query: the user's own city is read in a subquery
+    trending_city = city_filter
+    if not trending_city and request.user.is_authenticated:
+        trending_city = Subquery(Profile.objects.filter(user=request.user).values('city')[:1])
+    trending_rooms = trending.trending_in_city(trending_city)
 
     context = {
-        'profiles': profiles,
-        'available_rooms': available_rooms,
+        'profiles': profiles_page,
+        'available_rooms': rooms_page,
+        'trending_rooms': trending_rooms,
         'cities': cities,
         'neighborhoods': neighborhoods,
         'search_query': search_query,
@@ -97,42 +78,28 @@ def home(request):
         'age_min': age_min,
         'age_max': age_max,
         'charleston_only': charleston_only,
-        'profile_count': profiles.count(),
-        'rooms_count': available_rooms.count(),
+        'metro_filter': metro_filter(request.GET),
+        'profile_count': profile_count,
+        'rooms_count': rooms_count,
+        'profile_facets': profile_facets,
+        'room_facets': room_facets,
     }
 
     return render(request, 'home.html', context)
 
 
+@query_budget(6)
 def profile_detail(request, profile_id):
     """
     Display a single profile with similar profile suggestions.
     """
     profile = get_object_or_404(Profile, id=profile_id)
 
-    # Similar profiles: same neighborhood -> same city -> Charleston metro
-    similar_profiles_list = []
-    similar_profiles = Profile.objects.exclude(id=profile.id)
-
-    if profile.neighborhood:
-        neighborhood_matches = similar_profiles.filter(
-            city=profile.city,
-            neighborhood=profile.neighborhood
-        )[:2]
-        similar_profiles_list.extend(neighborhood_matches)
-
-    if len(similar_profiles_list) < 3:
-        city_matches = similar_profiles.filter(city=profile.city).exclude(
-            id__in=[p.id for p in similar_profiles_list]
-        )[:3-len(similar_profiles_list)]
-        similar_profiles_list.extend(city_matches)
-
-    if len(similar_profiles_list) < 3 and profile.is_charleston_area():
-        charleston_cities = ['charleston', 'mount pleasant', 'west ashley']
-        metro_matches = similar_profiles.filter(
-            city__iregex=r'(' + '|'.join(charleston_cities) + ')'
-        ).exclude(id__in=[p.id for p in similar_profiles_list])[:3-len(similar_profiles_list)]
-        similar_profiles_list.extend(metro_matches)
+    # Precomputed nearest neighbours (see core.similarity): one indexed lookup
+    similar_profiles_list = list(
+        Profile.objects.filter(similar_to_links__profile=profile)
+        .order_by('similar_to_links__rank')[:SIMILAR_PROFILES_SHOWN]
+    )
 
     context = {
         'profile': profile,
@@ -143,12 +110,13 @@ def profile_detail(request, profile_id):
 
 
 
+@query_budget(6)
 @login_required
 def room_detail(request, pk):
     """
     Display a single room listing.
     """
-    room = get_object_or_404(Room, pk=pk)
+    room = get_object_or_404(Room.objects.for_listing(), pk=pk)
     return render(request, "room_detail.html", {"room": room})  # ✅ fixed
 
 
@@ -310,6 +278,7 @@ def user_logout(request):
     return redirect('home')
 
 
+@query_budget(6)
 @login_required
 def dashboard(request):
     """
@@ -320,14 +289,24 @@ def dashboard(request):
     except Profile.DoesNotExist:
         return redirect('create_profile')
 
-    user_rooms = profile.rooms.all()[:5]
+    user_rooms = profile.rooms.for_listing()[:5]
+
+    # Precomputed best matches (see core.matching): one indexed lookup
+    matched_rooms = []
+    if profile.is_looking_for_room:
+        matched_rooms = (
+            Room.objects.filter(seeker_matches__seeker=profile, seeker_matches__side='seeker')
+            .order_by('seeker_matches__rank')[:5]
+        )
 
     return render(request, 'dashboard.html', {
         'rooms': user_rooms,
         'profiles': [profile],
+        'matched_rooms': matched_rooms,
     })
 
 
+@query_budget(6)
 @login_required
 def my_listings(request):
     """
@@ -338,34 +317,29 @@ def my_listings(request):
     except Profile.DoesNotExist:
         return redirect('create_profile')
 
-    user_rooms = Room.objects.filter(user=profile)
+    user_rooms = Room.objects.filter(user=profile).for_listing()
     return render(request, 'my_listings.html', {'rooms': user_rooms})
 
 
+@query_budget(10)
+@cache_anonymous_page
 def advanced_search(request):
     """
-    Advanced room search by rent, availability date, and room type.
+    Advanced room search by city, distance from a ZIP code, rent, availability date, room type,
+    and availability for a whole stay (`move_in` to `move_out`).
+    Pass `sort=distance` with `near` to list the closest rooms first, or `sort=rating`
+    for the best-rated rooms first.
     """
-    min_rent = request.GET.get('min_rent', '')
-    max_rent = request.GET.get('max_rent', '')
-    available_date = request.GET.get('available', '')
-    room_type = request.GET.get('room_type', '')
     amenities = request.GET.getlist('amenities')
+    cities = get_facet('room_city')
 
-    rooms = Room.objects.filter(is_active=True)
-
-    if min_rent:
-        rooms = rooms.filter(price__gte=min_rent)
-    if max_rent:
-        rooms = rooms.filter(price__lte=max_rent)
-    if available_date:
-        rooms = rooms.filter(available_from__lte=available_date)
-    if room_type:
-        rooms = rooms.filter(room_type=room_type)
-    if amenities:
-        rooms = rooms.filter(amenities__id__in=amenities).distinct()
+    rooms = filter_rooms(request.GET, Room.objects.filter(is_active=True).for_listing())
+    zip_notice = near_notice(request.GET)
+    if request.GET.get('near') and not zip_notice and request.GET.get('sort') == 'distance':
+        rooms = rooms.order_by('distance', 'id')
+    elif request.GET.get('sort') == 'rating':
+        rooms = rooms.order_by(F('avg_rating').desc(nulls_last=True), '-id')
 
-    cities = Room.objects.values_list('city', flat=True).distinct().order_by('city')
     rent_ranges = [
         ('0-500', 'Under $500'),
         ('500-1000', '$500 - $1000'),
@@ -373,6 +347,7 @@ def advanced_search(request):
         ('1500+', 'Over $1,500'),
     ]
     all_amenities = Amenity.objects.all().order_by('name')
+    room_type_list = RoomType.objects.order_by('name')
 
     return render(request, 'advanced_search.html', {
         'rooms': rooms,
@@ -380,7 +355,9 @@ def advanced_search(request):
         'rent_ranges': rent_ranges,
         'filters': request.GET,
         'amenities': all_amenities,
+        'selected_amenities': amenities,
         'room_type_list': room_type_list,
+        'near_notice': zip_notice,
     })
 
 @login_required